@@ -0,0 +1,129 @@
+"""
+Control de admisión para el trabajo de SymPy, que es CPU y retiene el GIL.
+
+Sólo se ejecutan a la vez `max_concurrent` cálculos pesados; el resto espera en
+una cola acotada. Si la cola está llena, o la espera estimada supera
+`max_wait`, la petición se rechaza en el acto (Overloaded -> 503 con
+Retry-After) en lugar de ralentizar a todas las demás hasta el timeout.
+
+El carril ligero tiene `light_slots` plazas reservadas y prioridad sobre el
+pesado cuando se libera una plaza compartida, para que el trabajo barato no
+haga cola detrás de un dsolve largo.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+LIGHT = 'light'
+HEAVY = 'heavy'
+
+
+class Overloaded(Exception):
+    """No hay capacidad: la petición debe reintentarse más tarde"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f'Servidor saturado ({reason})')
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent, max_queue, max_wait, light_slots=1):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = max_wait
+        self.light_slots = max(0, int(light_slots))
+        self._cond = threading.Condition()
+        self._shared_used = 0
+        self._light_used = 0
+        self._waiting = {LIGHT: 0, HEAVY: 0}
+        # Media móvil del tiempo de servicio, para estimar la espera
+        self._avg_service = 1.0
+
+    def queued(self):
+        with self._cond:
+            return self._waiting[LIGHT] + self._waiting[HEAVY]
+
+    def running(self):
+        with self._cond:
+            return self._shared_used + self._light_used
+
+    def expected_wait(self):
+        """Espera estimada para una petición pesada que llegue ahora (en segundos)"""
+        with self._cond:
+            return self._expected_wait_locked()
+
+    def _expected_wait_locked(self):
+        if self._shared_used < self.max_concurrent and not self._waiting[LIGHT]:
+            return 0.0
+        ahead = self._waiting[LIGHT] + self._waiting[HEAVY] + 1
+        return self._avg_service * ahead / self.max_concurrent
+
+    def _try_take(self, lane):
+        """Intenta ocupar una plaza; devuelve el tipo de plaza o None"""
+        if lane == LIGHT:
+            if self._light_used < self.light_slots:
+                self._light_used += 1
+                return LIGHT
+            if self._shared_used < self.max_concurrent:
+                self._shared_used += 1
+                return HEAVY
+            return None
+        # Las pesadas ceden el turno a las ligeras que están esperando
+        if self._shared_used < self.max_concurrent and not self._waiting[LIGHT]:
+            self._shared_used += 1
+            return HEAVY
+        return None
+
+    @contextmanager
+    def slot(self, lane=HEAVY, max_wait=None, cancel=None):
+        """
+        Ocupa una plaza durante el bloque o lanza Overloaded. `max_wait` acorta
+        la espera máxima para esta petición (p. ej. por su plazo total). Si
+        `cancel` (con is_set() y check()) se activa mientras espera, deja la cola.
+        """
+        arrived = time.monotonic()
+        max_wait = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        with self._cond:
+            taken = self._try_take(lane)
+            if taken is None:
+                if self._waiting[LIGHT] + self._waiting[HEAVY] >= self.max_queue:
+                    metrics.ADMISSION_REJECTED.inc(lane=lane, reason='queue_full')
+                    raise Overloaded('cola llena', self._expected_wait_locked())
+                expected = self._expected_wait_locked()
+                if lane == HEAVY and expected > max_wait:
+                    metrics.ADMISSION_REJECTED.inc(lane=lane, reason='expected_wait')
+                    raise Overloaded('espera estimada excesiva', expected)
+                self._waiting[lane] += 1
+                try:
+                    while taken is None:
+                        remaining = max_wait - (time.monotonic() - arrived)
+                        if remaining <= 0:
+                            metrics.ADMISSION_REJECTED.inc(lane=lane, reason='wait_timeout')
+                            raise Overloaded('tiempo de espera agotado', self._avg_service)
+                        self._cond.wait(remaining if cancel is None else min(remaining, 0.25))
+                        if cancel is not None and cancel.is_set():
+                            cancel.check()
+                        # Se descuenta antes de intentar para no bloquearse a sí misma por prioridad
+                        self._waiting[lane] -= 1
+                        taken = self._try_take(lane)
+                        self._waiting[lane] += 1
+                finally:
+                    self._waiting[lane] -= 1
+        started = time.monotonic()
+        metrics.ADMISSION_WAIT.observe(started - arrived, lane=lane)
+        try:
+            yield
+        finally:
+            service = time.monotonic() - started
+            with self._cond:
+                if taken == LIGHT:
+                    self._light_used -= 1
+                else:
+                    self._shared_used -= 1
+                if lane == HEAVY:
+                    self._avg_service = 0.8 * self._avg_service + 0.2 * service
+                self._cond.notify_all()
@@ -1,11 +1,99 @@
-from flask import Flask, render_template, request, jsonify
-from sympy import symbols, Function, dsolve, Eq, simplify, latex, classify_ode, exp, log, sin, cos, tan, sqrt, atan, asin, acos, pi as sympy_pi
-from sympy import integrate, diff, Symbol, Wild, Rational, parse_expr, sympify, solve as sympy_solve, subs
+from flask import (Flask, Response, render_template, request, jsonify, abort, make_response, redirect,
+                   send_from_directory, stream_with_context, url_for)
+import sympy_cache  # antes que sympy: fija el tamaño de su caché interna
+from sympy import symbols, Function, dsolve, Eq, simplify, classify_ode, exp, log, sin, cos, tan, sqrt, pi as sympy_pi
+from sympy import diff, Float, Symbol, solve as sympy_solve
 from sympy.parsing.sympy_parser import parse_expr as sympy_parse_expr, standard_transformations, implicit_multiplication_application
+import json
+import math
+import os
 import re
+import time
+from contextlib import ExitStack, nullcontext
+
+import config
+import metrics
+import profiling
+import bvp
+import cancellation
+import export
+import fields
+import hintstats
+import httpcache
+import rationals
+import series
+import steplog
+import systems
+import verify
+from admission import AdmissionController, Overloaded, HEAVY, LIGHT
+from capture import get_capture
+from instrumentation import SpanRecorder, NULL_RECORDER, current_recorder, recording, log_if_slow
+from singleflight import SingleFlight
+from steplog import StepLog, display, render_solution, parse_options as parse_step_options
+from warmup import Warmup
+from workers import WorkerPool, WorkerError, WorkerCancelled
 
 app = Flask(__name__)
 
+# Cálculos de /solve en curso, para que peticiones idénticas simultáneas compartan resultado
+inflight_solves = SingleFlight()
+
+# Límite de cálculos simultáneos con cola acotada (503 + Retry-After cuando se satura)
+solver_admission = AdmissionController(config.MAX_CONCURRENT_SOLVES, config.MAX_QUEUED_SOLVES,
+                                       config.MAX_QUEUE_WAIT_S, config.LIGHT_SLOTS)
+metrics.registry.gauge('solver_admission_queued', 'Peticiones esperando plaza para resolver',
+                       function=lambda: {(): solver_admission.queued()})
+metrics.registry.gauge('solver_admission_running', 'Cálculos ocupando una plaza del control de admisión',
+                       function=lambda: {(): solver_admission.running()})
+
+# Workers en procesos separados con memoria acotada (SOLVER_WORKERS > 0)
+solver_pool = None
+if config.SOLVER_WORKERS > 0:
+    solver_pool = WorkerPool(config.SOLVER_WORKERS, config.WORKER_MEMORY_LIMIT_MB,
+                             config.WORKER_MAX_TASKS, config.WORKER_MAX_RSS_MB)
+
+# Estado del calentamiento inicial (ver start_warmup y /ready)
+warmup = Warmup()
+metrics.registry.gauge('solver_ready', 'Proceso calentado y listo para recibir tráfico (1) o no (0)',
+                       function=lambda: {(): 1 if warmup.is_ready() else 0})
+
+metrics.registry.gauge('solver_render_cache', 'Caché de LaTeX/MathML por expresión de steplog.py', ('stat',),
+                       function=lambda: {(name,): value for name, value in steplog.cache_stats().items()
+                                         if name != 'maxsize'})
+
+metrics.registry.gauge('solver_series_cache', 'Ecuaciones y coeficientes guardados por el motor de series', ('stat',),
+                       function=lambda: {(name,): value for name, value in series.cache_stats().items()})
+metrics.registry.gauge('solver_field_cache', 'Funciones de campo compiladas con lambdify en caché',
+                       function=lambda: {(): fields.cache_size()})
+metrics.registry.gauge('solver_export_cache', 'Módulos de Python generados por /export en caché',
+                       function=lambda: {(): export.cache_size()})
+metrics.registry.gauge('solver_http_response_cache', 'Respuestas de GET /solve guardadas por ETag', ('stat',),
+                       function=lambda: {(name,): value for name, value in httpcache.responses.stats().items()})
+
+# MathJax servido desde una copia local (fetch_mathjax.py) con caché de larga duración;
+# la versión forma parte de la URL, así que al actualizarla los navegadores piden la nueva
+MATHJAX_CDN_URL = 'https://cdn.jsdelivr.net/npm/mathjax@3/es5/mml-chtml.js'
+MATHJAX_MAX_AGE = 365 * 24 * 3600
+
+def local_mathjax_version():
+    try:
+        with open(os.path.join(config.MATHJAX_DIR, 'version.txt'), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+MATHJAX_VERSION = local_mathjax_version()
+
+def solver_slot(lane=HEAVY, deadline=None, cancel=None):
+    """
+    Plaza del control de admisión (o nada si está desactivado); no se espera
+    más allá del plazo y se deja la cola si la petición se cancela.
+    """
+    if not config.ADMISSION_CONTROL:
+        return nullcontext()
+    max_wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+    return solver_admission.slot(lane, max_wait=max_wait, cancel=cancel)
+
 # Configurar transformaciones para parsing
 transformations = (standard_transformations + (implicit_multiplication_application,))
 
@@ -18,6 +106,7 @@ def ensure_json_response(func):
         except Exception as e:
             import traceback
             error_trace = traceback.format_exc()
+            metrics.ERRORS.inc(endpoint=func.__name__, exception=type(e).__name__)
             return jsonify({
                 'success': False,
                 'solution': None,
@@ -26,6 +115,63 @@ def ensure_json_response(func):
     wrapper.__name__ = func.__name__
     return wrapper
 
+def run_dsolve(eq, y, hint='default'):
+    """
+    Llama a dsolve registrando el intento (hint, duración, éxito/fallo)
+    en el recorder de la petición en curso.
+    """
+    cancellation.check()
+    recorder = current_recorder()
+    metrics.DSOLVE_ATTEMPTS.inc(hint=hint)
+    start = time.perf_counter()
+    try:
+        solution = _dsolve_with_hint(eq, y, hint)
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        metrics.DSOLVE_LATENCY.observe(elapsed, hint=hint)
+        recorder.record_hint(hint, elapsed * 1000, False, str(e))
+        raise
+    elapsed = time.perf_counter() - start
+    metrics.DSOLVE_LATENCY.observe(elapsed, hint=hint)
+    metrics.DSOLVE_SUCCESS.inc(hint=hint)
+    recorder.record_hint(hint, elapsed * 1000, True)
+    return solution
+
+def order_hints(eq, y, hints):
+    """
+    Hints que se prueban en modo automático y la forma de la ecuación con la que se
+    anotan sus resultados (hintstats.py); sin aprendizaje, los 5 primeros de classify_ode.
+    """
+    stats = hintstats.get_stats()
+    if stats is None:
+        return list(hints[:5]), None
+    try:
+        shape = hintstats.fingerprint(eq, y)
+    except Exception:
+        return list(hints[:5]), None
+    candidates, decision = stats.order(shape, hints)
+    metrics.HINT_ORDER.inc(decision=decision)
+    current_recorder().record_hint_order(decision)
+    return candidates, shape
+
+def record_hint_outcome(shape, hints, hint, success, started):
+    """
+    Anota el resultado de un hint (dsolve y simplificación) para ordenar los siguientes;
+    una solución con integrales sin evaluar o truncada no cuenta como éxito.
+    """
+    if shape is not None:
+        hintstats.get_stats().record(shape, hints, hint, success, (time.perf_counter() - started) * 1000)
+
+def _dsolve_with_hint(eq, y, hint):
+    # Los hints de series usan el motor de series.py (coeficientes por recurrencia y en caché);
+    # si no puede con la ecuación, se deja a dsolve
+    if hint in series.POWER_SERIES_HINTS:
+        try:
+            return series.dsolve_hint(eq, y, hint, config.SERIES_TERMS)
+        except ValueError:
+            pass
+    return dsolve(eq, y, hint=hint)
+
 def normalize_and_simplify_solution(solution):
     """
     Normaliza y simplifica una solución de dsolve.
@@ -34,6 +180,18 @@ def normalize_and_simplify_solution(solution):
     if solution is None:
         return None
     
+    cancellation.check()
+    start = time.perf_counter()
+    try:
+        return _simplify_solution(solution)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.SIMPLIFY_LATENCY.observe(elapsed)
+        current_recorder().record_simplify(elapsed * 1000)
+
+def _simplify_solution(solution):
+    """Simplifica la solución (o cada solución de una lista) sin propagar errores"""
+    
     try:
         # Si es una lista, simplificar cada elemento
         if isinstance(solution, list):
@@ -229,49 +387,49 @@ def solve_separable(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Ecuación de Variables Separables**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_separable')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y, hint='separable')
+        solution = run_dsolve(eq, y, hint='separable')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
         try:
-            solution = dsolve(eq, y)
+            solution = run_dsolve(eq, y)
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (método alternativo) - múltiples soluciones:")
+                steps.add('success', 'solutions_found_alternative')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada (método alternativo): $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found_alternative', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             error_msg = str(e) if 'e' in locals() else str(e2)
-            steps.append(f"❌ Error al resolver con método específico: {error_msg}")
-            steps.append(f"⚠️ Intentando método alternativo...")
+            steps.add('error', 'method_error', error=error_msg)
+            steps.add('warning', 'trying_alternative')
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except Exception as e3:
-                steps.append(f"❌ Error final: {str(e3)}")
+                steps.add('error', 'final_error', error=str(e3))
                 import traceback
-                steps.append(f"📄 Traceback: {traceback.format_exc()[:200]}")
+                steps.add('text', 'traceback', details=traceback.format_exc()[:200])
                 return None
 
 def solve_homogeneous(eq, steps):
@@ -279,49 +437,49 @@ def solve_homogeneous(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Ecuación Diferencial Homogénea**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_homogeneous')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y, hint='homogeneous')
+        solution = run_dsolve(eq, y, hint='homogeneous')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
         try:
-            solution = dsolve(eq, y)
+            solution = run_dsolve(eq, y)
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (método alternativo) - múltiples soluciones:")
+                steps.add('success', 'solutions_found_alternative')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada (método alternativo): $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found_alternative', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             error_msg = str(e) if 'e' in locals() else str(e2)
-            steps.append(f"❌ Error al resolver con método específico: {error_msg}")
-            steps.append(f"⚠️ Intentando método alternativo...")
+            steps.add('error', 'method_error', error=error_msg)
+            steps.add('warning', 'trying_alternative')
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except Exception as e3:
-                steps.append(f"❌ Error final: {str(e3)}")
+                steps.add('error', 'final_error', error=str(e3))
                 import traceback
-                steps.append(f"📄 Traceback: {traceback.format_exc()[:200]}")
+                steps.add('text', 'traceback', details=traceback.format_exc()[:200])
                 return None
 
 def solve_exact(eq, steps):
@@ -329,49 +487,49 @@ def solve_exact(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Ecuación Diferencial Exacta**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_exact')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y, hint='1st_exact')
+        solution = run_dsolve(eq, y, hint='1st_exact')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
         try:
-            solution = dsolve(eq, y)
+            solution = run_dsolve(eq, y)
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (método alternativo) - múltiples soluciones:")
+                steps.add('success', 'solutions_found_alternative')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada (método alternativo): $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found_alternative', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             error_msg = str(e) if 'e' in locals() else str(e2)
-            steps.append(f"❌ Error al resolver con método específico: {error_msg}")
-            steps.append(f"⚠️ Intentando método alternativo...")
+            steps.add('error', 'method_error', error=error_msg)
+            steps.add('warning', 'trying_alternative')
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except Exception as e3:
-                steps.append(f"❌ Error final: {str(e3)}")
+                steps.add('error', 'final_error', error=str(e3))
                 import traceback
-                steps.append(f"📄 Traceback: {traceback.format_exc()[:200]}")
+                steps.add('text', 'traceback', details=traceback.format_exc()[:200])
                 return None
 
 def solve_linear(eq, steps):
@@ -379,60 +537,60 @@ def solve_linear(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Ecuación Diferencial Lineal**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_linear')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     # Intentar simplificar la ecuación primero
     try:
         eq_simplified = simplify(eq)
         if eq_simplified != eq:
-            steps.append(f"📐 Ecuación simplificada: $$latex({latex(eq_simplified)})$$")
+            steps.add('text', 'simplified_equation', equation=display(eq_simplified))
             eq = eq_simplified
     except:
         pass  # Si no se puede simplificar, continuar con la original
     
     try:
-        solution = dsolve(eq, y, hint='1st_linear')
+        solution = run_dsolve(eq, y, hint='1st_linear')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
-        steps.append(f"⚠️ Método '1st_linear' falló: {str(e)}")
-        steps.append(f"🔄 Intentando resolución general...")
+        steps.add('warning', 'linear_hint_failed', error=str(e))
+        steps.add('text', 'trying_general')
         try:
-            solution = dsolve(eq, y)
+            solution = run_dsolve(eq, y)
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                steps.add('success', 'solutions_found_general')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found_general', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             error_msg = str(e) if 'e' in locals() else str(e2)
-            steps.append(f"❌ Error al resolver con método específico: {error_msg}")
-            steps.append(f"⚠️ Intentando método alternativo...")
+            steps.add('error', 'method_error', error=error_msg)
+            steps.add('warning', 'trying_alternative')
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except Exception as e3:
-                steps.append(f"❌ Error final: {str(e3)}")
+                steps.add('error', 'final_error', error=str(e3))
                 import traceback
-                steps.append(f"📄 Traceback: {traceback.format_exc()[:200]}")
+                steps.add('text', 'traceback', details=traceback.format_exc()[:200])
                 return None
 
 def solve_bernoulli(eq, steps):
@@ -440,49 +598,49 @@ def solve_bernoulli(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Ecuación Diferencial de Bernoulli**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_bernoulli')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y, hint='Bernoulli')
+        solution = run_dsolve(eq, y, hint='Bernoulli')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
         try:
-            solution = dsolve(eq, y)
+            solution = run_dsolve(eq, y)
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (método alternativo) - múltiples soluciones:")
+                steps.add('success', 'solutions_found_alternative')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada (método alternativo): $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found_alternative', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             error_msg = str(e) if 'e' in locals() else str(e2)
-            steps.append(f"❌ Error al resolver con método específico: {error_msg}")
-            steps.append(f"⚠️ Intentando método alternativo...")
+            steps.add('error', 'method_error', error=error_msg)
+            steps.add('warning', 'trying_alternative')
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except Exception as e3:
-                steps.append(f"❌ Error final: {str(e3)}")
+                steps.add('error', 'final_error', error=str(e3))
                 import traceback
-                steps.append(f"📄 Traceback: {traceback.format_exc()[:200]}")
+                steps.add('text', 'traceback', details=traceback.format_exc()[:200])
                 return None
 
 def solve_reducible_first_order(eq, steps):
@@ -490,22 +648,22 @@ def solve_reducible_first_order(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Ecuación Reducible a Primer Orden**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_reducible')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y)
+        solution = run_dsolve(eq, y)
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
-        steps.append(f"❌ Error: {str(e)}")
+        steps.add('error', 'error', error=str(e))
         return None
 
 def solve_constant_coefficients(eq, steps):
@@ -513,44 +671,44 @@ def solve_constant_coefficients(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Ecuación con Coeficientes Constantes**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_constant_coeff')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y, hint='nth_linear_constant_coeff_homogeneous')
+        solution = run_dsolve(eq, y, hint='nth_linear_constant_coeff_homogeneous')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
         try:
-            solution = dsolve(eq, y, hint='nth_linear_constant_coeff_undetermined_coefficients')
+            solution = run_dsolve(eq, y, hint='nth_linear_constant_coeff_undetermined_coefficients')
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+                steps.add('success', 'solutions_found')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except:
-                steps.append(f"❌ Error: {str(e)}")
+                steps.add('error', 'error', error=str(e))
                 return None
 
 def solve_undetermined_coefficients(eq, steps):
@@ -558,49 +716,49 @@ def solve_undetermined_coefficients(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Método de Coeficientes Indeterminados**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_undetermined')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y, hint='nth_linear_constant_coeff_undetermined_coefficients')
+        solution = run_dsolve(eq, y, hint='nth_linear_constant_coeff_undetermined_coefficients')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
         try:
-            solution = dsolve(eq, y)
+            solution = run_dsolve(eq, y)
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (método alternativo) - múltiples soluciones:")
+                steps.add('success', 'solutions_found_alternative')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada (método alternativo): $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found_alternative', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             error_msg = str(e) if 'e' in locals() else str(e2)
-            steps.append(f"❌ Error al resolver con método específico: {error_msg}")
-            steps.append(f"⚠️ Intentando método alternativo...")
+            steps.add('error', 'method_error', error=error_msg)
+            steps.add('warning', 'trying_alternative')
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except Exception as e3:
-                steps.append(f"❌ Error final: {str(e3)}")
+                steps.add('error', 'final_error', error=str(e3))
                 import traceback
-                steps.append(f"📄 Traceback: {traceback.format_exc()[:200]}")
+                steps.add('text', 'traceback', details=traceback.format_exc()[:200])
                 return None
 
 def solve_integrating_factor(eq, steps):
@@ -608,51 +766,64 @@ def solve_integrating_factor(eq, steps):
     x = symbols('x')
     y = Function('y')(x)
     
-    steps.append("**Método de Factor Integrante**")
-    steps.append(f"Ecuación original: $$latex({latex(eq)})$$")
+    steps.add('heading', 'title_integrating_factor')
+    steps.add('text', 'original_equation', equation=display(eq))
     
     try:
-        solution = dsolve(eq, y, hint='1st_linear')
+        solution = run_dsolve(eq, y, hint='1st_linear')
         if isinstance(solution, list):
-            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+            steps.add('success', 'solutions_found')
             for i, sol in enumerate(solution, 1):
-                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                steps.add('text', 'solution_n', n=i, solution=display(sol))
         else:
-            steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+            steps.add('success', 'solution_found', solution=display(solution))
         
         solution = normalize_and_simplify_solution(solution)
         return solution
     except Exception as e:
         try:
-            solution = dsolve(eq, y)
+            solution = run_dsolve(eq, y)
             if isinstance(solution, list):
-                steps.append(f"✅ Solución encontrada (método alternativo) - múltiples soluciones:")
+                steps.add('success', 'solutions_found_alternative')
                 for i, sol in enumerate(solution, 1):
-                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'solution_n', n=i, solution=display(sol))
             else:
-                steps.append(f"✅ Solución encontrada (método alternativo): $$latex({latex(solution)})$$")
+                steps.add('success', 'solution_found_alternative', solution=display(solution))
             solution = normalize_and_simplify_solution(solution)
             return solution
         except Exception as e2:
             error_msg = str(e) if 'e' in locals() else str(e2)
-            steps.append(f"❌ Error al resolver con método específico: {error_msg}")
-            steps.append(f"⚠️ Intentando método alternativo...")
+            steps.add('error', 'method_error', error=error_msg)
+            steps.add('warning', 'trying_alternative')
             try:
-                solution = dsolve(eq, y)
+                solution = run_dsolve(eq, y)
                 if isinstance(solution, list):
-                    steps.append(f"✅ Solución encontrada (método general) - múltiples soluciones:")
+                    steps.add('success', 'solutions_found_general')
                     for i, sol in enumerate(solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                 else:
-                    steps.append(f"✅ Solución encontrada (método general): $$latex({latex(solution)})$$")
+                    steps.add('success', 'solution_found_general', solution=display(solution))
                 solution = normalize_and_simplify_solution(solution)
                 return solution
             except Exception as e3:
-                steps.append(f"❌ Error final: {str(e3)}")
+                steps.add('error', 'final_error', error=str(e3))
                 import traceback
-                steps.append(f"📄 Traceback: {traceback.format_exc()[:200]}")
+                steps.add('text', 'traceback', details=traceback.format_exc()[:200])
                 return None
 
+# Métodos seleccionables desde la interfaz (el valor del <select> de index.html)
+method_functions = {
+    'separable': solve_separable,
+    'homogeneous': solve_homogeneous,
+    'exact': solve_exact,
+    'linear': solve_linear,
+    'bernoulli': solve_bernoulli,
+    'reducible': solve_reducible_first_order,
+    'constant_coeff': solve_constant_coefficients,
+    'undetermined': solve_undetermined_coefficients,
+    'integrating_factor': solve_integrating_factor
+}
+
 def parse_initial_conditions(conditions_str, steps):
     """
     Parsea condiciones iniciales desde un string.
@@ -702,14 +873,14 @@ def parse_initial_conditions(conditions_str, steps):
                     }
                     const_value = sympy_parse_expr(const_value_str, local_dict=local_dict, transformations=transformations)
                     constant_values[const_name] = const_value
-                    steps.append(f"   📌 Condición detectada: ${const_name} = {latex(const_value)}$")
+                    steps.add('text', 'constant_detected', condition=Eq(Symbol(const_name), const_value))
                 except:
                     try:
                         const_value = float(const_value_str)
                         constant_values[const_name] = const_value
-                        steps.append(f"   📌 Condición detectada: ${const_name} = {const_value}$")
+                        steps.add('text', 'constant_detected', condition=Eq(Symbol(const_name), const_value))
                     except:
-                        steps.append(f"   ⚠️ No se pudo parsear la constante: {part}")
+                        steps.add('warning', 'constant_parse_error', condition=part)
                 continue
             
             # Patrón para y(a)=b, y'(a)=b, y''(a)=b, etc.
@@ -743,7 +914,7 @@ def parse_initial_conditions(conditions_str, steps):
                     try:
                         x_val = float(x_val_str)
                     except:
-                        steps.append(f"   ⚠️ No se pudo parsear x en: {part}")
+                        steps.add('warning', 'ic_x_parse_error', condition=part)
                         continue
                 
                 # Parsear y_val
@@ -765,17 +936,17 @@ def parse_initial_conditions(conditions_str, steps):
                     try:
                         y_val = float(y_val_str)
                     except:
-                        steps.append(f"   ⚠️ No se pudo parsear y en: {part}")
+                        steps.add('warning', 'ic_y_parse_error', condition=part)
                         continue
                 
                 conditions.append((x_val, y_val, deriv_order))
                 
                 deriv_str = "y" + "'" * deriv_order
-                steps.append(f"   📌 Condición inicial detectada: ${deriv_str}({latex(x_val)}) = {latex(y_val)}$")
+                steps.add('text', 'ic_detected', condition=Eq(Symbol(f"{deriv_str}({x_val})"), y_val))
             else:
-                steps.append(f"   ⚠️ Formato no reconocido: {part}")
+                steps.add('warning', 'ic_unknown_format', condition=part)
         except Exception as e:
-            steps.append(f"   ⚠️ Error al parsear condición '{part}': {str(e)}")
+            steps.add('warning', 'ic_parse_error', condition=part, error=str(e))
     
     return conditions, constant_values
 
@@ -784,7 +955,7 @@ def apply_initial_conditions(solution, conditions, constant_values, steps):
     Aplica condiciones iniciales a la solución para encontrar constantes.
     Retorna la solución particular.
     """
-    if not solution:
+    if solution is None:
         return None
     
     x = symbols('x')
@@ -806,13 +977,13 @@ def apply_initial_conditions(solution, conditions, constant_values, steps):
                 all_constants.append(symbol)
         
         if not all_constants:
-            steps.append(f"   ℹ️ La solución no contiene constantes de integración.")
+            steps.add('text', 'no_constants')
             return solution
         
         # Si hay valores de constantes directos, aplicarlos primero
         if constant_values:
-            steps.append(f"")
-            steps.append(f"🔧 **Aplicando valores de constantes:**")
+            steps.add('text', 'blank')
+            steps.add('heading', 'constants_heading')
             for const_name, const_value in constant_values.items():
                 # Buscar el símbolo correspondiente
                 const_symbol = None
@@ -823,19 +994,22 @@ def apply_initial_conditions(solution, conditions, constant_values, steps):
                 
                 if const_symbol:
                     solution = solution.subs(const_symbol, const_value)
-                    steps.append(f"   Sustituyendo ${latex(const_symbol)} = {latex(const_value)}$")
-                    steps.append(f"   Solución actualizada: $$latex({latex(solution)})$$")
+                    steps.add('text', 'substituting', condition=Eq(const_symbol, const_value))
+                    steps.add('text', 'updated_solution', solution=display(solution))
                     # Remover de la lista de constantes
                     all_constants = [c for c in all_constants if c != const_symbol]
                 else:
-                    steps.append(f"   ⚠️ No se encontró la constante ${const_name}$ en la solución")
+                    steps.add('warning', 'constant_missing', constant=Symbol(const_name))
         
         # Si no hay condiciones iniciales, retornar la solución general
         if not conditions:
             return solution
         
-        steps.append(f"")
-        steps.append(f"🔧 **Aplicando condiciones iniciales para encontrar constantes:**")
+        steps.add('text', 'blank')
+        steps.add('heading', 'ic_heading')
+        
+        # dsolve devuelve Eq(y(x), f(x)): las condiciones se evalúan sobre f(x)
+        solution_expr = solution.rhs if isinstance(solution, Eq) else solution
         
         # Crear sistema de ecuaciones a partir de las condiciones
         equations = []
@@ -844,22 +1018,22 @@ def apply_initial_conditions(solution, conditions, constant_values, steps):
             # Calcular la derivada correspondiente
             if deriv_order == 0:
                 # y(x_val) = y_val
-                expr = solution.subs(x, x_val) - y_val
+                expr = solution_expr.subs(x, x_val) - y_val
             else:
                 # Calcular la derivada n-ésima
-                deriv_expr = diff(solution, x, deriv_order)
+                deriv_expr = diff(solution_expr, x, deriv_order)
                 expr = deriv_expr.subs(x, x_val) - y_val
             
             equations.append(Eq(expr, 0))
             
             deriv_str = "y" + "'" * deriv_order
-            steps.append(f"   Condición: ${deriv_str}({latex(x_val)}) = {latex(y_val)}$")
-            steps.append(f"   Ecuación resultante: $$latex({latex(equations[-1])})$$")
+            steps.add('text', 'condition', condition=Eq(Symbol(f"{deriv_str}({x_val})"), y_val))
+            steps.add('text', 'condition_equation', equation=display(equations[-1]))
         
         # Resolver el sistema de ecuaciones
         if equations and all_constants:
-            steps.append(f"")
-            steps.append(f"🔍 **Resolviendo el sistema de ecuaciones para las constantes:**")
+            steps.add('text', 'blank')
+            steps.add('heading', 'constants_system_heading')
             
             try:
                 # Intentar resolver el sistema
@@ -869,79 +1043,82 @@ def apply_initial_conditions(solution, conditions, constant_values, steps):
                     # Tomar la primera solución (puede haber múltiples)
                     sol_dict = solutions_dict[0]
                     
-                    steps.append(f"   Soluciones encontradas para las constantes:")
+                    steps.add('text', 'constants_found')
                     for const, value in sol_dict.items():
-                        steps.append(f"   ${latex(const)} = {latex(value)}$")
+                        steps.add('text', 'expression', expr=Eq(const, value))
                     
                     # Aplicar las constantes a la solución
                     particular_solution = solution.subs(sol_dict)
                     particular_solution = simplify(particular_solution)
                     
-                    steps.append(f"")
-                    steps.append(f"✅ **Solución particular obtenida:**")
-                    steps.append(f"   $$latex({latex(particular_solution)})$$")
+                    steps.add('text', 'blank')
+                    steps.add('success', 'particular_found')
+                    steps.add('text', 'expression', expr=display(particular_solution))
                     
                     return particular_solution
                 else:
-                    steps.append(f"   ⚠️ No se encontró solución para el sistema de ecuaciones")
-                    steps.append(f"   Se mostrará la solución general con las constantes sin determinar")
+                    steps.add('warning', 'constants_unsolved')
+                    steps.add('text', 'showing_general_undetermined')
                     return solution
             except Exception as solve_error:
-                steps.append(f"   ⚠️ Error al resolver el sistema: {str(solve_error)}")
-                steps.append(f"   Se mostrará la solución general")
+                steps.add('warning', 'constants_error', error=str(solve_error))
+                steps.add('text', 'showing_general')
                 return solution
         else:
             return solution
             
     except Exception as e:
-        steps.append(f"   ⚠️ Error al aplicar condiciones iniciales: {str(e)}")
+        steps.add('warning', 'ic_error', error=str(e))
         import traceback
-        steps.append(f"   📄 Detalles: {traceback.format_exc()[:200]}")
+        steps.add('text', 'ic_traceback', details=traceback.format_exc()[:200])
         return solution
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+def canonical_request_key(equation_str, method, initial_conditions_str):
+    """
+    Clave canónica de una petición: la misma ecuación escrita con distintos
+    espacios (y' = x*y, y'=x*y) produce la misma clave.
+    """
+    def normalize(text):
+        text = ' '.join(str(text or '').split())
+        return re.sub(r'\s*([=+\-*/^(),])\s*', r'\1', text)
+    return (normalize(equation_str), method or 'auto', normalize(initial_conditions_str))
 
-@app.route('/solve', methods=['POST'])
-@ensure_json_response
-def solve():
-    try:
-        data = request.json
-        if not data:
-            return jsonify({
-                'success': False,
-                'solution': None,
-                'steps': ['❌ Error: No se recibieron datos en la petición']
-            }), 400
-        
-        equation_str = data.get('equation', '')
-        method = data.get('method', 'auto')
-        initial_conditions_str = data.get('initial_conditions', '')
-        
-        steps = []
-        solution = None
-        general_solution = None
-        particular_solution = None
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'solution': None,
-            'steps': [f'❌ Error al procesar la petición: {str(e)}']
-        }), 400
+def solve_equation(equation_str, method='auto', initial_conditions_str='', verbosity='full', fmt='latex', verify_mode=None,
+                   rationalize=None):
+    """
+    Resuelve una ecuación diferencial completa (parseo, método, simplificación,
+    condiciones iniciales y LaTeX) y devuelve el diccionario de respuesta de /solve.
+    Los pasos se renderizan al final según verbosity ('none', 'summary', 'full')
+    y fmt ('latex', 'text', 'mathml'). Los sistemas de ecuaciones ('x' = ...; y' = ...')
+    se resuelven con solve_system_equation. Con verify_mode ('fast' o 'full') se
+    añade la verificación numérica de la solución (verify.py). Con rationalize (dígitos)
+    los decimales se resuelven como racionales exactos y la solución final vuelve a
+    decimales con esa precisión (rationals.py).
+    """
+    if method == 'system' or systems.is_system(equation_str):
+        return solve_system_equation(equation_str, initial_conditions_str, verbosity, fmt)
+    steps = StepLog()
+    solution = None
+    general_solution = None
+    particular_solution = None
+    eq = None
+    conditions = None
+    numeric_solution = None
+    rationalized = False
     
     try:
         x = symbols('x')
         y = Function('y')(x)
         
         # Parsear la ecuación
-        steps.append(f"📋 **Paso 1: Ecuación ingresada**")
-        steps.append(f"   Ecuación original: `{equation_str}`")
+        steps.add('heading', 'step1_heading')
+        steps.add('text', 'input_equation', equation=equation_str)
         
         try:
-            eq = parse_equation_string(equation_str)
-            steps.append(f"📝 **Paso 2: Ecuación parseada**")
-            steps.append(f"   La ecuación en formato matemático es: $$latex({latex(eq)})$$")
+            with current_recorder().span('parse'):
+                eq = parse_equation_string(equation_str)
+            steps.add('heading', 'step2_heading')
+            steps.add('text', 'parsed_equation', equation=display(eq))
             
             # Mostrar forma estándar de la ecuación
             try:
@@ -952,8 +1129,8 @@ def solve():
                 
                 # Si el lado izquierdo es una derivada, mostrar forma estándar
                 if eq_lhs.has(diff):
-                    steps.append(f"📐 **Forma estándar:**")
-                    steps.append(f"   $$latex({latex(eq)})$$")
+                    steps.add('heading', 'standard_form_heading')
+                    steps.add('text', 'expression', expr=display(eq))
                     
                     # Mostrar información sobre el tipo de ecuación
                     order = 0
@@ -965,27 +1142,38 @@ def solve():
                         order = 3
                     
                     if order > 0:
-                        steps.append(f"   Esta es una ecuación diferencial de orden {order}.")
+                        steps.add('text', 'equation_order', order=order)
             except:
                 pass
                 
         except Exception as parse_error:
-            steps.append(f"❌ Error al parsear la ecuación: {str(parse_error)}")
-            return jsonify({
+            steps.add('error', 'parse_error', error=str(parse_error))
+            return {
                 'success': False,
                 'solution': None,
-                'steps': steps
-            })
+                'steps': steps.render(verbosity, fmt)
+            }
+        
+        if rationalize and eq.atoms(Float):
+            with current_recorder().span('rationalize'):
+                eq, replacements = rationals.rationalize(eq)
+            rationalized = True
+            steps.add('heading', 'rationalized_heading')
+            for value, exact_value in replacements.items():
+                steps.add('text', 'rationalized_value', value=float(value), exact=str(exact_value))
+            steps.add('text', 'rationalized_equation', equation=display(eq))
         
         # Seleccionar método de solución
         if method == 'auto':
             # Intentar clasificar automáticamente y probar múltiples métodos
-            steps.append(f"🔍 **Paso 3: Clasificación automática de la ecuación**")
+            steps.add('heading', 'step3_heading')
             try:
-                hints = classify_ode(eq, y)
+                with current_recorder().span('classify_ode'):
+                    hints = classify_ode(eq, y)
                 if hints:
-                    steps.append(f"   Se detectaron los siguientes métodos aplicables:")
-                    for i, hint in enumerate(hints[:5], 1):
+                    candidates, shape = order_hints(eq, y, hints)
+                    steps.add('text', 'hints_detected')
+                    for i, hint in enumerate(candidates, 1):
                         # Traducir nombres de métodos a español
                         method_names = {
                             'separable': 'Variables Separables',
@@ -1001,17 +1189,20 @@ def solve():
                             '1st_homogeneous_coeff_subs_dep_div_indep': 'Homogénea (sustitución alterna)',
                         }
                         method_name = method_names.get(hint, hint)
-                        steps.append(f"   {i}. {method_name} ({hint})")
+                        steps.add('text', 'hint_item', n=i, method=method_name, hint=hint)
+                    if candidates != list(hints[:5]):
+                        steps.add('text', 'hints_reordered')
                     
                     # Intentar con cada hint hasta que uno funcione
                     solution = None
                     successful_hint = None
-                    for hint_idx, hint in enumerate(hints[:5], 1):  # Probar hasta 5 métodos
+                    for hint_idx, hint in enumerate(candidates, 1):  # Probar hasta 5 métodos
+                        started = time.perf_counter()
                         try:
-                            steps.append(f"")
-                            steps.append(f"🔄 **Paso 3.{hint_idx}: Intentando resolver con método '{hint}'**")
+                            steps.add('text', 'blank')
+                            steps.add('heading', 'step3_hint_heading', n=hint_idx, hint=hint)
                             
-                            solution = dsolve(eq, y, hint=hint)
+                            solution = run_dsolve(eq, y, hint=hint)
                             
                             successful_hint = hint
                             method_names = {
@@ -1024,16 +1215,18 @@ def solve():
                             method_name = method_names.get(hint, hint)
                             
                             if isinstance(solution, list):
-                                steps.append(f"✅ ¡Éxito! Solución encontrada usando método '{method_name}' (múltiples soluciones):")
+                                steps.add('success', 'hint_solutions_found', method=method_name)
                                 for i, sol in enumerate(solution, 1):
-                                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                                    steps.add('text', 'solution_n', n=i, solution=display(sol))
                             else:
-                                steps.append(f"✅ ¡Éxito! Solución encontrada usando método '{method_name}':")
-                                steps.append(f"   $$latex({latex(solution)})$$")
+                                steps.add('success', 'hint_solution_found', method=method_name)
+                                steps.add('text', 'expression', expr=display(solution))
                             
                             solution = normalize_and_simplify_solution(solution)
+                            record_hint_outcome(shape, hints, hint, hintstats.solved(solution), started)
                             break  # Si funciona, salir del loop
                         except Exception as hint_error:
+                            record_hint_outcome(shape, hints, hint, False, started)
                             method_names = {
                                 'separable': 'Variables Separables',
                                 '1st_linear': 'Lineal de Primer Orden',
@@ -1042,124 +1235,118 @@ def solve():
                                 'Bernoulli': 'Bernoulli',
                             }
                             method_name = method_names.get(hint, hint)
-                            steps.append(f"⚠️ El método '{method_name}' no es aplicable o falló.")
-                            if hint_idx < min(5, len(hints)):
-                                steps.append(f"   Probando siguiente método...")
+                            steps.add('warning', 'hint_failed', method=method_name)
+                            if hint_idx < len(candidates):
+                                steps.add('text', 'trying_next_hint')
                             continue
                     
                     # Si ningún hint funcionó, intentar sin hint
                     if solution is None:
-                        steps.append(f"")
-                        steps.append(f"🔄 **Paso 3.6: Intentando resolución general (sin método específico)**")
-                        steps.append(f"   Como los métodos específicos no funcionaron, se intenta un método general...")
-                        solution = dsolve(eq, y)
+                        steps.add('text', 'blank')
+                        steps.add('heading', 'step3_general_heading')
+                        steps.add('text', 'general_note')
+                        solution = run_dsolve(eq, y)
                         if isinstance(solution, list):
-                            steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+                            steps.add('success', 'solutions_found')
                             for i, sol in enumerate(solution, 1):
-                                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                                steps.add('text', 'solution_n', n=i, solution=display(sol))
                         else:
-                            steps.append(f"✅ Solución encontrada:")
-                            steps.append(f"   $$latex({latex(solution)})$$")
+                            steps.add('success', 'solution_found_heading')
+                            steps.add('text', 'expression', expr=display(solution))
                         solution = normalize_and_simplify_solution(solution)
                 else:
-                    steps.append(f"   No se pudieron detectar métodos específicos para esta ecuación.")
-                    steps.append(f"🔄 **Paso 3.1: Intentando resolución directa...**")
-                    steps.append(f"   Se intentará resolver directamente sin restricciones de método...")
-                    solution = dsolve(eq, y)
+                    steps.add('text', 'no_hints')
+                    steps.add('heading', 'step3_direct_heading')
+                    steps.add('text', 'direct_note')
+                    solution = run_dsolve(eq, y)
                     if isinstance(solution, list):
-                        steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+                        steps.add('success', 'solutions_found')
                         for i, sol in enumerate(solution, 1):
-                            steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                            steps.add('text', 'solution_n', n=i, solution=display(sol))
                     else:
-                        steps.append(f"✅ Solución encontrada:")
-                        steps.append(f"   $$latex({latex(solution)})$$")
+                        steps.add('success', 'solution_found_heading')
+                        steps.add('text', 'expression', expr=display(solution))
                     solution = normalize_and_simplify_solution(solution)
             except Exception as e:
-                steps.append(f"⚠️ Error en clasificación: {str(e)[:100]}")
-                steps.append(f"🔄 Intentando resolución directa...")
+                steps.add('warning', 'classify_error', error=str(e)[:100])
+                steps.add('text', 'trying_direct')
                 try:
-                    solution = dsolve(eq, y)
+                    solution = run_dsolve(eq, y)
                     if isinstance(solution, list):
-                        steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+                        steps.add('success', 'solutions_found')
                         for i, sol in enumerate(solution, 1):
-                            steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                            steps.add('text', 'solution_n', n=i, solution=display(sol))
                     else:
-                        steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+                        steps.add('success', 'solution_found', solution=display(solution))
                 except Exception as e2:
-                    steps.append(f"❌ Error al resolver: {str(e2)}")
+                    steps.add('error', 'solve_error', error=str(e2))
                     solution = None
         else:
             # Usar método específico
-            method_functions = {
-                'separable': solve_separable,
-                'homogeneous': solve_homogeneous,
-                'exact': solve_exact,
-                'linear': solve_linear,
-                'bernoulli': solve_bernoulli,
-                'reducible': solve_reducible_first_order,
-                'constant_coeff': solve_constant_coefficients,
-                'undetermined': solve_undetermined_coefficients,
-                'integrating_factor': solve_integrating_factor
-            }
-            
             if method in method_functions:
                 solution = method_functions[method](eq, steps)
                 # Si el método específico falló, intentar automático
                 if solution is None and method != 'auto':
-                    steps.append(f"⚠️ El método '{method}' no funcionó, intentando auto-detección...")
+                    steps.add('warning', 'method_failed_auto', method=method)
                     try:
-                        hints = classify_ode(eq, y)
+                        with current_recorder().span('classify_ode'):
+                            hints = classify_ode(eq, y)
                         if hints:
-                            steps.append(f"🔍 Métodos disponibles: {', '.join(hints[:5])}")
+                            candidates, shape = order_hints(eq, y, hints)
+                            steps.add('text', 'available_hints', hints=', '.join(candidates))
                             # Intentar con cada hint hasta que uno funcione
                             solution = None
-                            for hint in hints[:5]:
+                            for hint in candidates:
+                                started = time.perf_counter()
                                 try:
-                                    steps.append(f"🔄 Intentando método: '{hint}'...")
-                                    solution = dsolve(eq, y, hint=hint)
+                                    steps.add('text', 'trying_hint', hint=hint)
+                                    solution = run_dsolve(eq, y, hint=hint)
                                     if isinstance(solution, list):
-                                        steps.append(f"✅ Solución encontrada usando '{hint}' (auto-detectado):")
+                                        steps.add('success', 'auto_solutions_found', hint=hint)
                                         for i, sol in enumerate(solution, 1):
-                                            steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                                            steps.add('text', 'solution_n', n=i, solution=display(sol))
                                     else:
-                                        steps.append(f"✅ Solución encontrada usando '{hint}' (auto-detectado): $$latex({latex(solution)})$$")
+                                        steps.add('success', 'auto_solution_found', hint=hint,
+                                                  solution=display(solution))
                                     solution = normalize_and_simplify_solution(solution)
+                                    record_hint_outcome(shape, hints, hint, hintstats.solved(solution), started)
                                     break
                                 except Exception:
+                                    record_hint_outcome(shape, hints, hint, False, started)
                                     continue
                             
                             # Si ningún hint funcionó, intentar sin hint
                             if solution is None:
-                                solution = dsolve(eq, y)
+                                solution = run_dsolve(eq, y)
                                 if isinstance(solution, list):
-                                    steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+                                    steps.add('success', 'solutions_found')
                                     for i, sol in enumerate(solution, 1):
-                                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                                        steps.add('text', 'solution_n', n=i, solution=display(sol))
                                 else:
-                                    steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+                                    steps.add('success', 'solution_found', solution=display(solution))
                                 solution = normalize_and_simplify_solution(solution)
                         else:
-                            solution = dsolve(eq, y)
+                            solution = run_dsolve(eq, y)
                             if isinstance(solution, list):
-                                steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+                                steps.add('success', 'solutions_found')
                                 for i, sol in enumerate(solution, 1):
-                                    steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                                    steps.add('text', 'solution_n', n=i, solution=display(sol))
                             else:
-                                steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+                                steps.add('success', 'solution_found', solution=display(solution))
                             solution = normalize_and_simplify_solution(solution)
                     except Exception as auto_error:
-                        steps.append(f"❌ Error en auto-detección: {str(auto_error)}")
+                        steps.add('error', 'auto_error', error=str(auto_error))
             else:
                 try:
-                    solution = dsolve(eq, y)
+                    solution = run_dsolve(eq, y)
                     if isinstance(solution, list):
-                        steps.append(f"✅ Solución encontrada (múltiples soluciones):")
+                        steps.add('success', 'solutions_found')
                         for i, sol in enumerate(solution, 1):
-                            steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                            steps.add('text', 'solution_n', n=i, solution=display(sol))
                     else:
-                        steps.append(f"✅ Solución encontrada: $$latex({latex(solution)})$$")
+                        steps.add('success', 'solution_found', solution=display(solution))
                 except Exception as e:
-                    steps.append(f"❌ Error: {str(e)}")
+                    steps.add('error', 'error', error=str(e))
                     solution = None
         
         if solution is not None:
@@ -1167,8 +1354,8 @@ def solve():
             general_solution = solution
             
             # Normalizar y simplificar la solución (puede ser lista o expresión única)
-            steps.append(f"")
-            steps.append(f"🔧 **Paso 4: Simplificación de la solución general**")
+            steps.add('text', 'blank')
+            steps.add('heading', 'step4_heading')
             try:
                 original_solution = solution
                 solution = normalize_and_simplify_solution(solution)
@@ -1178,172 +1365,1010 @@ def solve():
                 # Comparar usando representación en string para evitar problemas con listas
                 try:
                     if str(solution) != str(original_solution):
-                        steps.append(f"   Simplificando la solución encontrada...")
+                        steps.add('text', 'simplifying')
                         if isinstance(solution, list):
-                            steps.append(f"   Solución simplificada (múltiples soluciones):")
+                            steps.add('text', 'simplified_solutions')
                             for i, sol in enumerate(solution, 1):
-                                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                                steps.add('text', 'solution_n', n=i, solution=display(sol))
                         else:
-                            steps.append(f"   Solución simplificada:")
-                            steps.append(f"   $$latex({latex(solution)})$$")
+                            steps.add('text', 'simplified_solution')
+                            steps.add('text', 'expression', expr=display(solution))
                     else:
-                        steps.append(f"   La solución ya está en su forma más simple.")
+                        steps.add('text', 'already_simple')
                         if isinstance(solution, list):
                             for i, sol in enumerate(solution, 1):
-                                steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                                steps.add('text', 'solution_n', n=i, solution=display(sol))
                         else:
-                            steps.append(f"   $$latex({latex(solution)})$$")
+                            steps.add('text', 'expression', expr=display(solution))
                 except:
                     # Si la comparación falla, mostrar la solución actual
-                    steps.append(f"   Solución general:")
+                    steps.add('text', 'general_solution_label')
                     if isinstance(solution, list):
                         for i, sol in enumerate(solution, 1):
-                            steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                            steps.add('text', 'solution_n', n=i, solution=display(sol))
                     else:
-                        steps.append(f"   $$latex({latex(solution)})$$")
+                        steps.add('text', 'expression', expr=display(solution))
             except Exception as simplify_error:
-                steps.append(f"⚠️ Advertencia: Error al simplificar solución: {str(simplify_error)}")
-                steps.append(f"   Se mostrará la solución sin simplificar.")
+                steps.add('warning', 'simplify_error', error=str(simplify_error))
+                steps.add('text', 'showing_unsimplified')
                 # Continuar con la solución original
             
             # Procesar condiciones iniciales si se proporcionaron
             if initial_conditions_str:
-                steps.append(f"")
-                steps.append(f"📋 **Paso 5: Procesando condiciones iniciales**")
-                steps.append(f"   Condiciones ingresadas: `{initial_conditions_str}`")
+                steps.add('text', 'blank')
+                steps.add('heading', 'step5_heading')
+                steps.add('text', 'input_conditions', conditions=initial_conditions_str)
                 
-                conditions, constant_values = parse_initial_conditions(initial_conditions_str, steps)
+                with current_recorder().span('parse_initial_conditions'):
+                    conditions, constant_values = parse_initial_conditions(initial_conditions_str, steps)
+                if rationalize:
+                    exact_conditions = rationals.rationalize_conditions(conditions, constant_values)
+                    rationalized = rationalized or exact_conditions != (conditions, constant_values)
+                    conditions, constant_values = exact_conditions
                 
                 if conditions or constant_values:
                     # Aplicar condiciones iniciales
-                    particular_solution = apply_initial_conditions(general_solution, conditions, constant_values, steps)
+                    with current_recorder().span('apply_initial_conditions'):
+                        particular_solution = apply_initial_conditions(general_solution, conditions, constant_values, steps)
                     
-                    if particular_solution and particular_solution != general_solution:
+                    if particular_solution is not None and particular_solution != general_solution:
                         solution = particular_solution  # Usar solución particular para mostrar
                 else:
-                    steps.append(f"   ⚠️ No se detectaron condiciones iniciales válidas.")
-                    steps.append(f"   Se mostrará únicamente la solución general.")
+                    steps.add('warning', 'no_valid_conditions')
+                    steps.add('text', 'showing_general_only')
         else:
             # Si no hay solución, agregar mensaje informativo
-            if not any("❌" in step for step in steps):
-                steps.append("❌ No se pudo encontrar una solución para esta ecuación.")
+            if not steps.has_errors():
+                steps.add('error', 'no_solution')
         
     except Exception as e:
-        steps.append(f"❌ Error general al procesar: {str(e)}")
+        steps.add('error', 'general_error', error=str(e))
         import traceback
-        steps.append(f"📄 Detalles técnicos: {traceback.format_exc()[:500]}")
+        steps.add('text', 'general_traceback', details=traceback.format_exc()[:500])
+    
+    # Condiciones en dos puntos sin solución particular simbólica: problema de contorno numérico
+    if initial_conditions_str and eq is not None and not has_determined_constants(particular_solution):
+        if conditions is None:
+            conditions, _ = parse_initial_conditions(initial_conditions_str, StepLog())
+        if bvp.is_boundary_problem(conditions):
+            if solution is None:
+                steps.begin_summary()
+            numeric_solution = numeric_boundary_solution(eq, conditions, steps)
+    
+    # Con el pre-paso de racionalización la solución final vuelve a decimales
+    exact_general, exact_particular = general_solution, particular_solution
+    exact_solution = None
+    if rationalized and solution is not None:
+        with current_recorder().span('rationalize'):
+            exact_solution = solution
+            if particular_solution is not None and particular_solution != general_solution:
+                particular_solution = rationals.to_floats(particular_solution, rationalize)
+                solution = particular_solution
+            else:
+                solution = rationals.to_floats(solution, rationalize)
+                general_solution = solution if general_solution is not None else None
+                particular_solution = solution if particular_solution is not None else None
+        steps.add('heading', 'exact_solution_heading', digits=rationalize)
+        for sol in (exact_solution if isinstance(exact_solution, list) else [exact_solution]):
+            steps.add('text', 'expression', expr=display(sol))
     
     # Convertir solución a LaTeX, manejando listas
-    solution_latex = None
-    general_solution_latex = None
-    particular_solution_latex = None
+    with current_recorder().span('latex'):
+        solution_latex = None
+        general_solution_latex = None
+        particular_solution_latex = None
+        # Con format='mathml' o 'text' la solución también se envía en ese formato
+        # (el texto en sintaxis de SymPy es lo que acepta /export)
+        math_fields = {}
     
-    try:
-        if solution is not None:
-            # Mostrar solución particular si existe, sino la general
-            display_solution = particular_solution if (particular_solution and particular_solution != general_solution) else solution
+        try:
+            if solution is not None:
+                # Mostrar solución particular si existe, sino la general
+                display_solution = particular_solution if (particular_solution is not None and particular_solution != general_solution) else solution
             
-            if isinstance(display_solution, list):
-                # Si hay múltiples soluciones, formatearlas juntas
-                solution_latex = '\\begin{cases} ' + ' \\\\ '.join([latex(sol) for sol in display_solution]) + ' \\end{cases}'
-            else:
-                solution_latex = latex(display_solution)
+                solution_latex = render_solution(display_solution)
+                if fmt != 'latex':
+                    math_fields[f'solution_{fmt}'] = render_solution(display_solution, fmt)
             
-            # También preparar LaTeX para solución general y particular si existen
-            if general_solution:
-                if isinstance(general_solution, list):
-                    general_solution_latex = '\\begin{cases} ' + ' \\\\ '.join([latex(sol) for sol in general_solution]) + ' \\end{cases}'
-                else:
-                    general_solution_latex = latex(general_solution)
+                # También preparar LaTeX para solución general y particular si existen
+                if general_solution is not None:
+                    general_solution_latex = render_solution(general_solution)
+                    if fmt != 'latex':
+                        math_fields[f'general_solution_{fmt}'] = render_solution(general_solution, fmt)
             
-            if particular_solution and particular_solution != general_solution:
-                if isinstance(particular_solution, list):
-                    particular_solution_latex = '\\begin{cases} ' + ' \\\\ '.join([latex(sol) for sol in particular_solution]) + ' \\end{cases}'
-                else:
-                    particular_solution_latex = latex(particular_solution)
+                if particular_solution is not None and particular_solution != general_solution:
+                    particular_solution_latex = render_solution(particular_solution)
+                    if fmt != 'latex':
+                        math_fields[f'particular_solution_{fmt}'] = render_solution(particular_solution, fmt)
             
-            # Agregar información sobre constantes de integración y resumen
-            steps.append(f"")
-            steps.append(f"📌 **Paso 6: Resumen final**")
+                # Agregar información sobre constantes de integración y resumen
+                steps.begin_summary()
+                steps.add('text', 'blank')
+                steps.add('heading', 'step6_heading')
             
-            # Mostrar solución general si hay solución particular
-            if particular_solution and particular_solution != general_solution:
-                steps.append(f"")
-                steps.append(f"📊 **Solución General:**")
-                if isinstance(general_solution, list):
-                    for i, sol in enumerate(general_solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
-                else:
-                    steps.append(f"   $$latex({latex(general_solution)})$$")
+                # Mostrar solución general si hay solución particular
+                if particular_solution is not None and particular_solution != general_solution:
+                    steps.add('text', 'blank')
+                    steps.add('heading', 'general_solution_heading')
+                    if isinstance(general_solution, list):
+                        for i, sol in enumerate(general_solution, 1):
+                            steps.add('text', 'solution_n', n=i, solution=display(sol))
+                    else:
+                        steps.add('text', 'expression', expr=display(general_solution))
                 
-                steps.append(f"")
-                steps.append(f"📊 **Solución Particular (con condiciones iniciales aplicadas):**")
-                if isinstance(particular_solution, list):
-                    for i, sol in enumerate(particular_solution, 1):
-                        steps.append(f"   Solución {i}: $$latex({latex(sol)})$$")
+                    steps.add('text', 'blank')
+                    steps.add('heading', 'particular_solution_heading')
+                    if isinstance(particular_solution, list):
+                        for i, sol in enumerate(particular_solution, 1):
+                            steps.add('text', 'solution_n', n=i, solution=display(sol))
+                    else:
+                        steps.add('text', 'expression', expr=display(particular_solution))
                 else:
-                    steps.append(f"   $$latex({latex(particular_solution)})$$")
-            else:
-                # Detectar constantes de integración en la solución general
-                from sympy import Symbol as SympySymbol, Wild
-                constants = []
-                sol_to_check = general_solution if general_solution else solution
-                if isinstance(sol_to_check, list):
-                    for sol in sol_to_check:
-                        # Buscar todos los símbolos que no sean x ni y
-                        for s in sol.free_symbols:
+                    # Detectar constantes de integración en la solución general
+                    from sympy import Symbol as SympySymbol, Wild
+                    constants = []
+                    sol_to_check = general_solution if general_solution is not None else solution
+                    if isinstance(sol_to_check, list):
+                        for sol in sol_to_check:
+                            # Buscar todos los símbolos que no sean x ni y
+                            for s in sol.free_symbols:
+                                s_str = str(s)
+                                if s_str not in ['x', 'y'] and not s_str.startswith('_') and isinstance(s, SympySymbol):
+                                    # Filtrar símbolos que parecen constantes de integración
+                                    if any(s_str.startswith(prefix) for prefix in ['C', 'c', 'K', 'k', 'A', 'a', 'B', 'b']):
+                                        constants.append(s_str)
+                    else:
+                        for s in sol_to_check.free_symbols:
                             s_str = str(s)
                             if s_str not in ['x', 'y'] and not s_str.startswith('_') and isinstance(s, SympySymbol):
-                                # Filtrar símbolos que parecen constantes de integración
                                 if any(s_str.startswith(prefix) for prefix in ['C', 'c', 'K', 'k', 'A', 'a', 'B', 'b']):
                                     constants.append(s_str)
-                else:
-                    for s in sol_to_check.free_symbols:
-                        s_str = str(s)
-                        if s_str not in ['x', 'y'] and not s_str.startswith('_') and isinstance(s, SympySymbol):
-                            if any(s_str.startswith(prefix) for prefix in ['C', 'c', 'K', 'k', 'A', 'a', 'B', 'b']):
-                                constants.append(s_str)
                 
-                if constants:
-                    unique_constants = sorted(set(constants))
-                    if len(unique_constants) == 1:
-                        steps.append(f"   La solución contiene la constante de integración: ${unique_constants[0]}$")
-                        steps.append(f"   Esta constante puede tomar cualquier valor real.")
-                        steps.append(f"   Para obtener una solución particular, proporcione una condición inicial (ej: y(0)=3).")
-                    else:
-                        steps.append(f"   La solución contiene las siguientes constantes de integración: {', '.join([f'${c}$' for c in unique_constants])}")
-                        steps.append(f"   Estas constantes pueden tomar cualquier valor real.")
-                        steps.append(f"   Para obtener una solución particular, proporcione condiciones iniciales (ej: y(0)=3, y'(0)=1).")
-                else:
-                    # Intentar detectar si hay símbolos que puedan ser constantes
-                    all_symbols = set()
-                    if isinstance(sol_to_check, list):
-                        for sol in sol_to_check:
-                            all_symbols.update([str(s) for s in sol.free_symbols if str(s) not in ['x', 'y']])
+                    if constants:
+                        unique_constants = sorted(set(constants))
+                        if len(unique_constants) == 1:
+                            steps.add('text', 'free_constant', constant=Symbol(unique_constants[0]))
+                            steps.add('text', 'free_constant_note')
+                            steps.add('text', 'free_constant_hint')
+                        else:
+                            steps.add('text', 'free_constants', constants=[Symbol(c) for c in unique_constants])
+                            steps.add('text', 'free_constants_note')
+                            steps.add('text', 'free_constants_hint')
                     else:
-                        all_symbols = set([str(s) for s in sol_to_check.free_symbols if str(s) not in ['x', 'y']])
+                        # Intentar detectar si hay símbolos que puedan ser constantes
+                        all_symbols = set()
+                        if isinstance(sol_to_check, list):
+                            for sol in sol_to_check:
+                                all_symbols.update([str(s) for s in sol.free_symbols if str(s) not in ['x', 'y']])
+                        else:
+                            all_symbols = set([str(s) for s in sol_to_check.free_symbols if str(s) not in ['x', 'y']])
                     
-                    if all_symbols:
-                        steps.append(f"   Nota: La solución puede depender de valores iniciales o condiciones de contorno.")
+                        if all_symbols:
+                            steps.add('text', 'may_depend_note')
             
-            steps.append(f"")
-            steps.append(f"✅ **Resumen:** La ecuación diferencial ha sido resuelta exitosamente.")
+                steps.add('text', 'blank')
+                steps.add('success', 'solved')
             
-    except Exception as latex_error:
-        steps.append(f"⚠️ Advertencia: Error al convertir solución a LaTeX: {str(latex_error)}")
-        if solution is not None:
-            try:
-                solution_latex = str(solution)
-            except:
-                solution_latex = "Solución encontrada pero no se pudo formatear"
+        except Exception as latex_error:
+            steps.add('warning', 'render_error', error=str(latex_error))
+            if solution is not None:
+                try:
+                    solution_latex = str(solution)
+                except:
+                    solution_latex = "Solución encontrada pero no se pudo formatear"
     
-    return jsonify({
+    with current_recorder().span('steps'):
+        rendered_steps = steps.render(verbosity, fmt)
+    
+    result = {
         'success': solution is not None,
         'solution': solution_latex,
         'general_solution': general_solution_latex,
         'particular_solution': particular_solution_latex,
-        'steps': steps
-    })
+        'steps': rendered_steps
+    }
+    result.update(math_fields)
+    if numeric_solution is not None:
+        result['numeric_solution'] = numeric_solution
+    if exact_solution is not None:
+        result['exact_solution'] = render_solution(exact_solution)
+    if verify_mode and exact_general is not None:
+        with current_recorder().span('verify'):
+            result['verification'] = verify_solution(eq, exact_general, exact_particular, conditions, verify_mode)
+    return result
+
+def verify_solution(eq, general_solution, particular_solution, conditions, mode):
+    """Informe de verify.verify; los errores inesperados dejan la verificación como no concluyente"""
+    if particular_solution is not None and particular_solution == general_solution:
+        particular_solution = None
+    try:
+        return verify.verify(eq, Function('y')(symbols('x')), general_solution, particular_solution,
+                             conditions or (), mode)
+    except cancellation.Cancelled:
+        raise
+    except Exception as e:
+        return {'mode': mode, 'status': verify.INCONCLUSIVE, 'confident': False, 'reason': str(e)}
+
+def has_determined_constants(solution):
+    """La solución existe y no le quedan constantes de integración (C1, C2, ...) libres"""
+    if solution is None:
+        return False
+    solutions = solution if isinstance(solution, list) else [solution]
+    return not any(re.fullmatch(r'C\d+', str(symbol)) for sol in solutions for symbol in sol.free_symbols)
+
+def numeric_boundary_solution(eq, conditions, steps):
+    """Resuelve numéricamente el problema de contorno (bvp.py) y resume el resultado en los pasos"""
+    steps.add('text', 'blank')
+    steps.add('heading', 'bvp_heading')
+    try:
+        with current_recorder().span('bvp'):
+            result = bvp.BoundaryProblem(eq, Function('y')(symbols('x')), conditions).solve()
+    except ValueError as e:
+        steps.add('warning', 'bvp_failed', error=str(e))
+        return None
+    except Exception as e:
+        # Se llama fuera del try general de solve_equation: un fallo aquí no debe tumbar la respuesta
+        steps.add('warning', 'bvp_failed', error=str(e))
+        return None
+    method_name = {bvp.SHOOTING: 'disparo (RK4)', bvp.FINITE_DIFFERENCES: 'diferencias finitas'}[result['method']]
+    xs, ys = result['x'], result['y']
+    steps.add('text', 'bvp_method', method=method_name, points=len(xs), start=xs[0], end=xs[-1])
+    for i in sorted({round(k * (len(xs) - 1) / 4) for k in range(5)}):
+        steps.add('text', 'expression', expr=Eq(Symbol(f"y({xs[i]:.4g})"), Float(ys[i], 8)))
+    diagnostics = result['diagnostics']
+    estimate = diagnostics.get('error_estimate')
+    if estimate is None:
+        steps.add('text', 'bvp_residual', residual=diagnostics['boundary_residual'])
+    else:
+        steps.add('text', 'bvp_residual_estimate', residual=diagnostics['boundary_residual'], estimate=estimate)
+    return result
+
+def solve_system_equation(equation_str, initial_conditions_str='', verbosity='full', fmt='latex'):
+    """Sistema de EDO de primer orden (systems.py), con la misma respuesta que solve_equation"""
+    steps = StepLog()
+    general_solution = None
+    particular_solution = None
+    try:
+        with current_recorder().span('system'):
+            general_solution, particular_solution = systems.solve_system(equation_str, initial_conditions_str, steps)
+    except ValueError as e:
+        steps.add('error', 'system_input_error', error=str(e))
+    except Exception as e:
+        steps.add('error', 'system_error', error=str(e))
+    
+    solution = particular_solution if particular_solution is not None else general_solution
+    result = {
+        'success': solution is not None,
+        'solution': None,
+        'general_solution': None,
+        'particular_solution': None,
+    }
+    with current_recorder().span('latex'):
+        if solution is not None:
+            steps.begin_summary()
+            steps.add('text', 'blank')
+            steps.add('heading', 'system_summary_heading')
+            if particular_solution is not None:
+                steps.add('heading', 'general_solution_heading')
+                for equation in general_solution:
+                    steps.add('text', 'expression', expr=display(equation))
+                steps.add('heading', 'particular_solution_heading')
+            for equation in solution:
+                steps.add('text', 'expression', expr=display(equation))
+            steps.add('success', 'system_solved')
+            fields = {'solution': solution, 'general_solution': general_solution,
+                      'particular_solution': particular_solution}
+            for field, value in fields.items():
+                if value is None:
+                    continue
+                result[field] = render_solution(value)
+                if fmt == 'mathml':
+                    result[f'{field}_mathml'] = render_solution(value, 'mathml')
+    with current_recorder().span('steps'):
+        result['steps'] = steps.render(verbosity, fmt)
+    return result
+
+def profiled_solve(profile, *args):
+    """
+    solve_equation, bajo cProfile si se pide (profile 'request' o 'auto') en el proceso
+    que de verdad resuelve; el resumen del perfil pedido se adjunta al resultado.
+    """
+    if not profile:
+        return solve_equation(*args)
+    result, profiler, seconds = profiling.profile_call(solve_equation, *args)
+    summary = profiling.report(profiler, seconds, auto=profile == 'auto')
+    if summary is not None:
+        result['profile'] = summary
+    return result
+
+def solve_with_timings(equation_str, method='auto', initial_conditions_str='', verbosity='full', fmt='latex',
+                       verify_mode=None, rationalize=None, profile=None):
+    """Resuelve con un recorder propio y devuelve (resultado, timings); es lo que ejecutan los workers"""
+    recorder = SpanRecorder()
+    with recording(recorder):
+        result = profiled_solve(profile, equation_str, method, initial_conditions_str, verbosity, fmt, verify_mode,
+                                rationalize)
+    sympy_cache.policy.after_request()
+    return result, recorder.as_dict()
+
+def run_solver(equation_str, method='auto', initial_conditions_str='', deadline=None, verbosity='full', fmt='latex',
+               verify_mode=None, rationalize=None, profile=None):
+    """
+    Ejecuta solve_equation en un worker si están activados (o en este proceso si no).
+    Los fallos por memoria, tiempo o muerte del worker se devuelven como respuesta
+    con un campo 'error' estructurado. Con `deadline` (time.monotonic()) el tiempo
+    del worker se recorta a lo que queda del plazo de la petición. Si se cancela
+    la petición, se termina el worker y se lanza cancellation.Cancelled. Con profile
+    ('request' o 'auto') el cProfile se ejecuta donde se resuelve, también en el worker.
+    """
+    cancel = cancellation.current_token()
+    cancel.check()
+    if solver_pool is None:
+        result = profiled_solve(profile, equation_str, method, initial_conditions_str, verbosity, fmt, verify_mode,
+                                rationalize)
+        sympy_cache.policy.after_request()
+        return result
+    
+    timeout = config.SOLVE_TIMEOUT_S or None
+    if deadline is not None:
+        remaining = max(0.001, deadline - time.monotonic())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    try:
+        result, timings = solver_pool.run(solve_with_timings, equation_str, method, initial_conditions_str,
+                                          verbosity, fmt, verify_mode, rationalize, profile,
+                                          timeout=timeout, cancel=cancel)
+    except WorkerCancelled:
+        raise cancellation.Cancelled(cancel.reason)
+    except WorkerError as worker_error:
+        metrics.WORKER_FAILURES.inc(kind=worker_error.kind)
+        messages = {
+            'memory_limit': '❌ El cálculo superó el límite de memoria y fue detenido.',
+            'timeout': '❌ El cálculo tardó demasiado y fue detenido.',
+        }
+        return {
+            'success': False,
+            'solution': None,
+            'steps': [messages.get(worker_error.kind, f'❌ Error en el proceso de cálculo: {worker_error}')],
+            'error': worker_error.as_dict()
+        }
+    current_recorder().merge(timings)
+    metrics.observe_timings(timings)
+    return result
+
+@app.route('/')
+def index():
+    if MATHJAX_VERSION:
+        mathjax_url = url_for('mathjax_asset', version=MATHJAX_VERSION, filename='mml-chtml.js')
+    else:
+        mathjax_url = MATHJAX_CDN_URL
+    return render_template('index.html', mathjax_url=mathjax_url, cache_version=httpcache.response_version())
+
+@app.route('/vendor/mathjax/<version>/<path:filename>')
+def mathjax_asset(version, filename):
+    """Archivos de la copia local de MathJax; inmutables mientras no cambie la versión"""
+    if version != MATHJAX_VERSION:
+        abort(404)
+    response = send_from_directory(config.MATHJAX_DIR, filename, max_age=MATHJAX_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/solve', methods=['POST'])
+@ensure_json_response
+def solve():
+    try:
+        data = request.json
+        if not data:
+            return jsonify({
+                'success': False,
+                'solution': None,
+                'steps': ['❌ Error: No se recibieron datos en la petición']
+            }), 400
+        
+        equation_str = data.get('equation', '')
+        method = data.get('method', 'auto')
+        initial_conditions_str = data.get('initial_conditions', '')
+        want_timings = bool(data.get('timings')) or request.args.get('timings') == '1' or config.ALWAYS_INCLUDE_TIMINGS
+        want_profile = str(data.get('profile', request.args.get('profile', ''))).lower() in ('1', 'true')
+        # Nivel de detalle y formato de los pasos (los pasos no pedidos no se renderizan)
+        verbosity, fmt = parse_step_options(data.get('verbosity', request.args.get('verbosity')),
+                                            data.get('format', request.args.get('format')))
+        # Verificación numérica opcional de la solución: 'fast' (o true) o 'full' (con checkodesol)
+        verify_mode = verify.parse_mode(data.get('verify', request.args.get('verify')))
+        # Pre-paso de racionalización de los decimales y cifras de la solución final
+        rationalize = rationals.parse_precision(data.get('rationalize', request.args.get('rationalize')),
+                                                data.get('precision', request.args.get('precision')))
+        # Identificador opcional generado por el navegador para POST /solve/cancel
+        request_id = str(data.get('request_id') or '')
+        if not cancellation.REQUEST_ID_RE.match(request_id):
+            request_id = None
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'solution': None,
+            'steps': [f'❌ Error al procesar la petición: {str(e)}']
+        }), 400
+    
+    if want_profile and not profiling.is_admin(request):
+        return jsonify({
+            'success': False,
+            'solution': None,
+            'steps': ['❌ Error: El perfilado requiere credenciales de administrador']
+        }), 403
+    result = execute_solve(equation_str, method, initial_conditions_str, verbosity, fmt, verify_mode, rationalize,
+                           want_timings, want_profile, request_id)
+    return jsonify(result) if isinstance(result, dict) else result
+
+@app.route('/solve', methods=['GET'])
+@ensure_json_response
+def solve_get():
+    """
+    Variante cacheable de /solve: GET /solve?eq=...&method=...&ic=... con los mismos
+    verbosity, format, verify, rationalize y precision (ver httpcache.py). Las consultas
+    no canónicas se redirigen a la canónica; con If-None-Match o con la respuesta ya
+    en la caché no se llega a resolver.
+    """
+    values = httpcache.read_query(request.args)
+    try:
+        if not values['eq'].strip():
+            raise ValueError('Falta la ecuación (eq)')
+        verbosity, fmt = parse_step_options(values['verbosity'], values['format'])
+        verify_mode = verify.parse_mode(values['verify'] or None)
+        rationalize = rationals.parse_precision(values['rationalize'] or None, values['precision'] or None)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'solution': None,
+            'steps': [f'❌ Error al procesar la petición: {str(e)}']
+        }), 400
+    
+    equation_str, method, initial_conditions_str = canonical_request_key(values['eq'], values['method'], values['ic'])
+    canonical = {
+        'eq': equation_str, 'method': method, 'ic': initial_conditions_str,
+        'verbosity': verbosity, 'format': fmt, 'verify': verify_mode or '',
+        # rationalize sólo aparece si difiere del valor por defecto del servidor
+        'rationalize': '' if bool(rationalize) == config.RATIONALIZE else ('1' if rationalize else '0'),
+        'precision': str(rationalize) if rationalize and rationalize != rationals.DEFAULT_DIGITS else '',
+    }
+    if not httpcache.is_canonical(request.args, canonical):
+        metrics.HTTP_CACHE.inc(result='redirect')
+        response = redirect(f"{url_for('solve_get')}?{httpcache.canonical_query(canonical)}", 301)
+        response.cache_control.public = True
+        response.cache_control.max_age = int(config.HTTP_CACHE_MAX_AGE)
+        return response
+    
+    etag = httpcache.etag_for((equation_str, method, initial_conditions_str, verbosity, fmt, verify_mode, rationalize))
+    matched = httpcache.matching_etag(request, etag)
+    if matched:
+        metrics.HTTP_CACHE.inc(result='not_modified')
+        return httpcache.set_cacheable(Response(status=304), matched)
+    entry = httpcache.responses.get(etag)
+    if entry is not None:
+        metrics.HTTP_CACHE.inc(result='hit')
+        return httpcache.cached_response(Response, entry, request, etag)
+    
+    metrics.HTTP_CACHE.inc(result='miss')
+    # El request_id (para /solve/cancel) va en una cabecera: no forma parte de la URL cacheable
+    request_id = request.headers.get('X-Request-Id', '')
+    if not cancellation.REQUEST_ID_RE.match(request_id):
+        request_id = None
+    result = execute_solve(equation_str, method, initial_conditions_str, verbosity, fmt, verify_mode, rationalize,
+                           request_id=request_id)
+    if not isinstance(result, dict):
+        return httpcache.set_uncacheable(make_response(result))
+    response = jsonify(result)
+    # Sólo se reutilizan las soluciones: un fallo puede deberse a un límite de tiempo o de memoria
+    if not result['success']:
+        return httpcache.set_uncacheable(response)
+    entry = httpcache.responses.put(etag, response.get_data())
+    return httpcache.cached_response(Response, entry, request, etag)
+
+@app.after_request
+def compress_response(response):
+    """gzip de las respuestas JSON grandes (los pasos en LaTeX) si el cliente lo acepta"""
+    return httpcache.compress(response, request)
+
+def execute_solve(equation_str, method, initial_conditions_str, verbosity, fmt, verify_mode=None, rationalize=None,
+                  want_timings=False, want_profile=False, request_id=None):
+    """
+    Resuelve una petición a /solve (POST o GET) con perfilado, peticiones compartidas,
+    control de admisión, cancelación y métricas. Devuelve el diccionario de la
+    respuesta o, si no se llegó a resolver, la respuesta de error de Flask.
+    """
+    profile = 'request' if want_profile else ('auto' if profiling.should_auto_profile() else None)
+    
+    # Solo se mide si el cliente lo pide o si hay que vigilar peticiones lentas
+    recorder = SpanRecorder() if (want_timings or config.SLOW_REQUEST_MS > 0) else NULL_RECORDER
+    method_label = method if (method in ('auto', 'system') or method in method_functions) else 'other'
+    outcome = 'error'
+    start = time.perf_counter()
+    deadline = time.monotonic() + config.REQUEST_DEADLINE_S if config.REQUEST_DEADLINE_S > 0 else None
+    # cancel: esta petición (desconexión o /solve/cancel); work: el cálculo, que
+    # con peticiones compartidas sólo se cancela cuando lo abandonan todas
+    cancel = cancellation.CancelToken()
+    work = cancel
+    cancellation.monitor.watch(cancel, cancellation.request_socket(request.environ), request_id)
+    metrics.IN_FLIGHT.inc()
+    def compute():
+        with solver_slot(deadline=deadline, cancel=work), recording(recorder), cancellation.cancellable(work):
+            return run_solver(equation_str, method, initial_conditions_str, deadline, verbosity, fmt, verify_mode,
+                              rationalize, profile)
+    
+    try:
+        if profile:
+            # Las peticiones perfiladas no se comparten: necesitan su propio perfil
+            result = compute()
+        elif config.COALESCE_REQUESTS:
+            key = canonical_request_key(equation_str, method, initial_conditions_str) + (verbosity, fmt, verify_mode,
+                                                                                         rationalize)
+            work = cancellation.CancelToken()
+            # El motivo de cada petición (desconexión, /solve/cancel) es suyo; el cálculo
+            # compartido sólo se cancela cuando se han ido todas
+            shared_result, shared = inflight_solves.do(key, compute, cancel=cancel,
+                                                       on_abandoned=lambda: work.cancel(cancellation.ABANDONED))
+            # Copia superficial: cada petición añade sus propias claves (timings, profile)
+            result = dict(shared_result)
+            if shared:
+                metrics.COALESCED.inc()
+                recorder.add('coalesced_wait', (time.perf_counter() - start) * 1000)
+        else:
+            result = compute()
+        outcome = 'success' if result['success'] else result.get('error', {}).get('type', 'failure')
+    except Overloaded as overloaded:
+        outcome = 'rejected'
+        response = jsonify({
+            'success': False,
+            'solution': None,
+            'steps': [f'⏳ El servidor está saturado ({overloaded.reason}). Inténtalo de nuevo en unos segundos.']
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(overloaded.retry_after)
+        return response
+    except cancellation.Cancelled as cancelled:
+        outcome = 'cancelled'
+        metrics.CANCELLATIONS.inc(reason=cancelled.reason)
+        # 499 (convención de nginx): normalmente ya no hay nadie que lea la respuesta
+        return jsonify({
+            'success': False,
+            'solution': None,
+            'steps': ['⏹️ El cálculo fue cancelado.']
+        }), 499
+    finally:
+        elapsed = time.perf_counter() - start
+        cancellation.monitor.unwatch(cancel)
+        metrics.IN_FLIGHT.dec()
+        metrics.REQUESTS.inc(method=method_label, outcome=outcome)
+        metrics.REQUEST_LATENCY.observe(elapsed, method=method_label, outcome=outcome)
+        capture = get_capture()
+        if capture is not None and capture.sampled():
+            capture.record(equation_str, method, initial_conditions_str, elapsed * 1000, outcome)
+    
+    log_if_slow(recorder, equation_str, method, config.SLOW_REQUEST_MS)
+    if want_timings:
+        result['timings'] = recorder.as_dict()
+    return result
+
+def parse_series_request(data):
+    """Valida la petición a /series; ValueError con el motivo si no es válida"""
+    equation_str = str(data.get('equation') or '').strip()
+    if not equation_str:
+        raise ValueError('Falta la ecuación')
+    eq = parse_equation_string(equation_str)
+    y = Function('y')(symbols('x'))
+    number_dict = {'pi': sympy_pi, 'E': exp(1), 'e': exp(1), 'sqrt': sqrt}
+    x0 = None
+    if data.get('x0') not in (None, ''):
+        x0 = sympy_parse_expr(str(data['x0']), local_dict=number_dict, transformations=transformations)
+        if x0.free_symbols or not x0.is_real:
+            raise ValueError('x0 debe ser un número real')
+    # Las condiciones tienen que estar en el punto de desarrollo (si no se da x0, se toma de ellas)
+    conditions, _ = parse_initial_conditions(str(data.get('initial_conditions') or ''), StepLog())
+    initial_values = {}
+    for x_val, y_val, deriv_order in conditions:
+        x0 = x_val if x0 is None else x0
+        if simplify(x_val - x0) != 0:
+            raise ValueError(f'Las condiciones iniciales deben darse en x0 = {x0}')
+        initial_values[deriv_order] = y_val
+    x0 = 0 if x0 is None else x0
+    try:
+        start = int(data.get('start', 0))
+        count = int(data.get('terms', config.SERIES_TERMS))
+    except (TypeError, ValueError):
+        raise ValueError('start y terms deben ser enteros')
+    if start < 0 or count < 1 or start + count > config.SERIES_MAX_TERMS:
+        raise ValueError(f'Se pueden pedir como máximo {config.SERIES_MAX_TERMS} términos (start + terms)')
+    grid = data.get('grid')
+    if grid is not None:
+        try:
+            grid = (float(grid['from']), float(grid['to']), int(grid.get('points', 101)))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('grid debe ser {"from": a, "to": b, "points": n}')
+        if not 2 <= grid[2] <= 10000:
+            raise ValueError('grid.points debe estar entre 2 y 10000')
+    constants = {str(name): float(value) for name, value in (data.get('constants') or {}).items()}
+    return eq, y, x0, initial_values, start, start + count, grid, constants
+
+def _finite(value):
+    # JSON no admite Infinity: un radio infinito se envía como la cadena 'inf'
+    return 'inf' if value == float('inf') else value
+
+def series_summary(solution, y, stop, grid, constants, fmt):
+    """Datos que acompañan a los términos: suma parcial, radio y evaluación en la malla"""
+    summary = {
+        'partial_sum': render_solution(solution.as_equation(y, stop), fmt),
+        'computed_terms': solution.computed(),
+        'radius': {name: _finite(value) for name, value in solution.radius(stop).items()},
+    }
+    if grid is not None:
+        import numpy as np
+        xs = np.linspace(*grid)
+        values = solution.evaluate(xs, stop, constants)
+        summary['grid'] = {'x': xs.tolist(), 'y': np.real(values).tolist()}
+        if np.iscomplexobj(values):
+            summary['grid']['y_imag'] = np.imag(values).tolist()
+    return summary
+
+@app.route('/series', methods=['POST'])
+@ensure_json_response
+def series_endpoint():
+    """
+    Solución en serie de potencias en torno a x0, término a término. Los
+    coeficientes quedan en caché por ecuación, x0 y condiciones: pedir después
+    más términos (start/terms) sólo calcula los nuevos. Con "stream": true la
+    respuesta es NDJSON y cada término se envía en cuanto se calcula.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        eq, y, x0, initial_values, start, stop, grid, constants = parse_series_request(data)
+        _, fmt = parse_step_options(None, data.get('format'))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # Si la caché ya cubre los términos pedidos basta el carril ligero
+    cached = series.peek(eq, x0, initial_values)
+    already_computed = cached.computed() if cached is not None else 0
+    lane = LIGHT if already_computed >= stop else HEAVY
+    deadline = time.monotonic() + config.REQUEST_DEADLINE_S if config.REQUEST_DEADLINE_S > 0 else None
+    cancel = cancellation.CancelToken()
+    cancellation.monitor.watch(cancel, cancellation.request_socket(request.environ), None)
+    # Plaza de admisión y vigilancia de la conexión; se liberan al terminar la respuesta
+    stack = ExitStack()
+    stack.callback(cancellation.monitor.unwatch, cancel)
+    try:
+        stack.enter_context(solver_slot(lane, deadline=deadline, cancel=cancel))
+        with cancellation.cancellable(cancel):
+            solution = series.get_solution(eq, y, x0, initial_values)
+    except Overloaded as overloaded:
+        stack.close()
+        response = jsonify({'success': False, 'error': f'El servidor está saturado ({overloaded.reason})'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(overloaded.retry_after)
+        return response
+    except cancellation.Cancelled:
+        stack.close()
+        return jsonify({'success': False, 'error': 'El cálculo fue cancelado'}), 499
+    except ValueError as e:
+        stack.close()
+        return jsonify({'success': False, 'error': str(e)}), 422
+    except BaseException:
+        stack.close()
+        raise
+
+    header = {'success': True, 'kind': solution.kind, 'x0': str(solution.x0), 'order': solution.order,
+              'start': start, 'stop': stop, 'reused_terms': max(0, min(stop, already_computed) - start)}
+    if solution.kind == series.FROBENIUS:
+        header['exponents'] = [str(r) for r in solution.exponents]
+        header['indicial_equation'] = render_solution(solution.indicial, fmt)
+
+    def rendered_terms():
+        for k, term in solution.terms(start, stop):
+            yield {'k': k, 'term': render_solution(term, fmt)}
+
+    if not data.get('stream'):
+        try:
+            with cancellation.cancellable(cancel):
+                result = dict(header, terms=list(rendered_terms()))
+                result.update(series_summary(solution, y, stop, grid, constants, fmt))
+        except cancellation.Cancelled:
+            return jsonify({'success': False, 'error': 'El cálculo fue cancelado'}), 499
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 422
+        finally:
+            stack.close()
+        if solution.kind == series.FROBENIUS and solution.note:
+            result['note'] = solution.note
+        return jsonify(result)
+
+    def generate():
+        # Una línea JSON por mensaje: cabecera, un término por línea y el resumen final
+        yield json.dumps(dict(header, type='header'), ensure_ascii=False) + '\n'
+        for item in rendered_terms():
+            yield json.dumps(dict(item, type='term'), ensure_ascii=False) + '\n'
+        try:
+            done = series_summary(solution, y, stop, grid, constants, fmt)
+        except ValueError as e:
+            done = {'error': str(e)}
+        if solution.kind == series.FROBENIUS and solution.note:
+            done['note'] = solution.note
+        yield json.dumps(dict(done, type='done'), ensure_ascii=False) + '\n'
+
+    # Sin token en el generador: si el cliente se desconecta, el servidor cierra el generador
+    # en el siguiente término y la plaza se libera al cerrar la respuesta
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(stack.close)
+    return response
+
+def _window(value, default):
+    try:
+        low, high = (float(v) for v in (value if value is not None else default))
+    except (TypeError, ValueError):
+        raise ValueError('Los intervalos de x e y deben ser [mínimo, máximo]')
+    if not (low < high) or not all(map(math.isfinite, (low, high))):
+        raise ValueError('Los intervalos de x e y deben ser [mínimo, máximo] finitos con mínimo < máximo')
+    return low, high
+
+def parse_field_request(data):
+    """Valida la petición a /field; ValueError con el motivo si no es válida"""
+    equation_str = str(data.get('equation') or '').strip()
+    if not equation_str:
+        raise ValueError('Falta la ecuación')
+    eq = parse_equation_string(equation_str)
+    y = Function('y')(symbols('x'))
+    try:
+        parameters = {str(name): float(value) for name, value in (data.get('parameters') or {}).items()}
+        points = int(data.get('points', 25))
+        steps = int(data.get('steps', 200))
+        starts = [(float(a), float(b)) for a, b in (data.get('trajectories') or [])]
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError('parameters, points, steps o trajectories no son válidos')
+    if not 2 <= points <= config.FIELD_MAX_POINTS:
+        raise ValueError(f'points debe estar entre 2 y {config.FIELD_MAX_POINTS}')
+    if not 1 <= steps <= config.FIELD_MAX_STEPS:
+        raise ValueError(f'steps debe estar entre 1 y {config.FIELD_MAX_STEPS}')
+    if len(starts) > config.FIELD_MAX_TRAJECTORIES:
+        raise ValueError(f'Como máximo {config.FIELD_MAX_TRAJECTORIES} trayectorias')
+    bounds = (_window(data.get('x'), (-5, 5)), _window(data.get('y'), (-5, 5)))
+    return eq, y, parameters, bounds, points, steps, starts
+
+@app.route('/field', methods=['POST'])
+@ensure_json_response
+def field_endpoint():
+    """
+    Campo de direcciones (orden 1) o retrato de fase (orden 2 autónoma) en una
+    malla, con trayectorias opcionales. Los arrays van en float32: en base64
+    dentro del JSON o, con "encoding": "binary", como cuerpo binario (ver
+    fields.encode_binary).
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    encoding = str(data.get('encoding') or 'base64')
+    try:
+        if encoding not in ('base64', 'binary'):
+            raise ValueError('encoding debe ser base64 o binary')
+        eq, y, parameters, bounds, points, steps, starts = parse_field_request(data)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # Con el campo ya compilado sólo queda trabajo de NumPy: basta el carril ligero
+    lane = LIGHT if fields.peek(eq, parameters) is not None else HEAVY
+    deadline = time.monotonic() + config.REQUEST_DEADLINE_S if config.REQUEST_DEADLINE_S > 0 else None
+    cancel = cancellation.CancelToken()
+    cancellation.monitor.watch(cancel, cancellation.request_socket(request.environ), None)
+    try:
+        with solver_slot(lane, deadline=deadline, cancel=cancel), cancellation.cancellable(cancel):
+            field = fields.get_field(eq, y, parameters)
+            arrays = fields.evaluate(field, bounds, points, data.get('normalize', True) is not False, starts, steps)
+    except Overloaded as overloaded:
+        response = jsonify({'success': False, 'error': f'El servidor está saturado ({overloaded.reason})'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(overloaded.retry_after)
+        return response
+    except cancellation.Cancelled:
+        return jsonify({'success': False, 'error': 'El cálculo fue cancelado'}), 499
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 422
+    finally:
+        cancellation.monitor.unwatch(cancel)
+
+    header = {'success': True, 'kind': field.kind, 'axes': list(field.axes),
+              'field': [str(component) for component in field.field],
+              'x': list(bounds[0]), 'y': list(bounds[1])}
+    if encoding == 'binary':
+        return Response(fields.encode_binary(header, arrays), mimetype='application/octet-stream')
+    return jsonify(dict(header, arrays=fields.encode_base64(arrays)))
+
+@app.route('/bvp', methods=['POST'])
+@ensure_json_response
+def bvp_endpoint():
+    """
+    Problema de contorno resuelto numéricamente (disparo y/o diferencias
+    finitas, ver bvp.py): la solución en una malla y sus diagnósticos.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        equation_str = str(data.get('equation') or '').strip()
+        if not equation_str:
+            raise ValueError('Falta la ecuación')
+        eq = parse_equation_string(equation_str)
+        conditions, _ = parse_initial_conditions(str(data.get('conditions') or data.get('initial_conditions') or ''),
+                                                 StepLog())
+        method = str(data.get('method') or 'auto')
+        points = int(data.get('points', 101))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    deadline = time.monotonic() + config.REQUEST_DEADLINE_S if config.REQUEST_DEADLINE_S > 0 else None
+    cancel = cancellation.CancelToken()
+    cancellation.monitor.watch(cancel, cancellation.request_socket(request.environ), None)
+    try:
+        with solver_slot(HEAVY, deadline=deadline, cancel=cancel), cancellation.cancellable(cancel):
+            result = bvp.BoundaryProblem(eq, Function('y')(symbols('x')), conditions).solve(method, points)
+    except Overloaded as overloaded:
+        response = jsonify({'success': False, 'error': f'El servidor está saturado ({overloaded.reason})'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(overloaded.retry_after)
+        return response
+    except cancellation.Cancelled:
+        return jsonify({'success': False, 'error': 'El cálculo fue cancelado'}), 499
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 422
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'No se pudo resolver numéricamente: {str(e)}'}), 422
+    finally:
+        cancellation.monitor.unwatch(cancel)
+    return jsonify(dict(result, success=True))
+
+def parse_export_request(data):
+    """Valida la petición a /export; ValueError con el motivo si no es válida"""
+    try:
+        derivatives = int(data.get('derivatives', 0))
+        index = int(data.get('index', 0))
+    except (TypeError, ValueError):
+        raise ValueError('derivatives e index deben ser enteros')
+    if not 0 <= derivatives <= export.MAX_DERIVATIVES:
+        raise ValueError(f'derivatives debe estar entre 0 y {export.MAX_DERIVATIVES}')
+    which = str(data.get('which') or 'particular')
+    if which not in ('particular', 'general'):
+        raise ValueError('which debe ser particular o general')
+    output = str(data.get('format') or 'json')
+    if output not in ('json', 'py'):
+        raise ValueError('format debe ser json o py')
+    solution_str = str(data.get('solution') or '').strip()
+    equation_str = str(data.get('equation') or '').strip()
+    if not solution_str and not equation_str:
+        raise ValueError('Falta la solución (o la ecuación)')
+    return solution_str, equation_str, which, index, derivatives, output
+
+def exported_solution_text(equation_str, initial_conditions_str, which, deadline, cancel):
+    """Resuelve la ecuación (como /solve, sin pasos) y devuelve el texto de la solución pedida"""
+    with solver_slot(deadline=deadline, cancel=cancel), cancellation.cancellable(cancel):
+        result = run_solver(equation_str, 'auto', initial_conditions_str, deadline, 'none', 'text')
+    if not result.get('success'):
+        raise ValueError('No se pudo resolver la ecuación')
+    if which == 'general':
+        return result.get('general_solution_text') or result['solution_text']
+    return result.get('particular_solution_text') or result['solution_text']
+
+@app.route('/export', methods=['POST'])
+@ensure_json_response
+def export_endpoint():
+    """
+    Módulo de Python autónomo (NumPy, cse, constantes como argumentos con nombre y
+    self_check contra SymPy) que evalúa una solución: la de "solution" (sintaxis de
+    SymPy, como solution_text de /solve con format=text) o la que se obtiene
+    resolviendo "equation" con "initial_conditions". Ver export.py.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        solution_str, equation_str, which, index, derivatives, output = parse_export_request(data)
+        expr = export.parse_solution(solution_str, index) if solution_str else None
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    deadline = time.monotonic() + config.REQUEST_DEADLINE_S if config.REQUEST_DEADLINE_S > 0 else None
+    cancel = cancellation.CancelToken()
+    cancellation.monitor.watch(cancel, cancellation.request_socket(request.environ), None)
+    try:
+        if expr is None:
+            solution_str = exported_solution_text(equation_str, str(data.get('initial_conditions') or ''),
+                                                  which, deadline, cancel)
+            expr = export.parse_solution(solution_str, index)
+        module = export.peek(expr, derivatives)
+        cached = module is not None
+        if module is None:
+            # Generar es cse, unas evaluaciones con evalf y el self_check: trabajo ligero
+            with solver_slot(LIGHT, deadline=deadline, cancel=cancel), cancellation.cancellable(cancel):
+                module, cached = export.get_module(expr, derivatives)
+    except Overloaded as overloaded:
+        response = jsonify({'success': False, 'error': f'El servidor está saturado ({overloaded.reason})'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(overloaded.retry_after)
+        return response
+    except cancellation.Cancelled:
+        return jsonify({'success': False, 'error': 'El cálculo fue cancelado'}), 499
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 422
+    finally:
+        cancellation.monitor.unwatch(cancel)
+
+    filename = f"solucion_{module['hash'][:12]}.py"
+    if output == 'py':
+        response = Response(module['source'], mimetype='text/x-python')
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    return jsonify({'success': True, 'solution': str(expr), 'filename': filename, 'hash': module['hash'],
+                    'constants': module['constants'], 'derivatives': derivatives,
+                    'check_points': module['check_points'], 'checked': module['checked'],
+                    'cached': cached, 'module': module['source']})
+
+@app.route('/solve/cancel', methods=['POST'])
+def solve_cancel():
+    """Cancela la petición a /solve enviada con el mismo request_id"""
+    data = request.get_json(force=True, silent=True) or {}
+    request_id = str(data.get('request_id') or '')
+    if not cancellation.REQUEST_ID_RE.match(request_id):
+        return jsonify({'error': 'request_id no válido'}), 400
+    found = cancellation.monitor.cancel(request_id)
+    # None: no es de este proceso; se dejó una marca para el que la atiende
+    return jsonify({'request_id': request_id, 'cancelled': found is not False}), 202
+
+@app.route('/ready')
+def ready():
+    """Readiness: 503 hasta que termina el calentamiento"""
+    return jsonify(warmup.as_dict()), 200 if warmup.is_ready() else 503
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return app.response_class(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/sympy-cache', methods=['GET'])
+def sympy_cache_stats():
+    if not profiling.is_admin(request):
+        return jsonify({'error': 'Se requieren credenciales de administrador'}), 403
+    try:
+        top = int(request.args.get('top', 10))
+        if top < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'top debe ser un entero no negativo'}), 400
+    return jsonify(sympy_cache.stats(top=top))
+
+@app.route('/admin/sympy-cache/clear', methods=['POST'])
+def sympy_cache_clear():
+    if not profiling.is_admin(request):
+        return jsonify({'error': 'Se requieren credenciales de administrador'}), 403
+    sympy_cache.clear('admin')
+    return jsonify(sympy_cache.stats())
+
+def _after_warmup():
+    # Compila la plantilla de la página principal
+    app.jinja_env.get_template('index.html')
+    # El spawner de los workers se crea con fork después del calentamiento: heredan el estado caliente
+    if solver_pool is not None:
+        solver_pool.prestart()
+
+def start_warmup(background=True, start_workers=True):
+    """
+    Calienta el proceso resolviendo una ecuación por método. En segundo plano,
+    el servidor escucha mientras tanto y /ready responde 503 hasta terminar.
+    serve.py calienta el proceso maestro en primer plano y sin arrancar los
+    workers de cálculo, que cada proceso HTTP crea después del fork.
+    """
+    after = _after_warmup if start_workers else (lambda: app.jinja_env.get_template('index.html'))
+    if not config.WARMUP:
+        if start_workers and solver_pool is not None:
+            solver_pool.prestart()
+        warmup.mark_ready()
+        return None
+    # En el formato que pide la página: calienta también el impresor MathML y su caché
+    solve = lambda equation, method, conditions: solve_equation(equation, method, conditions, fmt='mathml')
+    if background:
+        return warmup.start(solve, after=after)
+    warmup.run(solve, after=after)
+    return None
+
+# Con el recargador de depuración, el proceso padre sólo vigila archivos: no calienta
+if config.WARMUP_ON_IMPORT and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN')):
+    start_warmup()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
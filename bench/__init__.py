@@ -0,0 +1 @@
+"""Herramientas de medición de rendimiento del solucionador."""
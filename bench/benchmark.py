@@ -0,0 +1,387 @@
+"""
+Benchmark y detector de regresiones sobre el corpus de ecuaciones (bench/corpus.jsonl).
+
+Mide cada fase de la resolución (parseo, classify_ode, dsolve, simplificación,
+condiciones iniciales y LaTeX) durante varias ejecuciones, calcula mediana y p95,
+el pico de memoria (tracemalloc) y guarda el resultado en JSON. Si se indica un
+resultado anterior con --baseline, termina con código 1 cuando alguna métrica
+empeora más que --threshold.
+
+Uso (desde la raíz del proyecto):
+    python -m bench.benchmark --runs 3
+    python -m bench.benchmark --mode client --method linear --limit 20
+    python -m bench.benchmark --baseline bench/results/anterior.json --threshold 0.2
+    python -m bench.benchmark --cache-sizes 0,100,1000,10000 --limit 60
+    python -m bench.benchmark --float-variants --limit 40
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# El benchmark mide él mismo los cálculos en frío; sin calentamiento en segundo plano
+os.environ.setdefault('SOLVER_WARMUP', '0')
+# Con el orden de hints aprendido cada ejecución cambiaría lo que se mide
+os.environ.setdefault('SOLVER_HINT_LEARNING', '0')
+
+from sympy import __version__ as sympy_version
+from sympy.core.cache import clear_cache
+
+import sympy_cache
+from app import app, solve_equation
+from bench.stats import percentile
+from instrumentation import SpanRecorder, recording
+from workers import current_rss_mb
+
+CORPUS_PATH = os.path.join(ROOT, 'bench', 'corpus.jsonl')
+RESULTS_DIR = os.path.join(ROOT, 'bench', 'results')
+
+
+def load_corpus(path=CORPUS_PATH, methods=None, tags=None, limit=None):
+    """Lee el corpus JSONL, filtrando por método y/o etiquetas"""
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if methods and entry['method'] not in methods:
+                continue
+            if tags and not set(tags) & set(entry.get('tags', [])):
+                continue
+            entries.append(entry)
+    return entries[:limit] if limit else entries
+
+
+def run_direct(entry):
+    """Resuelve llamando directamente a solve_equation; devuelve (éxito, total_ms, fases)"""
+    recorder = SpanRecorder()
+    with recording(recorder):
+        result = solve_equation(entry['equation'], entry['method'], entry.get('initial_conditions', ''),
+                                entry.get('verbosity', 'full'), entry.get('format', 'latex'),
+                                rationalize=entry.get('rationalize'))
+    return result['success'], recorder.total_ms(), dict(recorder.phases)
+
+
+def make_client_runner():
+    """Resuelve a través del cliente de pruebas de Flask (ruta /solve completa)"""
+    client = app.test_client()
+
+    def run_client(entry):
+        start = time.perf_counter()
+        response = client.post('/solve', json={
+            'equation': entry['equation'],
+            'method': entry['method'],
+            'initial_conditions': entry.get('initial_conditions', ''),
+            'verbosity': entry.get('verbosity', 'full'),
+            'format': entry.get('format', 'latex'),
+            'rationalize': bool(entry.get('rationalize')),
+            'timings': True,
+        })
+        total_ms = (time.perf_counter() - start) * 1000
+        data = response.get_json() or {}
+        return bool(data.get('success')), total_ms, data.get('timings', {}).get('phases', {})
+
+    return run_client
+
+
+def measure_entry(entry, runner, runs, warm_cache=False, memory=True):
+    """Ejecuta una entrada varias veces y devuelve sus estadísticas"""
+    totals = []
+    phases = {}
+    success = True
+    for _ in range(runs):
+        if not warm_cache:
+            clear_cache()
+        ok, total_ms, run_phases = runner(entry)
+        success = success and ok
+        totals.append(total_ms)
+        for name, ms in run_phases.items():
+            phases.setdefault(name, []).append(ms)
+
+    result = {
+        'equation': entry['equation'],
+        'method': entry['method'],
+        'initial_conditions': entry.get('initial_conditions', ''),
+        'success': success,
+        'total_ms': {'median': statistics.median(totals), 'p95': percentile(totals, 95)},
+        'phases': {name: {'median': statistics.median(values), 'p95': percentile(values, 95)}
+                   for name, values in phases.items()},
+    }
+
+    if memory:
+        # Ejecución aparte: tracemalloc ralentiza mucho a SymPy y distorsionaría los tiempos
+        if not warm_cache:
+            clear_cache()
+        tracemalloc.start()
+        try:
+            runner(entry)
+            result['peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def _describe(values):
+    return {'median': round(statistics.median(values), 2) if values else 0.0,
+            'p95': round(percentile(values, 95), 2),
+            'count': len(values)}
+
+
+def summarize(entries):
+    """Agrega las medianas por entrada: global, por fase y por método"""
+    totals = [e['total_ms']['median'] for e in entries.values()]
+    summary = {
+        'entries': len(entries),
+        'successes': sum(1 for e in entries.values() if e['success']),
+        'total_ms': _describe(totals),
+        'phases': {},
+        'methods': {},
+    }
+    phase_values = {}
+    method_values = {}
+    for entry in entries.values():
+        for name, stats in entry['phases'].items():
+            phase_values.setdefault(name, []).append(stats['median'])
+        method_values.setdefault(entry['method'], []).append(entry['total_ms']['median'])
+    summary['phases'] = {name: _describe(values) for name, values in sorted(phase_values.items())}
+    summary['methods'] = {name: _describe(values) for name, values in sorted(method_values.items())}
+    peaks = [e['peak_kib'] for e in entries.values() if 'peak_kib' in e]
+    if peaks:
+        summary['peak_kib'] = {**_describe(peaks), 'max': max(peaks)}
+    return summary
+
+
+def compare(current, baseline, threshold, min_ms=5.0):
+    """
+    Compara dos resultados y devuelve la lista de regresiones.
+    Se ignoran las métricas cuyo valor base es menor que min_ms (ruido).
+    """
+    regressions = []
+
+    def check(label, new, old):
+        if old is None or new is None or old < min_ms:
+            return
+        change = (new - old) / old
+        if change > threshold:
+            regressions.append({'metric': label, 'baseline': round(old, 2), 'current': round(new, 2),
+                                'change': round(change, 3)})
+
+    cur, base = current['summary'], baseline['summary']
+    for stat in ('median', 'p95'):
+        check(f'total_ms.{stat}', cur['total_ms'][stat], base['total_ms'].get(stat))
+    for name, stats in cur['phases'].items():
+        if name in base.get('phases', {}):
+            check(f'phases.{name}.median', stats['median'], base['phases'][name]['median'])
+    for name, stats in cur['methods'].items():
+        if name in base.get('methods', {}):
+            check(f'methods.{name}.median', stats['median'], base['methods'][name]['median'])
+
+    # Ecuaciones que antes se resolvían y ahora no
+    for entry_id, entry in current['entries'].items():
+        old = baseline.get('entries', {}).get(entry_id)
+        if old and old['success'] and not entry['success']:
+            regressions.append({'metric': f'entries.{entry_id}.success', 'baseline': True, 'current': False})
+    return regressions
+
+
+def compare_cache_sizes(entries, runner, sizes, runs):
+    """
+    Recorre el corpus con cada tamaño de caché de SymPy (sin vaciarla entre
+    ecuaciones, que es como trabaja el servidor) y mide latencia y memoria.
+    """
+    report = {}
+    for size in sizes:
+        sympy_cache.resize(size)
+        clear_cache()
+        rss_before = current_rss_mb()
+        totals = []
+        started = time.perf_counter()
+        for _ in range(runs):
+            for entry in entries:
+                _, total_ms, _ = runner(entry)
+                totals.append(total_ms)
+        cache = sympy_cache.stats()
+        label = 'ilimitado' if size is None else str(size)
+        report[label] = {
+            'median_ms': round(statistics.median(totals), 2),
+            'p95_ms': round(percentile(totals, 95), 2),
+            'wall_s': round(time.perf_counter() - started, 2),
+            'hit_ratio': round(cache['hit_ratio'], 4),
+            'cache_entries': cache['size'],
+            'rss_growth_mb': round(current_rss_mb() - rss_before, 1),
+        }
+        print(f"caché {label:>10}: mediana {report[label]['median_ms']:.1f} ms, p95 {report[label]['p95_ms']:.1f} ms, "
+              f"aciertos {report[label]['hit_ratio']:.1%}, entradas {cache['size']}, "
+              f"RSS +{report[label]['rss_growth_mb']} MiB", file=sys.stderr)
+    return report
+
+
+def float_variant(equation):
+    """La ecuación con los coeficientes enteros escritos como decimales (5*y -> 5.0*y); los exponentes no cambian"""
+    return re.sub(r'(?<![\w.*^])(\d+)(?![\w.])', r'\1.0', equation)
+
+
+def compare_float_variants(entries, runner, runs, warm_cache=False):
+    """
+    Mide cada ecuación del corpus con coeficientes decimales, resuelta tal cual
+    (float) y con el pre-paso de racionalización (rationalized), frente a la
+    original con enteros (rational).
+    """
+    variants = {'rational': lambda e: e,
+                'float': lambda e: dict(e, equation=float_variant(e['equation'])),
+                'rationalized': lambda e: dict(e, equation=float_variant(e['equation']), rationalize=15)}
+    report = {'entries': {}, 'summary': {}}
+    totals = {name: [] for name in variants}
+    successes = dict.fromkeys(variants, 0)
+    compared = [entry for entry in entries if float_variant(entry['equation']) != entry['equation']]
+    for i, entry in enumerate(compared, 1):
+        measured = {}
+        for name, make in variants.items():
+            stats = measure_entry(make(entry), runner, runs, warm_cache, memory=False)
+            measured[name] = {'median_ms': round(stats['total_ms']['median'], 2), 'success': stats['success']}
+            totals[name].append(stats['total_ms']['median'])
+            successes[name] += stats['success']
+        report['entries'][entry['id']] = dict(measured, equation=float_variant(entry['equation']))
+        print(f"[{i}/{len(compared)}] {entry['id']:<28} " + '  '.join(
+            f"{name} {m['median_ms']:>8.1f} ms{'' if m['success'] else ' FALLO'}" for name, m in measured.items()),
+            file=sys.stderr)
+    for name, values in totals.items():
+        report['summary'][name] = dict(_describe(values), successes=successes[name],
+                                       total_ms=round(sum(values), 2))
+    return report
+
+
+def print_summary(summary):
+    print(f"Entradas: {summary['entries']}  resueltas: {summary['successes']}")
+    print(f"{'métrica':<32}{'mediana (ms)':>14}{'p95 (ms)':>12}")
+    print(f"{'total':<32}{summary['total_ms']['median']:>14.1f}{summary['total_ms']['p95']:>12.1f}")
+    for name, stats in summary['phases'].items():
+        print(f"{'fase ' + name:<32}{stats['median']:>14.1f}{stats['p95']:>12.1f}")
+    for name, stats in summary['methods'].items():
+        print(f"{'método ' + name:<32}{stats['median']:>14.1f}{stats['p95']:>12.1f}")
+    if 'peak_kib' in summary:
+        peak = summary['peak_kib']
+        print(f"Pico de memoria (KiB): mediana {peak['median']:.0f}, p95 {peak['p95']:.0f}, máx {peak['max']:.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark del solucionador sobre el corpus de ecuaciones')
+    parser.add_argument('--corpus', default=CORPUS_PATH, help='Archivo JSONL del corpus')
+    parser.add_argument('--mode', choices=('direct', 'client'), default='direct',
+                        help='direct: llama a solve_equation; client: pasa por /solve con el cliente de Flask')
+    parser.add_argument('--runs', type=int, default=3, help='Ejecuciones por ecuación')
+    parser.add_argument('--method', action='append', help='Filtrar por método (se puede repetir)')
+    parser.add_argument('--tag', action='append', help='Filtrar por etiqueta, p. ej. ic o auto')
+    parser.add_argument('--limit', type=int, help='Número máximo de ecuaciones')
+    parser.add_argument('--warm-cache', action='store_true', help='No limpiar la caché de SymPy entre ejecuciones')
+    parser.add_argument('--no-memory', action='store_true', help='No medir el pico de memoria')
+    parser.add_argument('--output', help='Archivo JSON de salida (por defecto bench/results/<fecha>.json)')
+    parser.add_argument('--baseline', help='Resultado anterior con el que comparar')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Empeoramiento relativo máximo permitido (0.2 = 20%%)')
+    parser.add_argument('--min-ms', type=float, default=5.0, help='Ignorar métricas base menores que esto')
+    parser.add_argument('--verbosity', choices=('none', 'summary', 'full'), default='full',
+                        help='Nivel de detalle de los pasos que se renderizan')
+    parser.add_argument('--format', choices=('latex', 'text', 'mathml'), default='latex',
+                        help='Formato de las expresiones de los pasos')
+    parser.add_argument('--cache-sizes',
+                        help='Comparar tamaños de caché de SymPy, p. ej. 0,1000,none (none = ilimitado)')
+    parser.add_argument('--float-variants', action='store_true',
+                        help='Comparar cada ecuación con coeficientes decimales, con y sin el pre-paso de '
+                             'racionalización, frente a la original')
+    args = parser.parse_args(argv)
+
+    entries = [dict(entry, verbosity=args.verbosity, format=args.format)
+               for entry in load_corpus(args.corpus, args.method, args.tag, args.limit)]
+    runner = run_direct if args.mode == 'direct' else make_client_runner()
+
+    if args.cache_sizes:
+        sizes = [None if s.strip().lower() == 'none' else int(s) for s in args.cache_sizes.split(',')]
+        report = {
+            'meta': {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'mode': args.mode, 'runs': args.runs,
+                     'entries': len(entries), 'sympy': sympy_version},
+            'cache_sizes': compare_cache_sizes(entries, runner, sizes, args.runs),
+        }
+        output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '-cache.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'Resultados guardados en {output}')
+        return 0
+
+    if args.float_variants:
+        report = {
+            'meta': {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'mode': args.mode, 'runs': args.runs,
+                     'warm_cache': args.warm_cache, 'sympy': sympy_version},
+            'float_variants': compare_float_variants(entries, runner, args.runs, args.warm_cache),
+        }
+        output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '-floats.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"{'variante':<16}{'resueltas':>10}{'mediana (ms)':>14}{'p95 (ms)':>12}{'total (ms)':>14}")
+        for name, stats in report['float_variants']['summary'].items():
+            print(f"{name:<16}{stats['successes']:>10}{stats['median']:>14.1f}{stats['p95']:>12.1f}"
+                  f"{stats['total_ms']:>14.1f}")
+        print(f'Resultados guardados en {output}')
+        return 0
+
+    results = {}
+    started = time.time()
+    for i, entry in enumerate(entries, 1):
+        results[entry['id']] = measure_entry(entry, runner, args.runs, args.warm_cache, not args.no_memory)
+        stats = results[entry['id']]
+        print(f"[{i}/{len(entries)}] {entry['id']:<28} {stats['total_ms']['median']:>9.1f} ms "
+              f"{'ok' if stats['success'] else 'FALLO'}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duration_s': round(time.time() - started, 1),
+            'mode': args.mode,
+            'runs': args.runs,
+            'warm_cache': args.warm_cache,
+            'verbosity': args.verbosity,
+            'format': args.format,
+            'python': platform.python_version(),
+            'sympy': sympy_version,
+            'corpus': os.path.relpath(args.corpus, ROOT),
+        },
+        'summary': summarize(results),
+        'entries': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print_summary(report['summary'])
+    print(f'Resultados guardados en {output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_ms)
+        if regressions:
+            print(f'❌ {len(regressions)} regresiones por encima del {args.threshold:.0%}:')
+            for reg in regressions:
+                print(f"   {reg['metric']}: {reg['baseline']} -> {reg['current']}"
+                      + (f" ({reg['change']:+.0%})" if 'change' in reg else ''))
+            return 1
+        print(f'✅ Sin regresiones respecto a {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
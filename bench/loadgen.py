@@ -0,0 +1,199 @@
+"""
+Generador de carga que reproduce una captura de tráfico de /solve.
+
+Lee un archivo JSONL generado con SOLVER_CAPTURE_PATH (o con el mismo formato:
+equation, method, initial_conditions) y lo envía a un servidor local, ya sea a
+un ritmo objetivo (--rps, lazo abierto) o con un número fijo de clientes
+concurrentes (--concurrency, lazo cerrado). Al terminar informa throughput,
+latencias p50/p95/p99 y tasas de error y de timeout.
+
+Uso:
+    python -m bench.loadgen capturas/solve.jsonl --rps 20 --duration 60
+    python -m bench.loadgen capturas/solve.jsonl --concurrency 8 --requests 500
+"""
+import argparse
+import itertools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.stats import percentile
+
+
+def load_capture(path, only_success=False):
+    """Lee las peticiones capturadas (ignora líneas vacías o corruptas)"""
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if not item.get('equation'):
+                continue
+            if only_success and item.get('outcome') not in (None, 'success'):
+                continue
+            items.append({
+                'equation': item['equation'],
+                'method': item.get('method', 'auto'),
+                'initial_conditions': item.get('initial_conditions', ''),
+            })
+    return items
+
+
+class Results:
+    """Acumula latencias y resultados de forma segura entre hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.outcomes = {}
+
+    def add(self, outcome, latency_ms):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if outcome in ('success', 'failure'):
+                self.latencies.append(latency_ms)
+
+    @property
+    def total(self):
+        return sum(self.outcomes.values())
+
+
+def send(url, item, timeout):
+    """Envía una petición y devuelve (resultado, latencia_ms)"""
+    body = json.dumps(item).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            data = json.loads(response.read() or b'{}')
+        outcome = 'success' if data.get('success') else 'failure'
+    except urllib.error.HTTPError as e:
+        outcome = f'http_{e.code}'
+    except (socket.timeout, TimeoutError):
+        outcome = 'timeout'
+    except urllib.error.URLError as e:
+        outcome = 'timeout' if isinstance(e.reason, (socket.timeout, TimeoutError)) else 'connection_error'
+    except Exception:
+        outcome = 'error'
+    return outcome, (time.perf_counter() - start) * 1000
+
+
+def run_open_loop(url, items, rps, duration, max_requests, timeout, results, max_workers):
+    """Lanza peticiones a un ritmo fijo sin esperar a que terminen las anteriores"""
+    interval = 1.0 / rps
+    source = itertools.cycle(items)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for n in itertools.count():
+            if max_requests and n >= max_requests:
+                break
+            scheduled = start + n * interval
+            if duration and scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            item = next(source)
+            pool.submit(lambda it=item: results.add(*send(url, it, timeout)))
+
+
+def run_closed_loop(url, items, concurrency, duration, max_requests, timeout, results):
+    """Mantiene N clientes que envían la siguiente petición en cuanto reciben respuesta"""
+    source = itertools.cycle(items)
+    lock = threading.Lock()
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def client():
+        while True:
+            with lock:
+                n = next(counter)
+                item = next(source)
+            if max_requests and n >= max_requests:
+                return
+            if deadline and time.perf_counter() >= deadline:
+                return
+            results.add(*send(url, item, timeout))
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def report(results, elapsed):
+    total = results.total
+    latencies = results.latencies
+    summary = {
+        'requests': total,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'max': round(max(latencies), 1) if latencies else 0.0,
+        },
+        'outcomes': dict(sorted(results.outcomes.items())),
+        'error_rate': round(sum(v for k, v in results.outcomes.items()
+                                if k not in ('success', 'failure', 'timeout')) / total, 4) if total else 0.0,
+        'timeout_rate': round(results.outcomes.get('timeout', 0) / total, 4) if total else 0.0,
+    }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reproduce una captura de /solve contra un servidor local')
+    parser.add_argument('capture', help='Archivo JSONL de capturas')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/solve', help='URL de /solve')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--rps', type=float, help='Peticiones por segundo objetivo (lazo abierto)')
+    group.add_argument('--concurrency', type=int, default=4, help='Clientes concurrentes (lazo cerrado)')
+    parser.add_argument('--duration', type=float, default=60, help='Duración en segundos (0 = sin límite)')
+    parser.add_argument('--requests', type=int, default=0, help='Número máximo de peticiones (0 = sin límite)')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout por petición en segundos')
+    parser.add_argument('--max-workers', type=int, default=256, help='Hilos máximos en modo --rps')
+    parser.add_argument('--only-success', action='store_true', help='Reproducir sólo las peticiones que tuvieron éxito')
+    parser.add_argument('--output', help='Guardar el informe en este archivo JSON')
+    args = parser.parse_args(argv)
+
+    items = load_capture(args.capture, args.only_success)
+    if not items:
+        print('❌ La captura no contiene peticiones válidas', file=sys.stderr)
+        return 2
+    if not args.duration and not args.requests:
+        print('❌ Indica --duration o --requests', file=sys.stderr)
+        return 2
+
+    results = Results()
+    start = time.perf_counter()
+    if args.rps:
+        run_open_loop(args.url, items, args.rps, args.duration, args.requests, args.timeout, results,
+                      args.max_workers)
+    else:
+        run_closed_loop(args.url, items, args.concurrency, args.duration, args.requests, args.timeout, results)
+    summary = report(results, time.perf_counter() - start)
+    summary['mode'] = {'rps': args.rps} if args.rps else {'concurrency': args.concurrency}
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""
+Estadísticas compartidas por las herramientas de bench/ (sin dependencias).
+"""
+
+
+def percentile(values, q):
+    """Percentil con interpolación lineal (q entre 0 y 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100.0
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
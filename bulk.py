@@ -0,0 +1,211 @@
+"""
+Resolución masiva de ecuaciones sin pasar por HTTP.
+
+Lee un banco de ecuaciones y lo resuelve en varios procesos con el mismo
+código que /solve (solve_equation: parseo, método, condiciones iniciales y
+LaTeX), con tiempo y memoria acotados por ecuación. Los resultados se escriben
+en JSONL a medida que terminan; si se relanza con el mismo archivo de salida,
+se saltan los id ya resueltos.
+
+Formatos de entrada (por extensión o con --format):
+    .txt    una ecuación por línea ('#' comenta); id = número de línea
+    .csv    columnas id, equation, method, initial_conditions (con cabecera)
+    .jsonl  objetos con las mismas claves (p. ej. bench/corpus.jsonl)
+
+Uso:
+    python bulk.py banco.csv -o soluciones.jsonl --jobs 16 --timeout 60
+    python bulk.py bench/corpus.jsonl -o /tmp/claves.jsonl --retry-failed
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Antes de importar app.py: aquí se calienta el proceso padre en primer plano
+os.environ.setdefault('SOLVER_WARMUP_ON_IMPORT', '0')
+
+import app as solver_app
+import config
+from bench.stats import percentile
+from workers import WorkerPool, WorkerError
+
+
+def _field(data, name):
+    # Cualquier tipo (un número en el JSON, por ejemplo) se lee como texto: una línea
+    # rara no debe abortar una ejecución de decenas de miles de ecuaciones
+    value = data.get(name)
+    return '' if value is None else str(value).strip()
+
+
+def _item(number, data):
+    if not isinstance(data, dict):
+        raise ValueError('se esperaba un objeto')
+    equation = _field(data, 'equation')
+    if not equation:
+        return None
+    return {
+        'id': _field(data, 'id') or f'line-{number}',
+        'equation': equation,
+        'method': _field(data, 'method') or 'auto',
+        'initial_conditions': _field(data, 'initial_conditions'),
+    }
+
+
+def read_items(path, fmt=None):
+    """Genera los elementos de entrada (id, equation, method, initial_conditions)"""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                item = _item(number, row)
+                if item:
+                    yield item
+        elif fmt in ('jsonl', 'json', 'ndjson'):
+            for number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = _item(number, json.loads(line))
+                except ValueError as e:
+                    print(f'Línea {number}: JSON no válido ({e}), se ignora', file=sys.stderr)
+                    continue
+                if item:
+                    yield item
+        else:
+            for number, line in enumerate(f, start=1):
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield _item(number, {'equation': line})
+
+
+def completed_ids(path, retry_failed=False):
+    """Ids que ya tienen resultado en la salida (para reanudar)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Última línea a medio escribir si el proceso se interrumpió
+                continue
+            if retry_failed and not record.get('success'):
+                continue
+            done.add(record['id'])
+    return done
+
+
+def solve_item(item, include_steps=False):
+    """Se ejecuta en el worker: resuelve un elemento y devuelve su registro de salida"""
+    started = time.perf_counter()
+    # Sin --steps basta el resumen (incluye los errores), que apenas cuesta renderizar
+    verbosity = 'full' if include_steps else 'summary'
+    result = solver_app.solve_equation(item['equation'], item['method'], item['initial_conditions'], verbosity)
+    record = dict(item)
+    record.update({
+        'success': result['success'],
+        'solution': result['solution'],
+        'general_solution': result.get('general_solution'),
+        'particular_solution': result.get('particular_solution'),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    })
+    if include_steps or not result['success']:
+        record['steps'] = result['steps']
+    return record
+
+
+def _run_one(pool, item, timeout, include_steps):
+    started = time.perf_counter()
+    try:
+        return pool.run(solve_item, item, include_steps, timeout=timeout)
+    except WorkerError as e:
+        record = dict(item)
+        record.update({'success': False, 'solution': None, 'error': e.as_dict(),
+                       'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)})
+        return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resolución masiva de ecuaciones diferenciales')
+    parser.add_argument('input', help='Archivo .txt, .csv o .jsonl')
+    parser.add_argument('-o', '--output', required=True, help='Archivo JSONL de resultados (se reanuda si existe)')
+    parser.add_argument('--format', choices=('txt', 'csv', 'jsonl'), help='Formato de entrada (por defecto, la extensión)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Procesos en paralelo')
+    parser.add_argument('--timeout', type=float, default=config.SOLVE_TIMEOUT_S or 60,
+                        help='Segundos máximos por ecuación')
+    parser.add_argument('--memory-mb', type=float, default=config.WORKER_MEMORY_LIMIT_MB,
+                        help='Límite de memoria por proceso en MiB (0 = sin límite)')
+    parser.add_argument('--max-tasks', type=int, default=config.WORKER_MAX_TASKS,
+                        help='Reciclar cada proceso tras este número de ecuaciones')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Al reanudar, volver a intentar las que fallaron')
+    parser.add_argument('--steps', action='store_true', help='Incluir los pasos en todos los resultados')
+    parser.add_argument('--no-warmup', action='store_true', help='No calentar SymPy antes de crear los procesos')
+    args = parser.parse_args(argv)
+
+    done = completed_ids(args.output, args.retry_failed)
+    pending = (item for item in read_items(args.input, args.format) if item['id'] not in done)
+
+    if not args.no_warmup:
+        # Los procesos se crean con fork después: heredan SymPy ya inicializado
+        solver_app.start_warmup(background=False, start_workers=False)
+
+    jobs = max(1, args.jobs)
+    pool = WorkerPool(jobs, args.memory_mb, args.max_tasks, config.WORKER_MAX_RSS_MB)
+    latencies = []
+    counts = {'solved': 0, 'failed': 0, 'timeout': 0, 'memory_limit': 0, 'worker_died': 0}
+    started = time.perf_counter()
+    interrupted = False
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='bulk')
+    try:
+        with open(args.output, 'a', encoding='utf-8', buffering=1) as out:
+            running = set()
+            exhausted = False
+            while running or not exhausted:
+                # Ventana acotada: no se lee toda la entrada en memoria
+                while not exhausted and len(running) < jobs * 2:
+                    item = next(pending, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    running.add(executor.submit(_run_one, pool, item, args.timeout, args.steps))
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    latencies.append(record['elapsed_ms'])
+                    if record['success']:
+                        counts['solved'] += 1
+                    elif 'error' in record:
+                        counts[record['error']['type']] = counts.get(record['error']['type'], 0) + 1
+                    else:
+                        counts['failed'] += 1
+    except KeyboardInterrupt:
+        interrupted = True
+        print('\nInterrumpido: se puede reanudar con el mismo comando', file=sys.stderr)
+    finally:
+        executor.shutdown(wait=not interrupted, cancel_futures=True)
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    total = len(latencies)
+    print(f'\nEcuaciones: {total} (saltadas por estar ya resueltas: {len(done)})', file=sys.stderr)
+    print('  ' + ', '.join(f'{name}: {value}' for name, value in counts.items()), file=sys.stderr)
+    if total:
+        print(f'  Tiempo total: {elapsed:.1f} s, {total / elapsed:.2f} ecuaciones/s con {jobs} procesos',
+              file=sys.stderr)
+        print(f'  Por ecuación: p50 {percentile(latencies, 50):.0f} ms, p95 {percentile(latencies, 95):.0f} ms, '
+              f'máx {max(latencies):.0f} ms', file=sys.stderr)
+    return 130 if interrupted else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
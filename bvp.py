@@ -0,0 +1,388 @@
+"""
+Problemas de contorno resueltos numéricamente con NumPy.
+
+Para las condiciones en dos puntos (y(a)=α, y(b)=β, y'(b)=γ...) cuando no hay
+solución general simbólica o no se pueden despejar las constantes:
+
+- Disparo: las derivadas desconocidas en a se buscan integrando con RK4 muchas
+  pendientes de prueba a la vez (un solo lote de NumPy por iteración). Con una
+  incógnita se barre un intervalo y se refinan por bisección todos los cambios
+  de signo; con más, Newton con el jacobiano por diferencias en el mismo lote.
+- Diferencias finitas (orden 2, una condición en cada extremo): Newton sobre
+  el sistema tridiagonal, resuelto con el algoritmo de Thomas. Las condiciones
+  sobre y' se imponen con un punto fantasma.
+
+Cada solución va con diagnósticos: residuo de las condiciones y de la
+ecuación, estimación del error de discretización (la misma solución con la
+mitad de puntos) y, si se usan ambos métodos, la diferencia entre ellos.
+"""
+from sympy import Dummy, lambdify
+
+import cancellation
+import config
+from series import isolate_highest_derivative
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+SHOOTING = 'shooting'
+FINITE_DIFFERENCES = 'finite_differences'
+METHODS = ('auto', SHOOTING, FINITE_DIFFERENCES)
+
+# Pasos mínimos del integrador del disparo, aunque la malla pedida sea más gruesa
+MIN_INTEGRATION_STEPS = 400
+NEWTON_TOLERANCE = 1e-10
+NEWTON_MAX_ITERATIONS = 40
+
+
+def is_boundary_problem(conditions):
+    """Condiciones (x, valor, orden de derivada) en más de un punto"""
+    try:
+        return len({float(x_val) for x_val, _, _ in conditions}) > 1
+    except TypeError:
+        return False
+
+
+def solve_tridiagonal(lower, diag, upper, rhs):
+    """Algoritmo de Thomas: lower[i] multiplica a x[i-1] y upper[i] a x[i+1] en la fila i"""
+    n = len(diag)
+    c = np.zeros(n)
+    d = np.zeros(n)
+    c[0] = upper[0] / diag[0]
+    d[0] = rhs[0] / diag[0]
+    for i in range(1, n):
+        denominator = diag[i] - lower[i] * c[i - 1]
+        c[i] = upper[i] / denominator if i < n - 1 else 0.0
+        d[i] = (rhs[i] - lower[i] * d[i - 1]) / denominator
+    solution = np.empty(n)
+    solution[-1] = d[-1]
+    for i in range(n - 2, -1, -1):
+        solution[i] = d[i] - c[i] * solution[i + 1]
+    return solution
+
+
+def _compile(args, expr):
+    """
+    lambdify a NumPy; los fallos al evaluar (funciones sin equivalente en NumPy como
+    LambertW, o que no admiten arrays como gamma) se convierten en ValueError
+    """
+    function = lambdify(args, expr, 'numpy')
+
+    def evaluate(*values):
+        try:
+            with np.errstate(all='ignore'):
+                return np.asarray(function(*values), dtype=float)
+        except Exception as e:
+            raise ValueError(f'La ecuación no se puede evaluar numéricamente con NumPy: {e}')
+    return evaluate
+
+
+class BoundaryProblem:
+    """y^(n) = F(x, y, ..., y^(n-1)) con n condiciones en los extremos de [a, b]"""
+
+    def __init__(self, eq, y, conditions):
+        if not HAVE_NUMPY:
+            raise ValueError('Los problemas de contorno numéricos necesitan NumPy')
+        x = y.args[0]
+        try:
+            self.order, rhs = isolate_highest_derivative(eq, y)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f'No se puede despejar la derivada de mayor orden: {e}')
+        try:
+            self.conditions = [(float(x_val), float(value), int(deriv)) for x_val, value, deriv in conditions]
+        except TypeError:
+            raise ValueError('Las condiciones deben tener valores numéricos')
+        if len(self.conditions) != self.order:
+            raise ValueError(f'Una ecuación de orden {self.order} necesita {self.order} condiciones '
+                             f'(hay {len(self.conditions)})')
+        if any(deriv >= self.order for _, _, deriv in self.conditions):
+            raise ValueError(f'Las condiciones deben ser sobre derivadas de orden menor que {self.order}')
+        points = sorted({x_val for x_val, _, _ in self.conditions})
+        if len(points) > 2:
+            raise ValueError('Las condiciones deben estar en los dos extremos del intervalo')
+        self.a, self.b = points[0], points[-1]
+        if self.a == self.b:
+            raise ValueError('Las condiciones están todas en el mismo punto: es un problema de valor inicial')
+        left = {deriv: value for x_val, value, deriv in self.conditions if x_val == self.a}
+        if len(left) != sum(1 for x_val, _, _ in self.conditions if x_val == self.a):
+            raise ValueError('Hay condiciones repetidas sobre la misma derivada')
+        self.left = left
+        self.right = [(deriv, value) for x_val, value, deriv in self.conditions if x_val == self.b]
+        self.unknown = [deriv for deriv in range(self.order) if deriv not in left]
+
+        X = Dummy('x')
+        Y = [Dummy(f'y{j}') for j in range(self.order)]
+        for j in range(self.order - 1, 0, -1):
+            rhs = rhs.subs(y.diff(x, j), Y[j])
+        rhs = rhs.subs(y, Y[0]).subs(x, X)
+        free = rhs.free_symbols - {X, *Y}
+        if free:
+            raise ValueError(f"Faltan valores para los parámetros: {', '.join(sorted(map(str, free)))}")
+        self._F = _compile((X, *Y), rhs)
+        if self.order == 2:
+            self._F_y = _compile((X, *Y), rhs.diff(Y[0]))
+            self._F_p = _compile((X, *Y), rhs.diff(Y[1]))
+
+    def _rhs(self, x, states):
+        """F en todos los estados del lote (batch×order), como array"""
+        with np.errstate(all='ignore'):
+            values = self._F(x, *states.T)
+        return np.broadcast_to(np.asarray(values, dtype=float), states.shape[:1])
+
+    # --- Disparo ---
+
+    def integrate(self, initial, points, substeps=None):
+        """
+        Integra en lote desde a hasta b con RK4; initial es batch×order. Devuelve los
+        estados en los `points` nodos de la malla (batch×points×order), con
+        `substeps` pasos entre nodos (por defecto, los necesarios para el mínimo).
+        """
+        intervals = points - 1
+        substeps = substeps or max(1, -(-MIN_INTEGRATION_STEPS // intervals))
+        h = (self.b - self.a) / (intervals * substeps)
+        states = np.array(initial, dtype=float)
+        path = np.empty((len(states), points, self.order))
+        path[:, 0] = states
+
+        def derivative(x, s):
+            out = np.empty_like(s)
+            out[:, :-1] = s[:, 1:]
+            out[:, -1] = self._rhs(x, s)
+            return out
+
+        x = self.a
+        with np.errstate(all='ignore'):
+            for node in range(1, points):
+                cancellation.check()
+                for _ in range(substeps):
+                    k1 = derivative(x, states)
+                    k2 = derivative(x + h / 2, states + h / 2 * k1)
+                    k3 = derivative(x + h / 2, states + h / 2 * k2)
+                    k4 = derivative(x + h, states + h * k3)
+                    states = states + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+                    x += h
+                path[:, node] = states
+        return path
+
+    def _initial_states(self, guesses):
+        guesses = np.atleast_2d(guesses)
+        states = np.empty((len(guesses), self.order))
+        for deriv, value in self.left.items():
+            states[:, deriv] = value
+        for column, deriv in enumerate(self.unknown):
+            states[:, deriv] = guesses[:, column]
+        return states
+
+    def _mismatch(self, guesses):
+        """Residuo de las condiciones en b para cada conjunto de incógnitas (batch×m)"""
+        final = self.integrate(self._initial_states(guesses), 2)[:, -1]
+        return np.stack([final[:, deriv] - value for deriv, value in self.right], axis=1)
+
+    def shoot(self):
+        """Valores (y, y', ...) en a con los que se cumplen las condiciones en b, e iteraciones"""
+        self.shooting_solutions = 1
+        if not self.unknown:
+            return self._initial_states(np.zeros((1, 0)))[0], 0
+        # Los extremos del barrido se escalan con la pendiente media que piden las condiciones
+        spread = max(abs(value) for _, value, _ in self.conditions) / (self.b - self.a)
+        span = 10.0 * max(1.0, spread)
+        if len(self.unknown) == 1:
+            result = self._shoot_scan(span)
+            if result is not None:
+                return result
+        return self._shoot_newton(np.zeros(len(self.unknown)))
+
+    def _shoot_scan(self, span, samples=81):
+        guesses = np.linspace(-span, span, samples)
+        mismatch = self._mismatch(guesses[:, None])[:, 0]
+        brackets = np.flatnonzero(np.isfinite(mismatch[:-1]) & np.isfinite(mismatch[1:]) &
+                                  (np.sign(mismatch[:-1]) * np.sign(mismatch[1:]) <= 0))
+        if not len(brackets):
+            return None
+        a, b = guesses[brackets], guesses[brackets + 1]
+        fa, fb = mismatch[brackets], mismatch[brackets + 1]
+        tolerance = NEWTON_TOLERANCE * max(1.0, max(abs(value) for _, value in self.right))
+        # Regula falsi (variante de Illinois) en todos los intervalos a la vez: un lote por iteración
+        for iteration in range(1, NEWTON_MAX_ITERATIONS + 1):
+            with np.errstate(all='ignore'):
+                c = np.where(fb != fa, (a * fb - b * fa) / (fb - fa), (a + b) / 2)
+            fc = self._mismatch(c[:, None])[:, 0]
+            same = np.sign(fc) == np.sign(fb)
+            fa = np.where(same, fa / 2, fb)
+            a = np.where(same, a, b)
+            b, fb = c, fc
+            if np.all(np.abs(fc) < tolerance):
+                break
+        # Con varias soluciones (problemas no lineales) se devuelve la de menor pendiente inicial
+        roots = b[np.abs(fb) < np.sqrt(tolerance)]
+        if not len(roots):
+            return None
+        self.shooting_solutions = len(np.unique(np.round(roots, 8)))
+        best = roots[np.argmin(np.abs(roots))]
+        return self._initial_states([[best]])[0], iteration
+
+    def _shoot_newton(self, guess):
+        for iteration in range(1, NEWTON_MAX_ITERATIONS + 1):
+            delta = 1e-7 * np.maximum(1.0, np.abs(guess))
+            # El punto y sus perturbaciones se integran en el mismo lote
+            mismatch = self._mismatch(np.vstack([guess, guess + np.diag(delta)]))
+            if not np.all(np.isfinite(mismatch)):
+                raise ValueError('El disparo diverge: la integración se sale de rango')
+            jacobian = ((mismatch[1:] - mismatch[0]) / delta[:, None]).T
+            try:
+                step = np.linalg.solve(jacobian, -mismatch[0])
+            except np.linalg.LinAlgError:
+                raise ValueError('El disparo no converge (jacobiano singular)')
+            guess = guess + step
+            if np.max(np.abs(step)) < NEWTON_TOLERANCE * max(1.0, np.max(np.abs(guess))):
+                break
+        else:
+            raise ValueError('El disparo no converge')
+        return self._initial_states(guess[None, :])[0], iteration
+
+    # --- Diferencias finitas ---
+
+    def finite_difference_applicable(self):
+        return self.order == 2 and len(self.left) == 1 and len(self.right) == 1
+
+    def finite_differences(self, points, initial=None):
+        """Newton sobre el sistema tridiagonal; devuelve (y, y') en la malla e iteraciones"""
+        if not self.finite_difference_applicable():
+            raise ValueError('Diferencias finitas: sólo orden 2 con una condición en cada extremo')
+        xs = np.linspace(self.a, self.b, points)
+        h = xs[1] - xs[0]
+        (left_deriv, left_value), = self.left.items()
+        (right_deriv, right_value), = self.right
+        if initial is None:
+            # Recta entre los valores dados (o constante si sólo hay condiciones sobre y')
+            start = left_value if left_deriv == 0 else (right_value if right_deriv == 0 else 0.0)
+            end = right_value if right_deriv == 0 else start
+            initial = np.linspace(start, end, points)
+        Y = np.array(initial, dtype=float)
+        if left_deriv == 0:
+            Y[0] = left_value
+        if right_deriv == 0:
+            Y[-1] = right_value
+
+        for iteration in range(1, NEWTON_MAX_ITERATIONS + 1):
+            cancellation.check()
+            # Punto fantasma para las condiciones sobre y' (diferencia centrada en el extremo)
+            ghost_left = Y[1] - 2 * h * left_value if left_deriv == 1 else None
+            ghost_right = Y[-2] + 2 * h * right_value if right_deriv == 1 else None
+            previous = np.concatenate([[ghost_left if ghost_left is not None else np.nan], Y[:-1]])
+            following = np.concatenate([Y[1:], [ghost_right if ghost_right is not None else np.nan]])
+            slope = (following - previous) / (2 * h)
+            with np.errstate(all='ignore'):
+                F = np.broadcast_to(np.asarray(self._F(xs, Y, slope), dtype=float), xs.shape)
+                F_y = np.broadcast_to(np.asarray(self._F_y(xs, Y, slope), dtype=float), xs.shape)
+                F_p = np.broadcast_to(np.asarray(self._F_p(xs, Y, slope), dtype=float), xs.shape)
+            residual = (previous - 2 * Y + following) / h ** 2 - F
+            lower = 1 / h ** 2 + F_p / (2 * h)
+            diag = -2 / h ** 2 - F_y
+            upper = 1 / h ** 2 - F_p / (2 * h)
+            if left_deriv == 1:
+                upper = upper.copy()
+                upper[0] = 2 / h ** 2  # y_{-1} = y_1 - 2hγ: y_1 aparece dos veces
+            if right_deriv == 1:
+                lower = lower.copy()
+                lower[-1] = 2 / h ** 2
+            # Las incógnitas son los nodos sin condición de Dirichlet
+            first = 1 if left_deriv == 0 else 0
+            last = points - 1 if right_deriv == 0 else points
+            rows = slice(first, last)
+            sub_lower, sub_diag, sub_upper = lower[rows].copy(), diag[rows], upper[rows].copy()
+            sub_lower[0] = 0.0
+            sub_upper[-1] = 0.0
+            if not np.all(np.isfinite(residual[rows])) or not np.all(np.isfinite(sub_diag)):
+                raise ValueError('Diferencias finitas: la ecuación no está definida en la malla')
+            step = solve_tridiagonal(sub_lower, sub_diag, sub_upper, -residual[rows])
+            Y[rows] += step
+            if np.max(np.abs(step)) < NEWTON_TOLERANCE * max(1.0, np.max(np.abs(Y))):
+                break
+        else:
+            raise ValueError('Diferencias finitas: Newton no converge')
+        dY = np.gradient(Y, h, edge_order=2)
+        if left_deriv == 1:
+            dY[0] = left_value
+        if right_deriv == 1:
+            dY[-1] = right_value
+        return np.stack([Y, dY], axis=1), iteration
+
+    # --- Resolución con diagnósticos ---
+
+    def boundary_residual(self, states):
+        values = []
+        for x_val, value, deriv in self.conditions:
+            node = 0 if x_val == self.a else -1
+            values.append(abs(states[node, deriv] - value))
+        return float(max(values))
+
+    def equation_residual(self, xs, states):
+        """max |y^(n) - F| con y^(n) por diferencias centradas de y^(n-1) en los nodos interiores"""
+        h = xs[1] - xs[0]
+        highest = (states[2:, -1] - states[:-2, -1]) / (2 * h)
+        F = self._rhs(xs[1:-1], states[1:-1])
+        with np.errstate(all='ignore'):
+            return float(np.max(np.abs(highest - F))) if len(highest) else 0.0
+
+    def solve(self, method='auto', points=101):
+        """Solución en la malla con diagnósticos (dict listo para JSON)"""
+        if method not in METHODS:
+            raise ValueError(f"Método de contorno no válido: {method} (opciones: {', '.join(METHODS)})")
+        if not 3 <= points <= config.BVP_MAX_POINTS:
+            raise ValueError(f'points debe estar entre 3 y {config.BVP_MAX_POINTS}')
+        xs = np.linspace(self.a, self.b, points)
+        candidates = [method] if method != 'auto' else (
+            [SHOOTING, FINITE_DIFFERENCES] if self.finite_difference_applicable() else [SHOOTING])
+        results, errors = {}, []
+        for candidate in candidates:
+            try:
+                if candidate == SHOOTING:
+                    initial, iterations = self.shoot()
+                    results[SHOOTING] = (self.integrate(initial[None, :], points)[0], iterations, initial)
+                else:
+                    results[FINITE_DIFFERENCES] = self.finite_differences(points) + (None,)
+            except ValueError as e:
+                errors.append(str(e))
+        if not results:
+            raise ValueError('; '.join(dict.fromkeys(errors)))
+        chosen = SHOOTING if SHOOTING in results else FINITE_DIFFERENCES
+        states, iterations, initial = results[chosen]
+        if not np.all(np.isfinite(states[:, 0])):
+            raise ValueError('La solución numérica no es finita en todo el intervalo')
+
+        diagnostics = {'iterations': iterations,
+                       'boundary_residual': self.boundary_residual(states),
+                       'equation_residual': self.equation_residual(xs, states)}
+        # Error de discretización: la misma solución con el doble de paso (RK4: /15; 2.º orden: /3)
+        coarse_points = (points - 1) // 2 + 1
+        if (points - 1) % 2 == 0 and coarse_points >= 3:
+            try:
+                if chosen == SHOOTING:
+                    substeps = max(1, -(-MIN_INTEGRATION_STEPS // (points - 1)))
+                    coarse = self.integrate(initial[None, :], coarse_points, substeps)[0]
+                    factor = 15
+                else:
+                    coarse, _ = self.finite_differences(coarse_points, states[::2, 0])
+                    factor = 3
+                diagnostics['error_estimate'] = float(np.max(np.abs(coarse[:, 0] - states[::2, 0])) / factor)
+            except ValueError:
+                pass
+        if len(results) == 2:
+            diagnostics['method_difference'] = float(np.max(np.abs(
+                results[SHOOTING][0][:, 0] - results[FINITE_DIFFERENCES][0][:, 0])))
+        if chosen == SHOOTING and self.shooting_solutions > 1:
+            diagnostics['solutions_found'] = self.shooting_solutions
+        return {
+            'method': chosen,
+            'x': xs.tolist(),
+            'y': states[:, 0].tolist(),
+            'dy': states[:, 1].tolist() if self.order > 1 else self._rhs(xs, states).tolist(),
+            'diagnostics': diagnostics,
+        }
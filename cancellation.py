@@ -0,0 +1,200 @@
+"""
+Cancelación de cálculos cuyo cliente ya no espera la respuesta.
+
+Cada petición a /solve lleva un CancelToken. Se activa cuando:
+- el cliente cierra la conexión (un hilo vigila los sockets de las peticiones
+  en curso), o
+- llega POST /solve/cancel con el request_id que el navegador envió en /solve.
+  Con varios procesos (serve.py) la cancelación puede llegar a otro proceso: se
+  deja una marca en el directorio de datos compartido y el proceso que tiene la
+  petición la recoge.
+
+Con workers de cálculo, cancelar termina el proceso que ejecuta dsolve/simplify.
+Sin workers, el cálculo comprueba el token (check()) antes de cada intento de
+dsolve y de cada simplificación y se detiene en el siguiente punto de control.
+"""
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import config
+
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+# Motivo de la cancelación de un cálculo compartido cuando lo han abandonado todas sus peticiones
+ABANDONED = 'abandoned'
+
+
+class Cancelled(BaseException):
+    """
+    El cálculo fue cancelado. Hereda de BaseException (como KeyboardInterrupt)
+    para que los `except Exception` de los métodos de resolución no la absorban.
+    """
+
+    def __init__(self, reason='cancelled'):
+        super().__init__(f'Cálculo cancelado ({reason})')
+        self.reason = reason
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason='client'):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+
+class _NeverCancelled:
+    """Token de los cálculos sin petición (calentamiento, benchmark, bulk.py)"""
+
+    def is_set(self):
+        return False
+
+    def check(self):
+        pass
+
+
+NEVER = _NeverCancelled()
+
+_current_token = ContextVar('solver_cancel_token', default=NEVER)
+
+
+def current_token():
+    return _current_token.get()
+
+
+def check():
+    """Punto de control: lanza Cancelled si el cálculo en curso fue cancelado"""
+    _current_token.get().check()
+
+
+@contextmanager
+def cancellable(token):
+    """Asocia un token a todo el código ejecutado dentro del bloque"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def request_socket(environ):
+    """Socket del cliente según el servidor WSGI (Werkzeug o gunicorn), o None"""
+    return environ.get('werkzeug.socket') or environ.get('gunicorn.socket')
+
+
+def _peer_closed(sock):
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+    except (BlockingIOError, InterruptedError):
+        return False
+    except ValueError:
+        # Sockets TLS: no admiten MSG_PEEK; no se pueden vigilar
+        return False
+    except OSError:
+        return True
+
+
+class CancelMonitor:
+    """
+    Un único hilo que, cada `interval` segundos, comprueba si se cerró la
+    conexión de alguna petición vigilada o si llegó una marca de cancelación.
+    """
+
+    def __init__(self, marker_dir, interval=0.25):
+        self.marker_dir = marker_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._watched = {}
+        self._by_request_id = {}
+        self._thread = None
+        self._pid = None
+
+    def watch(self, token, sock=None, request_id=None):
+        with self._lock:
+            self._watched[token] = (sock, request_id)
+            if request_id:
+                self._by_request_id[request_id] = token
+            # El hilo no sobrevive a un fork (serve.py): se arranca en cada proceso
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name='cancel-monitor', daemon=True)
+                self._thread.start()
+
+    def unwatch(self, token):
+        with self._lock:
+            _, request_id = self._watched.pop(token, (None, None))
+            if request_id and self._by_request_id.get(request_id) is token:
+                del self._by_request_id[request_id]
+        if request_id:
+            self._remove_marker(request_id)
+
+    def cancel(self, request_id):
+        """Cancela por request_id; si no es de este proceso, deja una marca para los demás"""
+        with self._lock:
+            token = self._by_request_id.get(request_id)
+        if token is not None:
+            token.cancel('client')
+            return True
+        try:
+            os.makedirs(self.marker_dir, exist_ok=True)
+            with open(os.path.join(self.marker_dir, request_id), 'w'):
+                pass
+        except OSError:
+            return False
+        return None
+
+    def _remove_marker(self, request_id):
+        try:
+            os.unlink(os.path.join(self.marker_dir, request_id))
+        except OSError:
+            pass
+
+    def _loop(self):
+        last_cleanup = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watched = list(self._watched.items())
+            for token, (sock, request_id) in watched:
+                if token.is_set():
+                    continue
+                if sock is not None and _peer_closed(sock):
+                    token.cancel('disconnect')
+                elif request_id and os.path.exists(os.path.join(self.marker_dir, request_id)):
+                    token.cancel('client')
+            if time.monotonic() - last_cleanup > 60:
+                last_cleanup = time.monotonic()
+                self._cleanup_markers()
+
+    def _cleanup_markers(self, max_age=120):
+        """Borra marcas de peticiones que ya habían terminado cuando se cancelaron"""
+        try:
+            names = os.listdir(self.marker_dir)
+        except OSError:
+            return
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.marker_dir, name)
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+
+monitor = CancelMonitor(config.CANCEL_DIR)
@@ -0,0 +1,78 @@
+"""
+Captura opcional del tráfico de /solve en formato JSONL.
+
+La ruta sólo encola un diccionario pequeño; un hilo en segundo plano escribe
+las líneas en disco, así que el coste por petición es despreciable. Si la
+cola se llena (disco lento) las capturas se descartan en lugar de bloquear.
+El archivo resultante se puede reproducir con bench/loadgen.py.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import config
+
+
+class TrafficCapture:
+    """Escritor de capturas con cola acotada y un hilo escritor"""
+
+    def __init__(self, path, sample_rate=1.0, max_queue=10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._writer, name='traffic-capture', daemon=True)
+        self._thread.start()
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, equation, method, initial_conditions, latency_ms, outcome):
+        try:
+            self._queue.put_nowait({
+                'ts': round(time.time(), 3),
+                'equation': equation,
+                'method': method,
+                'initial_conditions': initial_conditions,
+                'latency_ms': round(latency_ms, 2),
+                'outcome': outcome,
+            })
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Con buffer de línea cada captura es un único write() en modo append, así
+        # que varios procesos (serve.py) pueden compartir el archivo sin mezclar líneas
+        with open(self.path, 'a', encoding='utf-8', buffering=1) as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+    def close(self, timeout=5):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+_capture = None
+_capture_lock = threading.Lock()
+
+
+def get_capture():
+    """Devuelve el capturador global, o None si SOLVER_CAPTURE_PATH no está configurado"""
+    global _capture
+    if not config.CAPTURE_PATH:
+        return None
+    if _capture is None:
+        with _capture_lock:
+            if _capture is None:
+                _capture = TrafficCapture(config.CAPTURE_PATH, config.CAPTURE_RATE)
+                atexit.register(_capture.close)
+    return _capture
@@ -0,0 +1,158 @@
+"""
+Configuración del solucionador leída desde variables de entorno.
+"""
+import os
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+# Valores de texto (sin distinguir mayúsculas) que se leen como verdadero o falso
+TRUE_VALUES = ('1', 'true', 'yes', 'si', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off', 'none')
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in TRUE_VALUES
+
+
+# Directorio de datos compartido por todos los procesos (perfiles, capturas, estado persistente)
+DATA_DIR = os.environ.get('SOLVER_DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+# Instrumentación por fases (/solve)
+# Peticiones más lentas que este umbral se registran en el log con su desglose (0 = desactivado)
+SLOW_REQUEST_MS = _env_float('SOLVER_SLOW_REQUEST_MS', 3000)
+# Incluir siempre el objeto 'timings' en la respuesta, aunque el cliente no lo pida
+ALWAYS_INCLUDE_TIMINGS = _env_bool('SOLVER_ALWAYS_TIMINGS')
+
+# Administración
+# Token requerido en la cabecera X-Admin-Token para funciones de administración (vacío = desactivadas)
+ADMIN_TOKEN = os.environ.get('SOLVER_ADMIN_TOKEN', '')
+
+# Perfilado de peticiones (profile=1 en /solve)
+# Directorio donde se guardan los volcados pstats
+PROFILE_DIR = os.environ.get('SOLVER_PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+# Número de funciones incluidas en el resumen de la respuesta
+PROFILE_TOP_N = int(_env_float('SOLVER_PROFILE_TOP_N', 25))
+# Fracción de peticiones perfiladas automáticamente (0 = nunca)
+AUTO_PROFILE_RATE = _env_float('SOLVER_AUTO_PROFILE_RATE', 0)
+# Sólo se guardan los perfiles automáticos de peticiones más lentas que este umbral
+AUTO_PROFILE_MS = _env_float('SOLVER_AUTO_PROFILE_MS', 5000)
+
+# Captura de tráfico de /solve (para reproducirlo con bench/loadgen.py)
+# Archivo JSONL donde se guardan las peticiones (vacío = captura desactivada); lo comparten todos los procesos
+CAPTURE_PATH = os.environ.get('SOLVER_CAPTURE_PATH', '')
+if CAPTURE_PATH:
+    # Las rutas relativas se resuelven dentro del directorio de datos compartido
+    CAPTURE_PATH = os.path.join(DATA_DIR, CAPTURE_PATH)
+# Fracción de peticiones que se capturan
+CAPTURE_RATE = _env_float('SOLVER_CAPTURE_RATE', 1.0)
+
+# Peticiones idénticas simultáneas comparten un único cálculo
+COALESCE_REQUESTS = _env_bool('SOLVER_COALESCE', True)
+
+# Control de admisión (SymPy es CPU y retiene el GIL)
+ADMISSION_CONTROL = _env_bool('SOLVER_ADMISSION', True)
+# Cálculos pesados simultáneos por proceso (por defecto, uno por worker si hay workers)
+MAX_CONCURRENT_SOLVES = int(_env_float('SOLVER_MAX_CONCURRENT', _env_float('SOLVER_WORKERS', 0) or 2))
+# Peticiones que pueden esperar plaza; las que no caben reciben 503 inmediatamente
+MAX_QUEUED_SOLVES = int(_env_float('SOLVER_MAX_QUEUE', 16))
+# Espera máxima (real o estimada) en la cola antes de responder 503
+MAX_QUEUE_WAIT_S = _env_float('SOLVER_MAX_QUEUE_WAIT_S', 20)
+# Plazas reservadas para trabajo ligero
+LIGHT_SLOTS = int(_env_float('SOLVER_LIGHT_SLOTS', 1))
+
+# Workers de cálculo en procesos separados (0 = resolver dentro del proceso web)
+SOLVER_WORKERS = int(_env_float('SOLVER_WORKERS', 0))
+# Límite de espacio de direcciones de cada worker (RLIMIT_AS), en MiB (0 = sin límite)
+WORKER_MEMORY_LIMIT_MB = _env_float('SOLVER_WORKER_MEMORY_MB', 2048)
+# Reciclar cada worker tras este número de tareas (0 = nunca)
+WORKER_MAX_TASKS = int(_env_float('SOLVER_WORKER_MAX_TASKS', 200))
+# Reciclar el worker cuando su memoria residente supera este valor en MiB (0 = nunca)
+WORKER_MAX_RSS_MB = _env_float('SOLVER_WORKER_MAX_RSS_MB', 1024)
+# Tiempo máximo de un cálculo en un worker antes de terminarlo (0 = sin límite)
+SOLVE_TIMEOUT_S = _env_float('SOLVER_SOLVE_TIMEOUT_S', 60)
+
+# Caché interna de SymPy (cacheit)
+# Tamaño máximo por función memoizada ('' = valor por defecto de SymPy, 'none' = ilimitado)
+SYMPY_CACHE_SIZE = os.environ.get('SOLVER_SYMPY_CACHE_SIZE', '')
+# Vaciar la caché cada N peticiones (0 = nunca)
+SYMPY_CACHE_CLEAR_EVERY = int(_env_float('SOLVER_SYMPY_CACHE_CLEAR_EVERY', 0))
+# Vaciar la caché cuando la memoria residente del proceso supera este valor en MiB (0 = nunca)
+SYMPY_CACHE_CLEAR_RSS_MB = _env_float('SOLVER_SYMPY_CACHE_CLEAR_RSS_MB', 0)
+
+# Marcas de cancelación compartidas entre procesos (POST /solve/cancel)
+CANCEL_DIR = os.path.join(DATA_DIR, 'cancel')
+
+# Métricas de todos los procesos HTTP de serve.py: un JSON por proceso que /metrics agrega
+METRICS_DIR = os.environ.get('SOLVER_METRICS_DIR', os.path.join(DATA_DIR, 'metrics'))
+
+# Calentamiento al arrancar: una ecuación por método antes de declararse listo (/ready)
+WARMUP = _env_bool('SOLVER_WARMUP', True)
+# Calentar en segundo plano al importar app.py (serve.py lo desactiva y calienta el maestro antes del fork)
+WARMUP_ON_IMPORT = _env_bool('SOLVER_WARMUP_ON_IMPORT', True)
+
+# Plazo total de una petición a /solve en segundos, cola incluida (0 = sin plazo).
+# Acorta la espera en la cola y el tiempo máximo del worker de cálculo
+REQUEST_DEADLINE_S = _env_float('SOLVER_REQUEST_DEADLINE_S', 0)
+
+# Renderizado de expresiones (LaTeX/MathML de los pasos y la solución)
+# Expresiones impresas que se guardan en la caché LRU de steplog.py (0 = sin caché)
+RENDER_CACHE_SIZE = int(_env_float('SOLVER_RENDER_CACHE_SIZE', 4096))
+# Copia local de MathJax (python fetch_mathjax.py); si no existe, la página usa la CDN
+MATHJAX_DIR = os.environ.get('SOLVER_MATHJAX_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'vendor', 'mathjax'))
+
+# Sistemas lineales (systems.py): tamaño máximo para calcular e^{At} de forma exacta;
+# los mayores, o con coeficientes decimales, usan la vía numérica de NumPy
+SYSTEM_EXACT_MAX_SIZE = int(_env_float('SOLVER_SYSTEM_EXACT_MAX', 4))
+
+# Series de potencias (series.py)
+# Términos que se muestran cuando el método automático elige un hint de series
+SERIES_TERMS = int(_env_float('SOLVER_SERIES_TERMS', 6))
+# Máximo de términos que se pueden pedir a /series
+SERIES_MAX_TERMS = int(_env_float('SOLVER_SERIES_MAX_TERMS', 60))
+# Ecuaciones cuyos coeficientes ya calculados se conservan (LRU)
+SERIES_CACHE_SIZE = int(_env_float('SOLVER_SERIES_CACHE_SIZE', 128))
+
+# Campos de direcciones y retratos de fase (fields.py)
+# Funciones de campo compiladas con lambdify que se conservan (LRU)
+FIELD_CACHE_SIZE = int(_env_float('SOLVER_FIELD_CACHE_SIZE', 64))
+# Máximo de puntos por lado de la malla, de trayectorias y de pasos por trayectoria
+FIELD_MAX_POINTS = int(_env_float('SOLVER_FIELD_MAX_POINTS', 200))
+FIELD_MAX_TRAJECTORIES = int(_env_float('SOLVER_FIELD_MAX_TRAJECTORIES', 50))
+FIELD_MAX_STEPS = int(_env_float('SOLVER_FIELD_MAX_STEPS', 2000))
+
+# Problemas de contorno numéricos (bvp.py): máximo de puntos de la malla
+BVP_MAX_POINTS = int(_env_float('SOLVER_BVP_MAX_POINTS', 5001))
+
+# Orden adaptativo de los hints en modo automático (hintstats.py)
+HINT_LEARNING = _env_bool('SOLVER_HINT_LEARNING', True)
+# Intentos de cada hint por forma de ecuación; lo comparten todos los procesos y sobrevive a los reinicios
+HINT_STATS_PATH = os.path.join(DATA_DIR, os.environ.get('SOLVER_HINT_STATS_PATH', 'hint_stats.jsonl'))
+# Fracción de peticiones que prueban primero el hint menos visto para mantener frescas las estadísticas
+HINT_EXPLORATION = _env_float('SOLVER_HINT_EXPLORATION', 0.1)
+
+# Pre-paso de racionalización (rationals.py): resolver con racionales exactos las ecuaciones con decimales
+# Valor por defecto en /solve cuando la petición no indica "rationalize"
+RATIONALIZE = _env_bool('SOLVER_RATIONALIZE', False)
+# Tolerancia para buscar la fracción más sencilla (0 = el decimal exacto tal como se escribió: 0.333 -> 333/1000)
+RATIONALIZE_TOLERANCE = _env_float('SOLVER_RATIONALIZE_TOLERANCE', 0)
+
+# Exportación de soluciones como módulos de Python (export.py): módulos generados que se conservan (LRU)
+EXPORT_CACHE_SIZE = int(_env_float('SOLVER_EXPORT_CACHE_SIZE', 128))
+
+# Caché HTTP de GET /solve y compresión (httpcache.py)
+# max-age de Cache-Control para las soluciones (navegador y proxies inversos)
+HTTP_CACHE_MAX_AGE = _env_float('SOLVER_HTTP_CACHE_MAX_AGE', 3600)
+# Respuestas de GET /solve guardadas por ETag en cada proceso (0 = sin caché)
+HTTP_CACHE_SIZE = int(_env_float('SOLVER_HTTP_CACHE_SIZE', 256))
+# Las respuestas JSON de más de estos bytes se comprimen con gzip si el cliente lo acepta
+HTTP_GZIP_MIN_BYTES = int(_env_float('SOLVER_HTTP_GZIP_MIN_BYTES', 1024))
@@ -0,0 +1,266 @@
+"""
+Exportación de una solución como módulo de Python autónomo y vectorizado.
+
+Los trabajos de simulación evalúan las soluciones millones de veces; el LaTeX
+de /solve no les sirve. Aquí la solución y(x) (y, si se piden, sus derivadas)
+se convierte en el código fuente de un módulo que sólo depende de NumPy (o de
+scipy.special para funciones especiales):
+
+- subexpresiones comunes eliminadas con cse (compartidas entre y y sus derivadas);
+- funciones de NumPy elemento a elemento: x puede ser un escalar o un array;
+- las constantes de integración (y cualquier otro parámetro libre) son
+  argumentos con nombre obligatorios;
+- una tabla de valores calculados con SymPy y self_check(), que la compara
+  con lo que devuelve el módulo (también sobre un array, para comprobar la
+  vectorización).
+
+El código generado se guarda en una caché LRU por huella de la expresión, así
+que exportar otra vez la misma solución no cuesta nada. Antes de guardarlo se
+ejecuta su self_check cuando sus dependencias están instaladas.
+"""
+import hashlib
+import keyword
+import math
+import threading
+from collections import OrderedDict
+
+from sympy import (Eq, Function, Max, Min, Piecewise, Symbol, __version__ as sympy_version, cse, numbered_symbols,
+                   srepr, symbols)
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations
+from sympy.printing.numpy import NumPyPrinter, SciPyPrinter
+
+import cancellation
+import config
+
+MAX_DERIVATIVES = 3
+CHECK_POINTS = (0.1, 0.5, 1.0, 1.5, 2.0, 3.0)
+CHECK_DIGITS = 30
+RTOL = 1e-8
+ATOL = 1e-12
+DERIVATIVE_NAMES = ('y', 'dy', 'd2y', 'd3y')
+_RESERVED = {'x', 'numpy', 'scipy', 'math', 'CONSTANTS', 'SELF_CHECK', 'self_check', 'derivatives'}
+
+
+def parse_solution(text, index=0):
+    """
+    Expresión f(x) de una solución escrita como 'Eq(y(x), f)' (formato text de
+    /solve), 'y(x) = f', 'y = f' o simplemente 'f'. Con una lista de soluciones
+    se toma la de posición `index`.
+    """
+    x = symbols('x')
+    local_dict = {'x': x, 'y': Function('y'), 'Eq': Eq}
+    text = str(text or '').strip()
+    if not text:
+        raise ValueError('Falta la solución')
+    if '=' in text and '==' not in text and not text.startswith(('Eq(', '[')):
+        lhs, text = text.split('=', 1)
+        if lhs.strip() not in ('y', 'y(x)'):
+            raise ValueError('La solución debe tener la forma y(x) = f(x)')
+    try:
+        parsed = parse_expr(text, local_dict=local_dict, transformations=standard_transformations)
+    except Exception as e:
+        raise ValueError(f'No se pudo leer la solución: {e}')
+    if isinstance(parsed, (list, tuple)):
+        if not 0 <= index < len(parsed):
+            raise ValueError(f'index debe estar entre 0 y {len(parsed) - 1}')
+        parsed = parsed[index]
+    if isinstance(parsed, Eq):
+        if parsed.rhs.has(Function('y')(x)):
+            raise ValueError('Sólo se pueden exportar soluciones explícitas y(x) = f(x)')
+        parsed = parsed.rhs
+    if parsed.has(Function('y')(x)):
+        raise ValueError('Sólo se pueden exportar soluciones explícitas y(x) = f(x)')
+    return parsed
+
+
+def parameters_of(expr):
+    """Nombres de los argumentos con nombre del módulo (constantes y parámetros), ordenados"""
+    names = sorted(str(s) for s in expr.free_symbols if str(s) != 'x')
+    for name in names:
+        if not name.isidentifier() or keyword.iskeyword(name) or name in _RESERVED or name.startswith('_'):
+            raise ValueError(f"El parámetro '{name}' no puede ser un argumento de Python")
+    return names
+
+
+def _printer(exprs):
+    """NumPyPrinter, o SciPyPrinter si hace falta scipy.special; ValueError si nada lo imprime"""
+    for printer_class in (NumPyPrinter, SciPyPrinter):
+        printer = printer_class({'fully_qualified_modules': True})
+        try:
+            printed = [printer.doprint(expr) for expr in exprs]
+        except (NotImplementedError, ValueError, TypeError):
+            continue
+        # math.* no es vectorizado; lo que NumPy no sabe imprimir queda como comentario
+        if 'math' not in printer.module_imports and not any('Not supported' in code for code in printed):
+            return printer
+    raise ValueError('La solución usa funciones que no se pueden exportar a NumPy/SciPy '
+                     '(p. ej. integrales sin evaluar)')
+
+
+def _reference_values(exprs, names):
+    """(x, constantes, [y, y', ...]) calculados con SymPy en los puntos de CHECK_POINTS"""
+    x = symbols('x')
+    constants = {name: 0.5 + 0.25 * i for i, name in enumerate(names)}
+    substitutions = {Symbol(name): value for name, value in constants.items()}
+    table = []
+    for point in CHECK_POINTS:
+        cancellation.check()
+        values = []
+        for expr in exprs:
+            value = complex(expr.subs(substitutions).subs(x, point).evalf(CHECK_DIGITS))
+            if abs(value.imag) > ATOL or not math.isfinite(value.real):
+                break
+            values.append(value.real)
+        else:
+            table.append((point, constants, values))
+    return table
+
+
+def generate(expr, derivatives=0):
+    """
+    Código fuente del módulo de y(x) = expr y de sus `derivatives` primeras
+    derivadas, y el número de puntos de referencia de su self_check.
+    """
+    x = symbols('x')
+    names = parameters_of(expr)
+    exprs = [expr]
+    for _ in range(derivatives):
+        exprs.append(exprs[-1].diff(x))
+    # NumPyPrinter imprime Max/Min con numpy.amax de una tupla, que falla si x es un array
+    exprs = [e.replace(lambda e: isinstance(e, (Max, Min)), lambda e: e.rewrite(Piecewise)) for e in exprs]
+    printer = _printer(exprs)
+    table = _reference_values(exprs, names)
+    keywords = ''.join(f', {name}' for name in names)
+    signature = f'(x, *{keywords})' if names else '(x)'
+    calls = ', **constants' if names else ''
+
+    def body(targets):
+        replacements, reduced = cse(targets, symbols=numbered_symbols('_t'))
+        lines = ['    x = numpy.asarray(x, dtype=float)', '    _zeros = numpy.zeros(x.shape)']
+        lines += [f'    {symbol} = {printer.doprint(value)}' for symbol, value in replacements]
+        # Las expresiones constantes se amplían a la forma de x
+        results = [f'({printer.doprint(value)}) + _zeros' for value in reduced]
+        lines.append(f"    return {results[0] if len(results) == 1 else '(' + ', '.join(results) + ')'}")
+        return '\n'.join(lines)
+
+    imports = sorted(printer.module_imports) or ['numpy']
+    if 'numpy' not in imports:
+        imports.insert(0, 'numpy')
+    parts = [
+        '"""',
+        'Solución exportada por el solucionador de ecuaciones diferenciales.',
+        '',
+        f'    y(x) = {expr}',
+        '',
+        f"Generado con SymPy {sympy_version}. Depende sólo de {' y '.join(imports)}.",
+        'x puede ser un escalar o un array de NumPy; las constantes se pasan por nombre.',
+        '"""',
+        *[f'import {module}' for module in imports],
+        '',
+        f'CONSTANTS = {tuple(names)!r}',
+        '',
+        '',
+        f'def y{signature}:',
+        '    """y(x) evaluada elemento a elemento"""',
+        body(exprs[:1]),
+    ]
+    if derivatives:
+        labels = ', '.join(DERIVATIVE_NAMES[:derivatives + 1])
+        parts += [
+            '',
+            '',
+            f'def derivatives{signature}:',
+            f'    """({labels}) en x, con las subexpresiones comunes calculadas una sola vez"""',
+            body(exprs),
+        ]
+    check_columns = 'y' if not derivatives else ', '.join(DERIVATIVE_NAMES[:derivatives + 1])
+    parts += [
+        '',
+        '',
+        f'# Valores de referencia calculados con SymPy ({CHECK_DIGITS} cifras): (x, constantes, [{check_columns}])',
+        'SELF_CHECK = [',
+        *[f'    ({point!r}, {constants!r}, {[float(v) for v in values]!r}),' for point, constants, values in table],
+        ']',
+        '',
+        '',
+        f'def self_check(rtol={RTOL!r}, atol={ATOL!r}):',
+        '    """Compara el módulo con los valores de SymPy, punto a punto y sobre un array; AssertionError si difieren"""',
+        '    for point, constants, expected in SELF_CHECK:',
+        f'        values = [y(point{calls})]' if not derivatives else
+        f'        values = list(derivatives(point{calls}))',
+        '        for value, reference in zip(values, expected):',
+        '            assert abs(float(value) - reference) <= atol + rtol * abs(reference), (point, value, reference)',
+        '    if SELF_CHECK:',
+        '        points = numpy.array([point for point, _, _ in SELF_CHECK])',
+        '        constants = SELF_CHECK[0][1]',
+        f'        values = y(points{calls})',
+        '        expected = numpy.array([row[2][0] for row in SELF_CHECK])',
+        '        assert numpy.allclose(values, expected, rtol=rtol, atol=atol), (values, expected)',
+        '    return len(SELF_CHECK)',
+        '',
+        '',
+        "if __name__ == '__main__':",
+        "    print(f'self_check: {self_check()} puntos correctos')",
+        '',
+    ]
+    return '\n'.join(parts), len(table)
+
+
+def run_self_check(source):
+    """Ejecuta self_check del módulo generado; None si falta alguna de sus dependencias"""
+    namespace = {'__name__': 'solver_export'}
+    try:
+        exec(compile(source, '<export>', 'exec'), namespace)
+    except ImportError:
+        return None
+    return namespace['self_check']()
+
+
+# --- Caché de módulos generados ---
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def fingerprint(expr, derivatives=0):
+    return hashlib.sha256(f'{srepr(expr)}|{derivatives}'.encode('utf-8')).hexdigest()
+
+
+def peek(expr, derivatives=0):
+    with _cache_lock:
+        return _cache.get(fingerprint(expr, derivatives))
+
+
+def get_module(expr, derivatives=0):
+    """
+    {'hash', 'source', 'constants', 'check_points', 'checked'} del módulo de expr,
+    de la caché o recién generado (y comprobado). Devuelve también si venía de la caché.
+    """
+    if not 0 <= derivatives <= MAX_DERIVATIVES:
+        raise ValueError(f'derivatives debe estar entre 0 y {MAX_DERIVATIVES}')
+    key = fingerprint(expr, derivatives)
+    with _cache_lock:
+        module = _cache.get(key)
+        if module is not None:
+            _cache.move_to_end(key)
+            return module, True
+    source, check_points = generate(expr, derivatives)
+    try:
+        checked = run_self_check(source)
+    except AssertionError as e:
+        raise ValueError(f'El módulo generado no coincide con SymPy: {e}')
+    except Exception as e:
+        raise ValueError(f'El módulo generado no se puede evaluar con NumPy: {e}')
+    module = {'hash': key, 'source': source, 'constants': parameters_of(expr),
+              'check_points': check_points, 'checked': checked is not None}
+    with _cache_lock:
+        module = _cache.setdefault(key, module)
+        _cache.move_to_end(key)
+        while len(_cache) > config.EXPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return module, False
+
+
+def cache_size():
+    with _cache_lock:
+        return len(_cache)
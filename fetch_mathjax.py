@@ -0,0 +1,96 @@
+"""
+Descarga una copia local de MathJax para servirla desde la aplicación.
+
+La página sólo necesita MathJax en navegadores sin MathML nativo; con la copia
+local funciona en redes sin acceso a la CDN y se sirve con caché de un año
+(/vendor/mathjax/<versión>/...). Sin copia local la página usa la CDN.
+
+Uso:
+    python fetch_mathjax.py                      # descarga del registro de npm
+    python fetch_mathjax.py --from mathjax.tgz   # tarball ya descargado (red sin salida)
+
+Se extrae el directorio es5/ del paquete npm en SOLVER_MATHJAX_DIR
+(por defecto static/vendor/mathjax) y se anota la versión en version.txt.
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import urllib.request
+
+import config
+
+DEFAULT_VERSION = '3.2.2'
+REGISTRY_URL = 'https://registry.npmjs.org/mathjax/-/mathjax-{version}.tgz'
+PREFIX = 'package/es5/'
+
+
+def extract(data, target, version):
+    """Extrae package/es5/ del tarball en `target` (sustituye la copia anterior)"""
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    count = 0
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as tar:
+        try:
+            # Con --from la versión real es la del package.json del tarball
+            with tar.extractfile('package/package.json') as f:
+                version = json.load(f).get('version') or version
+        except (KeyError, ValueError):
+            pass
+        for member in tar.getmembers():
+            if not member.isfile() or not member.name.startswith(PREFIX):
+                continue
+            relative = os.path.normpath(member.name[len(PREFIX):])
+            if relative.startswith('..') or os.path.isabs(relative):
+                continue
+            path = os.path.join(staging, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tar.extractfile(member) as src, open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            count += 1
+    if not os.path.exists(os.path.join(staging, 'mml-chtml.js')):
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ValueError('El tarball no contiene es5/mml-chtml.js: ¿es el paquete npm de MathJax 3?')
+    with open(os.path.join(staging, 'version.txt'), 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return count, version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Descarga MathJax para servirlo sin CDN')
+    parser.add_argument('--version', default=DEFAULT_VERSION, help='Versión de MathJax 3')
+    parser.add_argument('--from', dest='tarball', help='Usar un tarball de npm ya descargado')
+    parser.add_argument('--target', default=config.MATHJAX_DIR, help='Directorio destino; SOLVER_MATHJAX_DIR')
+    args = parser.parse_args(argv)
+
+    if args.tarball:
+        with open(args.tarball, 'rb') as f:
+            data = f.read()
+    else:
+        url = REGISTRY_URL.format(version=args.version)
+        print(f'Descargando {url}', file=sys.stderr)
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                data = response.read()
+        except OSError as e:
+            print(f'No se pudo descargar MathJax: {e}\n'
+                  f'Descarga el tarball en otra máquina y usa --from', file=sys.stderr)
+            return 1
+
+    try:
+        count, version = extract(data, os.path.abspath(args.target), args.version)
+    except (tarfile.TarError, ValueError) as e:
+        print(f'Tarball no válido: {e}', file=sys.stderr)
+        return 1
+    print(f'MathJax {version}: {count} archivos en {args.target} '
+          f'(reinicia el servidor para usar la copia local)', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Campos de direcciones y retratos de fase evaluados con NumPy.
+
+- Orden 1: y' = f(x, y) se despeja una vez; el campo es (1, f) en el plano (x, y).
+- Orden 2 autónoma: y'' = g(y, y') equivale al sistema y' = v, v' = g(y, v) en el
+  plano de fase (y, v).
+
+La función del campo se compila con lambdify una sola vez por ecuación (caché
+LRU) y se evalúa sobre toda la malla en una llamada. Las trayectorias se
+integran todas a la vez con RK4 sobre el campo normalizado (paso en longitud de
+arco), hacia delante y hacia atrás, hasta salir de la ventana.
+"""
+import base64
+import json
+import struct
+import threading
+from collections import OrderedDict
+
+from sympy import Dummy, lambdify, ode_order, sympify
+
+import cancellation
+import config
+from series import isolate_highest_derivative
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+SLOPE = 'slope'
+PHASE = 'phase'
+
+
+class CompiledField:
+    """Campo (u, v) de una ecuación ya compilado a una función de NumPy"""
+
+    def __init__(self, eq, y, parameters=None):
+        if not HAVE_NUMPY:
+            raise ValueError('Los campos de direcciones necesitan NumPy')
+        x = y.args[0]
+        order = ode_order(eq, y)
+        if order not in (1, 2):
+            raise ValueError('Sólo hay campo de direcciones para ecuaciones de orden 1 o retrato de fase para orden 2')
+        _, rhs = isolate_highest_derivative(eq, y)
+        rhs = rhs.subs({sympify(name): value for name, value in (parameters or {}).items()})
+        P, Q = Dummy('p'), Dummy('q')
+        if order == 1:
+            self.kind = SLOPE
+            self.axes = ('x', 'y')
+            u, v = sympify(1), rhs.subs(y, Q).subs(x, P)
+        else:
+            self.kind = PHASE
+            self.axes = ('y', "y'")
+            rhs = rhs.subs(y.diff(x), Q).subs(y, P)
+            if rhs.has(x):
+                raise ValueError('El retrato de fase requiere una ecuación autónoma (y\'\' sin x explícita)')
+            u, v = Q, rhs
+        free = (u.free_symbols | v.free_symbols) - {P, Q}
+        if free:
+            names = ', '.join(sorted(str(symbol) for symbol in free))
+            raise ValueError(f'Faltan valores para los parámetros: {names}')
+        # Para mostrar: (u, v) en x, y (pendientes) o en y, v = y' (plano de fase)
+        names = {P: _axis_symbol(self.axes[0]), Q: _axis_symbol(self.axes[1])}
+        self.field = (u.xreplace(names), v.xreplace(names))
+        self._function = lambdify((P, Q), (u, v), 'numpy')
+
+    def vectors(self, X, Y):
+        """(U, V) en todos los puntos de las mallas X, Y; NaN donde el campo no está definido"""
+        with np.errstate(all='ignore'):
+            U, V = self._function(X, Y)
+            # Las componentes constantes (p. ej. la u = 1 del campo de pendientes) llegan como escalares
+            U = np.broadcast_to(np.asarray(U, dtype=complex if np.iscomplexobj(U) else float), X.shape)
+            V = np.broadcast_to(np.asarray(V, dtype=complex if np.iscomplexobj(V) else float), X.shape)
+            U, V = _real(U), _real(V)
+        return U, V
+
+    def directions(self, X, Y):
+        """Campo normalizado (vectores unitarios) y su módulo; 0 en equilibrios y puntos no definidos"""
+        U, V = self.vectors(X, Y)
+        with np.errstate(all='ignore'):
+            magnitude = np.hypot(U, V)
+            scale = np.where(np.isfinite(magnitude) & (magnitude > 1e-300), 1.0 / magnitude, 0.0)
+        return np.nan_to_num(U * scale), np.nan_to_num(V * scale), magnitude
+
+    def trajectories(self, starts, bounds, steps):
+        """
+        Trayectorias por los puntos `starts` (n×2), integradas en lote con RK4 en
+        longitud de arco. Devuelve un array n×(2·steps+1)×2 con NaN fuera de la ventana.
+        """
+        (x_min, x_max), (y_min, y_max) = bounds
+        h = float(np.hypot(x_max - x_min, y_max - y_min)) / steps
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+
+        def direction(points):
+            U, V, _ = self.directions(points[:, 0], points[:, 1])
+            return np.stack([U, V], axis=1)
+
+        def integrate(step):
+            path = np.full((len(starts), steps + 1, 2), np.nan)
+            points = starts.copy()
+            alive = _inside(points, bounds)
+            path[alive, 0] = points[alive]
+            for i in range(1, steps + 1):
+                if not alive.any():
+                    break
+                cancellation.check()
+                k1 = direction(points)
+                k2 = direction(points + step / 2 * k1)
+                k3 = direction(points + step / 2 * k2)
+                k4 = direction(points + step * k3)
+                moved = points + step / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+                # Se detiene en los equilibrios y al salir de la ventana
+                alive &= _inside(moved, bounds) & np.any(k1 != 0, axis=1)
+                points = np.where(alive[:, None], moved, points)
+                path[alive, i] = points[alive]
+            return path
+
+        forward, backward = integrate(h), integrate(-h)
+        return np.concatenate([backward[:, :0:-1], forward], axis=1)
+
+
+def _axis_symbol(name):
+    return sympify('v') if name == "y'" else sympify(name)
+
+
+def _real(values):
+    if not np.iscomplexobj(values):
+        return values
+    return np.where(np.abs(values.imag) < 1e-12, values.real, np.nan)
+
+
+def _inside(points, bounds):
+    (x_min, x_max), (y_min, y_max) = bounds
+    with np.errstate(invalid='ignore'):
+        return ((points[:, 0] >= x_min) & (points[:, 0] <= x_max) &
+                (points[:, 1] >= y_min) & (points[:, 1] <= y_max))
+
+
+def evaluate(field, bounds, points, normalize=True, starts=(), steps=200):
+    """Malla de points×points, vectores (normalizados o no), módulo y trayectorias"""
+    (x_min, x_max), (y_min, y_max) = bounds
+    xs = np.linspace(x_min, x_max, points)
+    ys = np.linspace(y_min, y_max, points)
+    X, Y = np.meshgrid(xs, ys)
+    if normalize:
+        U, V, magnitude = field.directions(X, Y)
+    else:
+        U, V = field.vectors(X, Y)
+        with np.errstate(all='ignore'):
+            magnitude = np.hypot(U, V)
+    arrays = {'x': xs, 'y': ys, 'u': U, 'v': V, 'magnitude': magnitude}
+    if len(starts):
+        arrays['trajectories'] = field.trajectories(starts, bounds, steps)
+    return arrays
+
+
+# --- Caché de campos compilados ---
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cache_key(eq, parameters):
+    return (str(eq), tuple(sorted((str(name), float(value)) for name, value in (parameters or {}).items())))
+
+
+def peek(eq, parameters=None):
+    with _cache_lock:
+        return _cache.get(cache_key(eq, parameters))
+
+
+def get_field(eq, y, parameters=None):
+    """Campo compilado de la caché (LRU por ecuación y parámetros) o uno nuevo"""
+    key = cache_key(eq, parameters)
+    with _cache_lock:
+        field = _cache.get(key)
+        if field is not None:
+            _cache.move_to_end(key)
+            return field
+    field = CompiledField(eq, y, parameters)
+    with _cache_lock:
+        field = _cache.setdefault(key, field)
+        _cache.move_to_end(key)
+        while len(_cache) > config.FIELD_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return field
+
+
+def cache_size():
+    with _cache_lock:
+        return len(_cache)
+
+
+# --- Codificación de los arrays (float32 little-endian) ---
+
+def _float32(values):
+    return np.ascontiguousarray(values, dtype='<f4')
+
+
+def encode_base64(arrays):
+    """{nombre: {shape, dtype, data}} con los datos en base64, para incluir en JSON"""
+    encoded = {}
+    for name, values in arrays.items():
+        values = _float32(values)
+        encoded[name] = {'shape': list(values.shape), 'dtype': 'float32',
+                         'data': base64.b64encode(values.tobytes()).decode('ascii')}
+    return encoded
+
+
+def encode_binary(header, arrays):
+    """
+    Cuerpo binario: longitud de la cabecera (uint32 LE), cabecera JSON con la
+    forma y el desplazamiento de cada array, y los arrays float32 seguidos
+    (cada uno alineado a 4 bytes para leerlo con Float32Array sin copiar).
+    """
+    blobs, layout, offset = [], {}, 0
+    for name, values in arrays.items():
+        values = _float32(values)
+        layout[name] = {'shape': list(values.shape), 'dtype': 'float32', 'offset': offset}
+        blobs.append(values.tobytes())
+        offset += values.nbytes
+    meta = json.dumps(dict(header, arrays=layout), ensure_ascii=False).encode('utf-8')
+    meta += b' ' * (-(len(meta) + 4) % 4)
+    return struct.pack('<I', len(meta)) + meta + b''.join(blobs)
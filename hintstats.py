@@ -0,0 +1,301 @@
+"""
+Orden adaptativo de los hints de dsolve aprendido de las resoluciones anteriores.
+
+En modo automático /solve prueba los hints en el orden estático de
+classify_ode, aunque la experiencia diga que otro hint aplicable resuelve esa
+forma de ecuación antes y con más fiabilidad. Aquí se registra, para cada hint,
+los intentos, los éxitos y el tiempo total (dsolve más la simplificación de su
+resultado) por dos claves:
+
+- forma: la ecuación con los coeficientes numéricos abstraídos (y' = 2*x*y y
+  y' = 5*x*y comparten forma);
+- clase: la lista de hints aplicables de classify_ode, para las formas nuevas.
+
+Los candidatos son los primeros MAX_CANDIDATES de classify_ode (los mismos que
+sin aprendizaje), sin las variantes _Integral, las series ni lie_group: dan
+integrales sin evaluar, series truncadas o resultados implícitos, y como
+dsolve no falla con ellos parecerían los más rápidos. Se ordenan por coste
+esperado hasta el éxito (tiempo medio / probabilidad de éxito) y se descartan
+los que fallan siempre en esa forma. Sólo cuenta como éxito una solución sin
+Integral ni O(x^n). Con probabilidad HINT_EXPLORATION se prueba primero el hint
+menos visto, para que las estadísticas no se congelen.
+
+Las estadísticas se guardan en un JSONL en DATA_DIR (una línea por intento,
+escrita con un único write en modo append, como capture.py), así que sobreviven
+a los reinicios y las comparten todos los procesos y workers; cada proceso lee
+periódicamente las líneas nuevas. Al cargar, un archivo demasiado largo se
+compacta a una línea por (forma, clase, hint); los intentos que otro proceso
+escriba mientras tanto se pierden, lo que no importa para unas estadísticas.
+"""
+import atexit
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from sympy import Integral, Order, Symbol, ode_order, srepr
+
+import config
+
+MAX_CANDIDATES = 5
+# Intentos mínimos de un hint en una clave para usar sus estadísticas (el prior de
+# expected_cost ya penaliza las estimaciones con pocos intentos)
+MIN_SAMPLES = 1
+# Intentos sin ningún éxito en una forma para descartar el hint
+PRUNE_AFTER = 5
+REFRESH_S = 30
+COMPACT_LINES = 20000
+
+LEARNED = 'learned'
+STATIC = 'static'
+EXPLORE = 'explore'
+
+_COEFFICIENT = Symbol('k')
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint(eq, y):
+    """Clave de forma: orden y estructura de lhs - rhs con los coeficientes numéricos abstraídos"""
+    expr = eq.lhs - eq.rhs
+    shape = expr.replace(lambda e: e.is_Number and e not in (0, 1, -1), lambda e: _COEFFICIENT)
+    return _digest(f'{ode_order(eq, y)}:{srepr(shape)}')
+
+
+def learnable(hint):
+    """Si el hint puede competir por el primer puesto (no da integrales, series ni soluciones de Lie)"""
+    return not hint.endswith('_Integral') and 'power_series' not in hint and hint != 'lie_group'
+
+
+def candidate_pool(hints):
+    """Hints que se ordenan: los primeros de classify_ode que pueden competir"""
+    return [hint for hint in hints[:MAX_CANDIDATES] if learnable(hint)]
+
+
+def solved(solution):
+    """True si la solución (o todas las de una lista) no deja integrales sin evaluar ni términos O(x^n)"""
+    solutions = solution if isinstance(solution, list) else [solution]
+    return all(item is not None and not item.has(Integral, Order) for item in solutions)
+
+
+def class_key(hints):
+    return _digest('|'.join(hints))
+
+
+class _Counts:
+    __slots__ = ('attempts', 'successes', 'total_ms')
+
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.total_ms = 0.0
+
+    def add(self, attempts, successes, total_ms):
+        self.attempts += attempts
+        self.successes += successes
+        self.total_ms += total_ms
+
+    def expected_cost(self):
+        # Coste medio por intento dividido por la probabilidad de éxito (con prior de Laplace)
+        return (self.total_ms / self.attempts) * (self.attempts + 2) / (self.successes + 1)
+
+
+class HintStats:
+    """Estadísticas por (clave, hint) respaldadas por un JSONL compartido"""
+
+    def __init__(self, path, exploration=0.1, rng=None):
+        self.path = path
+        self.exploration = exploration
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._shapes = {}
+        self._classes = {}
+        self._offset = 0
+        self._inode = None
+        self._refreshed = 0.0
+        self._file = None
+        self._load()
+
+    # --- Persistencia ---
+
+    def _load(self):
+        self._shapes.clear()
+        self._classes.clear()
+        self._offset = 0
+        lines = self._read_new(own=True)
+        if lines > COMPACT_LINES:
+            self._compact()
+
+    def _read_new(self, own=False):
+        """
+        Incorpora las líneas añadidas desde la última lectura (las de este proceso
+        ya están en memoria, salvo al cargar el archivo entero); devuelve cuántas había.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                self._inode = os.fstat(f.fileno()).st_ino
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return 0
+        # Una línea a medio escribir por otro proceso se deja para la próxima lectura
+        complete = data[:data.rfind(b'\n') + 1]
+        self._offset += len(complete)
+        lines, pid = 0, os.getpid()
+        for line in complete.splitlines():
+            try:
+                item = json.loads(line)
+                lines += 1
+                if not own and item.get('pid') == pid:
+                    continue
+                self._add(item['shape'], item['class'], item['hint'],
+                          int(item.get('n', 1)), int(item['ok']), float(item['ms']))
+            except (ValueError, KeyError, TypeError):
+                continue
+        self._refreshed = time.monotonic()
+        return lines
+
+    def _add(self, shape, klass, hint, attempts, successes, total_ms):
+        for table, key in ((self._shapes, shape), (self._classes, klass)):
+            counts = table.setdefault(key, {}).setdefault(hint, _Counts())
+            counts.add(attempts, successes, total_ms)
+
+    def _compact(self):
+        """Reescribe el archivo con una línea acumulada por (forma, clase, hint)"""
+        merged = {}
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                        key = (item['shape'], item['class'], item['hint'])
+                        counts = merged.setdefault(key, _Counts())
+                        counts.add(int(item.get('n', 1)), int(item['ok']), float(item['ms']))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+            staging = self.path + f'.{os.getpid()}.tmp'
+            with open(staging, 'w', encoding='utf-8') as f:
+                for (shape, klass, hint), counts in merged.items():
+                    f.write(json.dumps({'shape': shape, 'class': klass, 'hint': hint, 'n': counts.attempts,
+                                        'ok': counts.successes, 'ms': round(counts.total_ms, 2)}) + '\n')
+            os.replace(staging, self.path)
+        except OSError:
+            return
+        self._load()
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._refreshed < REFRESH_S:
+            return
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            inode = None
+        if inode != self._inode:
+            # Otro proceso compactó el archivo: se relee entero y se reabre para escribir
+            self._close_file()
+            self._load()
+        else:
+            self._read_new()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+    # --- Orden y registro ---
+
+    def _counts(self, shape, klass, hint):
+        for table, key in ((self._shapes, shape), (self._classes, klass)):
+            counts = table.get(key, {}).get(hint)
+            if counts is not None and counts.attempts >= MIN_SAMPLES:
+                return counts
+        return None
+
+    def order(self, shape, hints):
+        """
+        Candidatos (los de candidate_pool, reordenados) y cómo se eligió el orden:
+        STATIC (sin datos suficientes), LEARNED o EXPLORE.
+        """
+        klass = class_key(hints)
+        pool = candidate_pool(hints)
+        if not pool:
+            # Sólo quedan series o integrales: el orden de classify_ode, como sin aprendizaje
+            return list(hints[:MAX_CANDIDATES]), STATIC
+        with self._lock:
+            self._maybe_refresh()
+            known = {hint: self._counts(shape, klass, hint) for hint in pool}
+            pruned = {hint for hint in pool
+                      if (counts := self._shapes.get(shape, {}).get(hint)) is not None
+                      and counts.attempts >= PRUNE_AFTER and counts.successes == 0}
+            seen = {hint: sum(table.get(key, {}).get(hint, _Counts()).attempts
+                              for table, key in ((self._shapes, shape), (self._classes, klass)))
+                    for hint in pool}
+        if self._rng.random() < self.exploration:
+            # Exploración: primero el hint menos probado (los de classify_ode desempatan)
+            first = min(pool, key=seen.get)
+            return [first] + [hint for hint in pool if hint != first], EXPLORE
+        if not any(known.values()):
+            return pool, STATIC
+        kept = [hint for hint in pool if hint not in pruned] or pool
+        # Primero los fiables (éxito al menos la mitad de las veces) por coste esperado,
+        # luego los que no tienen datos en el orden de classify_ode y al final los poco fiables
+        ranked = sorted((hint for hint in kept if known[hint]), key=lambda h: known[h].expected_cost())
+        reliable = [hint for hint in ranked if known[hint].successes * 2 >= known[hint].attempts]
+        unreliable = [hint for hint in ranked if hint not in reliable]
+        unknown = [hint for hint in kept if not known[hint]]
+        return reliable + unknown + unreliable, LEARNED
+
+    def record(self, shape, hints, hint, success, elapsed_ms):
+        """Anota un intento en memoria y en el JSONL compartido"""
+        klass = class_key(hints)
+        line = json.dumps({'shape': shape, 'class': klass, 'hint': hint, 'ok': int(bool(success)),
+                           'ms': round(elapsed_ms, 2), 'pid': os.getpid()}) + '\n'
+        with self._lock:
+            self._add(shape, klass, hint, 1, int(bool(success)), elapsed_ms)
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+                self._file.write(line)
+            except OSError:
+                self._close_file()
+
+    def summary(self, shape=None, hints=None):
+        """Estadísticas por hint de una forma (o de todas las formas juntas) para diagnóstico"""
+        with self._lock:
+            if shape is not None:
+                tables = [self._shapes.get(shape, {})]
+            else:
+                tables = list(self._shapes.values())
+            totals = {}
+            for table in tables:
+                for hint, counts in table.items():
+                    totals.setdefault(hint, _Counts()).add(counts.attempts, counts.successes, counts.total_ms)
+        return {hint: {'attempts': counts.attempts, 'successes': counts.successes,
+                       'mean_ms': round(counts.total_ms / counts.attempts, 2)}
+                for hint, counts in sorted(totals.items()) if counts.attempts}
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_stats():
+    """Estadísticas globales del proceso, o None si el aprendizaje está desactivado"""
+    global _stats
+    if not config.HINT_LEARNING:
+        return None
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = HintStats(config.HINT_STATS_PATH, config.HINT_EXPLORATION)
+                atexit.register(_stats.close)
+    return _stats
@@ -0,0 +1,194 @@
+"""
+Caché HTTP de /solve: GET con parámetros canónicos, ETag, Cache-Control y gzip.
+
+POST /solve no se puede reutilizar entre el usuario y la aplicación. GET
+/solve?eq=...&method=...&ic=... sí: la consulta se normaliza (espacios de la
+ecuación, orden de los parámetros, valores por defecto omitidos) y las
+variantes no canónicas se redirigen a la canónica, así que un enlace
+compartido es siempre la misma URL para el navegador y para un proxy inverso.
+
+La ETag (fuerte) se deriva de la clave canónica y de la versión de las
+respuestas (una huella del código de la aplicación y la versión de SymPy, de
+modo que cada despliegue que cambie el solucionador invalida las anteriores),
+no del cuerpo: un If-None-Match que coincide se contesta con 304
+sin resolver nada. Además, los cuerpos de las respuestas correctas se guardan
+en una LRU por ETag, de modo que las repeticiones que llegan a la aplicación
+tampoco pasan por el solucionador; junto a cada cuerpo se guarda su versión
+comprimida, para no volver a comprimirlo en cada acierto.
+
+Las respuestas JSON grandes (los pasos en LaTeX) se comprimen con gzip cuando
+el cliente lo acepta; la variante comprimida lleva su propia ETag ("...-gz").
+"""
+import glob
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from sympy import __version__ as sympy_version
+
+import config
+
+
+
+def _code_version():
+    """Huella de los módulos de la aplicación: cambia con cualquier despliegue que toque el código"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode('utf-8') + b'\0' + f.read())
+    return digest.hexdigest()[:12]
+
+
+# Forma parte de todas las ETag emitidas y de la versión de la caché del navegador
+RESPONSE_VERSION = _code_version()
+GZIP_SUFFIX = '-gz'
+GZIP_LEVEL = 6
+
+# Parámetros de GET /solve: nombre canónico, alias admitidos y valor por defecto (se omite)
+PARAMETERS = (
+    ('eq', ('equation',), ''),
+    ('method', (), 'auto'),
+    ('ic', ('initial_conditions',), ''),
+    ('verbosity', (), 'full'),
+    ('format', (), 'latex'),
+    ('verify', (), ''),
+    ('rationalize', (), ''),
+    ('precision', (), ''),
+)
+
+
+def read_query(args):
+    """Valores de los parámetros (con sus alias) de la query string, como texto"""
+    values = {}
+    for name, aliases, default in PARAMETERS:
+        value = args.get(name)
+        for alias in aliases:
+            value = args.get(alias) if value is None else value
+        values[name] = default if value is None else str(value)
+    return values
+
+
+def canonical_pairs(values):
+    """Parámetros canónicos en orden fijo, sin los que tienen su valor por defecto"""
+    return [(name, values[name]) for name, _, default in PARAMETERS if values[name] not in ('', default)]
+
+
+def canonical_query(values):
+    return urlencode(canonical_pairs(values))
+
+
+def is_canonical(args, values):
+    return list(args.items(multi=True)) == canonical_pairs(values)
+
+
+def response_version():
+    """Versión de las respuestas de /solve; las cachés de los clientes se invalidan al cambiar"""
+    return f'{RESPONSE_VERSION}-{sympy_version}'
+
+
+def etag_for(key):
+    """ETag de una clave canónica (tupla), ligada a la versión de SymPy y de las respuestas"""
+    text = repr((RESPONSE_VERSION, sympy_version) + tuple(key))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def matching_etag(request, etag):
+    """La variante de la ETag (sin comprimir o gzip) que el cliente envía en If-None-Match, o None"""
+    for candidate in (etag, etag + GZIP_SUFFIX):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def set_cacheable(response, etag):
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = int(config.HTTP_CACHE_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def set_uncacheable(response):
+    response.cache_control.no_store = True
+    return response
+
+
+def compress(response, request):
+    """
+    Comprime con gzip una respuesta JSON si el cliente lo acepta y el cuerpo
+    supera HTTP_GZIP_MIN_BYTES. La ETag pasa a la de la variante comprimida.
+    """
+    if (response.direct_passthrough or response.status_code != 200 or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.accept_encodings or response.content_length is None \
+            or response.content_length < config.HTTP_GZIP_MIN_BYTES:
+        return response
+    response.set_data(_gzip(response.get_data()))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + GZIP_SUFFIX, weak)
+    return response
+
+
+def _gzip(body):
+    # mtime=0: la misma respuesta comprime siempre a los mismos bytes
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def cached_response(response_class, entry, request, etag):
+    """
+    Respuesta cacheable de una entrada de ResponseCache: la variante gzip ya
+    comprimida si el cliente la acepta (compress no la vuelve a comprimir).
+    """
+    if entry['gzip'] is not None and 'gzip' in request.accept_encodings:
+        response = response_class(entry['gzip'], mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        return set_cacheable(response, etag + GZIP_SUFFIX)
+    return set_cacheable(response_class(entry['body'], mimetype='application/json'), etag)
+
+
+class ResponseCache:
+    """LRU de cuerpos de respuesta (y de su versión gzip, si es lo bastante grande) por ETag"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag):
+        """{'body', 'gzip'} de la ETag, o None"""
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag, body):
+        """Guarda el cuerpo (comprimiéndolo una sola vez) y devuelve la entrada"""
+        entry = {'body': body, 'gzip': _gzip(body) if len(body) >= config.HTTP_GZIP_MIN_BYTES else None}
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            self._entries[etag] = entry
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+responses = ResponseCache(config.HTTP_CACHE_SIZE)
@@ -0,0 +1,150 @@
+"""
+Instrumentación ligera por fases para las peticiones de /solve.
+
+Cada petición puede llevar un SpanRecorder que mide cuánto tarda cada fase
+(parseo, classify_ode, cada intento de dsolve, simplificación, condiciones
+iniciales y generación de LaTeX). Cuando la instrumentación está desactivada
+se usa NULL_RECORDER, cuyos métodos no hacen nada.
+"""
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+logger = logging.getLogger('solver.timings')
+
+_NULL_SPAN = nullcontext()
+
+
+class SpanRecorder:
+    """Acumula la duración (en ms) de cada fase y de cada intento de dsolve"""
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.hints = []
+        # Duración de cada llamada a simplify (la fase 'simplify' es su suma)
+        self.simplify = []
+        # Cómo se ordenaron los hints del modo automático (hintstats.py)
+        self.hint_order = None
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, elapsed_ms):
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed_ms
+
+    def record_hint(self, hint, elapsed_ms, success, error=None):
+        """Registra un intento de dsolve; también suma a la fase 'dsolve'"""
+        self.add('dsolve', elapsed_ms)
+        attempt = {'hint': hint, 'ms': round(elapsed_ms, 2), 'success': success}
+        if error:
+            attempt['error'] = error[:120]
+        self.hints.append(attempt)
+
+    def record_simplify(self, elapsed_ms):
+        """Registra una llamada a simplify; también suma a la fase 'simplify'"""
+        self.add('simplify', elapsed_ms)
+        self.simplify.append(round(elapsed_ms, 2))
+
+    def record_hint_order(self, decision):
+        self.hint_order = decision
+
+    def merge(self, timings):
+        """Incorpora las fases e intentos medidos en otro proceso (as_dict)"""
+        for name, ms in timings.get('phases', {}).items():
+            self.add(name, ms)
+        self.hints.extend(timings.get('hints', []))
+        self.simplify.extend(timings.get('simplify', []))
+        self.hint_order = timings.get('hint_order', self.hint_order)
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self):
+        timings = {
+            'total_ms': round(self.total_ms(), 2),
+            'phases': {name: round(ms, 2) for name, ms in self.phases.items()},
+            'hints': list(self.hints),
+        }
+        if self.simplify:
+            timings['simplify'] = list(self.simplify)
+        if self.hint_order:
+            timings['hint_order'] = self.hint_order
+        return timings
+
+
+class NullRecorder:
+    """Recorder vacío: no mide nada, para que el coste desactivado sea nulo"""
+
+    enabled = False
+    phases = {}
+    hints = []
+    simplify = []
+
+    def span(self, name):
+        return _NULL_SPAN
+
+    def add(self, name, elapsed_ms):
+        pass
+
+    def record_hint(self, hint, elapsed_ms, success, error=None):
+        pass
+
+    def record_simplify(self, elapsed_ms):
+        pass
+
+    def record_hint_order(self, decision):
+        pass
+
+    def merge(self, timings):
+        pass
+
+    def total_ms(self):
+        return 0.0
+
+    def as_dict(self):
+        return {}
+
+
+NULL_RECORDER = NullRecorder()
+
+_current_recorder = ContextVar('solver_span_recorder', default=NULL_RECORDER)
+
+
+def current_recorder():
+    """Devuelve el recorder de la petición en curso (o NULL_RECORDER)"""
+    return _current_recorder.get()
+
+
+@contextmanager
+def recording(recorder):
+    """Activa un recorder para todo el código ejecutado dentro del bloque"""
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+def log_if_slow(recorder, equation, method, threshold_ms):
+    """Escribe en el log las peticiones que superan el umbral, con su desglose"""
+    if not recorder.enabled or threshold_ms <= 0:
+        return False
+    total = recorder.total_ms()
+    if total < threshold_ms:
+        return False
+    breakdown = ', '.join(f'{name}={ms:.0f}ms' for name, ms in
+                          sorted(recorder.phases.items(), key=lambda item: -item[1]))
+    hints = ', '.join(f"{h['hint']}:{'ok' if h['success'] else 'fallo'}:{h['ms']:.0f}ms"
+                      for h in recorder.hints)
+    logger.warning('Petición lenta (%.0f ms) ecuación=%r método=%s fases=[%s] hints=[%s]',
+                   total, equation, method, breakdown, hints)
+    return True
@@ -0,0 +1,419 @@
+"""
+Métricas del solucionador en formato de texto de Prometheus.
+
+Implementación local y sin dependencias: contadores, gauges e histogramas con
+etiquetas, protegidos con un lock y expuestos por la ruta /metrics de app.py.
+No hace falta un servidor de Prometheus para consultarlas.
+
+Con varios procesos HTTP (serve.py) cada proceso escribe periódicamente sus
+valores en un JSON por pid dentro de un directorio compartido, y /metrics los
+agrega: contadores e histogramas se suman (los de procesos ya terminados se
+acumulan en archive.json para que los totales no retrocedan al reciclarlos) y
+los gauges se exponen por proceso con la etiqueta pid.
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: serve.py no funciona allí y no hay directorio compartido
+    fcntl = None
+
+# Segundos entre escrituras de los valores de cada proceso en el directorio compartido
+FLUSH_INTERVAL_S = 5
+ARCHIVE = 'archive.json'
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name}: se esperaban las etiquetas {self.labelnames}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def combine(total, value):
+        return (total or 0) + value
+
+    def render(self, items=None):
+        if items is None:
+            items = self.snapshot().items()
+        return self.header() + [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                                for key, value in sorted(items)]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        if self._function is not None:
+            # Gauge calculado en el momento de la consulta: {tupla_de_etiquetas: valor}
+            return dict(self._function())
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, items=None, labelnames=None):
+        if items is None:
+            items = self.snapshot().items()
+        labelnames = labelnames or self.labelnames
+        return self.header() + [f'{self.name}{_format_labels(labelnames, key)} {_format_value(value)}'
+                                for key, value in sorted(items)]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state['count'] if state else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {'counts': list(s['counts']), 'sum': s['sum'], 'count': s['count']}
+                    for key, s in self._values.items()}
+
+    @staticmethod
+    def combine(total, state):
+        if total is None:
+            return {'counts': list(state['counts']), 'sum': state['sum'], 'count': state['count']}
+        return {'counts': [a + b for a, b in zip(total['counts'], state['counts'])],
+                'sum': total['sum'] + state['sum'], 'count': total['count'] + state['count']}
+
+    def render(self, items=None):
+        if items is None:
+            items = self.snapshot().items()
+        lines = self.header()
+        for key, state in sorted(items):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state['counts']):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state["sum"])}')
+            lines.append(f'{self.name}_count{labels} {state["count"]}')
+        return lines
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Existe, aunque sea de otro usuario
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    staging = f'{path}.{os.getpid()}.tmp'
+    with open(staging, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(staging, path)
+
+
+class Registry:
+    """Conjunto de métricas que se exponen juntas"""
+
+    def __init__(self):
+        self._metrics = []
+        # Directorio compartido entre procesos (share) y proceso que escribe en él
+        self.directory = None
+        self._owner = None
+        self._flusher = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        if self.directory is not None and self._owner == os.getpid():
+            return self._render_shared()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # --- Varios procesos ---
+
+    def share(self, directory, reset_counts=False):
+        """
+        Publica las métricas de este proceso en `directory` y agrega las de todos al
+        renderizar. Con reset_counts se descartan los contadores e histogramas heredados
+        por fork (el calentamiento del maestro no es tráfico y se contaría una vez por proceso).
+        """
+        os.makedirs(directory, exist_ok=True)
+        if reset_counts:
+            for metric in self._metrics:
+                if not isinstance(metric, Gauge):
+                    with metric._lock:
+                        metric._values.clear()
+        self.directory = directory
+        self._owner = os.getpid()
+        self.flush()
+        # Los hilos no sobreviven al fork: cada proceso arranca el suyo
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        owner = self._owner
+        while self._owner == owner == os.getpid():
+            time.sleep(FLUSH_INTERVAL_S)
+            self.flush()
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def _snapshot(self):
+        return {metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                for metric in self._metrics}
+
+    def flush(self):
+        """Escribe los valores de este proceso (sólo desde el proceso que llamó a share)"""
+        if self.directory is None or self._owner != os.getpid():
+            return
+        try:
+            _write_json(self._path(self._owner), {'pid': self._owner, 'metrics': self._snapshot()})
+        except OSError:
+            pass
+
+    def _archive_dead(self, paths):
+        """Suma a archive.json los contadores e histogramas de los procesos terminados; devuelve el archivo"""
+        archive_path = os.path.join(self.directory, ARCHIVE)
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = self._merge({}, (_read_json(archive_path) or {}).get('metrics', {}), gauges=False)
+            # Se releen dentro del lock: otro proceso puede haberlos archivado ya
+            dead = [(path, data) for path in paths if (data := _read_json(path)) is not None]
+            if dead:
+                for _, data in dead:
+                    self._merge(archive, data['metrics'], gauges=False)
+                _write_json(archive_path, {'metrics': {name: [[list(key), value] for key, value in values.items()]
+                                                       for name, values in archive.items()}})
+                for path, _ in dead:
+                    os.remove(path)
+        return archive
+
+    def _merge(self, totals, rows, gauges, pid=None):
+        """Acumula en totals ({nombre: {clave: valor}}) las filas {nombre: [[clave, valor]]} de un proceso"""
+        for metric in self._metrics:
+            if isinstance(metric, Gauge) != gauges:
+                continue
+            values = totals.setdefault(metric.name, {})
+            for key, value in rows.get(metric.name, []):
+                key = tuple(key)
+                if gauges:
+                    values[key + (str(pid),)] = value
+                else:
+                    values[key] = metric.combine(values.get(key), value)
+        return totals
+
+    def _render_shared(self):
+        self.flush()
+        live, dead = [], []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            if os.path.basename(path) == ARCHIVE:
+                continue
+            data = _read_json(path)
+            if data is not None:
+                (live if _alive(data['pid']) else dead).append((path, data))
+        if dead:
+            totals = self._archive_dead([path for path, _ in dead])
+        else:
+            totals = self._merge({}, (_read_json(os.path.join(self.directory, ARCHIVE)) or {}).get('metrics', {}),
+                                 gauges=False)
+        for _, data in live:
+            self._merge(totals, data['metrics'], gauges=False)
+            self._merge(totals, data['metrics'], gauges=True, pid=data['pid'])
+        lines = []
+        for metric in self._metrics:
+            items = totals.get(metric.name, {}).items()
+            if isinstance(metric, Gauge):
+                lines.extend(metric.render(items, metric.labelnames + ('pid',)))
+            else:
+                lines.extend(metric.render(items))
+        return '\n'.join(lines) + '\n'
+
+    def reset_locks(self):
+        # Tras un fork el hijo puede heredar un lock tomado por otro hilo del padre
+        for metric in self._metrics:
+            metric._lock = threading.Lock()
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset_locks)
+
+
+def _sympy_cache_gauge():
+    from sympy_cache import stats
+    current = stats()
+    return {(name,): current[name] for name in ('hits', 'misses', 'size', 'hit_ratio')}
+
+
+REQUEST_LATENCY = registry.histogram(
+    'solver_request_duration_seconds', 'Latencia de /solve por método y resultado', ('method', 'outcome'))
+REQUESTS = registry.counter(
+    'solver_requests_total', 'Peticiones a /solve por método y resultado', ('method', 'outcome'))
+IN_FLIGHT = registry.gauge(
+    'solver_requests_in_flight', 'Peticiones a /solve en curso')
+IN_FLIGHT.set(0)
+DSOLVE_ATTEMPTS = registry.counter(
+    'solver_dsolve_attempts_total', 'Intentos de dsolve por hint', ('hint',))
+DSOLVE_SUCCESS = registry.counter(
+    'solver_dsolve_success_total', 'Intentos de dsolve exitosos por hint', ('hint',))
+DSOLVE_LATENCY = registry.histogram(
+    'solver_dsolve_duration_seconds', 'Duración de cada intento de dsolve por hint', ('hint',))
+HINT_ORDER = registry.counter(
+    'solver_hint_order_total', 'Orden de los hints en modo automático: learned, static o explore', ('decision',))
+SIMPLIFY_LATENCY = registry.histogram(
+    'solver_simplify_duration_seconds', 'Duración de normalize_and_simplify_solution')
+ERRORS = registry.counter(
+    'solver_unhandled_errors_total', 'Excepciones capturadas por ensure_json_response', ('endpoint', 'exception'))
+SYMPY_CACHE = registry.gauge(
+    'solver_sympy_cache', 'Estadísticas agregadas de la caché cacheit de SymPy', ('stat',),
+    function=_sympy_cache_gauge)
+COALESCED = registry.counter(
+    'solver_coalesced_requests_total', 'Peticiones que reutilizaron un cálculo idéntico en curso')
+ADMISSION_WAIT = registry.histogram(
+    'solver_admission_wait_seconds', 'Tiempo de espera en la cola del control de admisión', ('lane',))
+ADMISSION_REJECTED = registry.counter(
+    'solver_admission_rejected_total', 'Peticiones rechazadas con 503 por saturación', ('lane', 'reason'))
+WORKER_FAILURES = registry.counter(
+    'solver_worker_failures_total', 'Tareas de workers terminadas por memoria, tiempo o muerte del proceso', ('kind',))
+SYMPY_CACHE_CLEARS = registry.counter(
+    'solver_sympy_cache_clears_total', 'Vaciados de la caché de SymPy por motivo', ('reason',))
+HTTP_CACHE = registry.counter(
+    'solver_http_cache_total', 'Peticiones GET /solve por resultado de la caché HTTP', ('result',))
+CANCELLATIONS = registry.counter(
+    'solver_cancellations_total', 'Cálculos cancelados por desconexión del cliente o cancelación explícita', ('reason',))
+
+
+def observe_timings(timings):
+    """Registra las métricas de dsolve/simplify medidas en un worker (otro proceso)"""
+    for attempt in timings.get('hints', []):
+        hint = attempt['hint']
+        DSOLVE_ATTEMPTS.inc(hint=hint)
+        DSOLVE_LATENCY.observe(attempt['ms'] / 1000, hint=hint)
+        if attempt['success']:
+            DSOLVE_SUCCESS.inc(hint=hint)
+    if timings.get('hint_order'):
+        HINT_ORDER.inc(decision=timings['hint_order'])
+    # Una muestra por llamada a simplify, como en el proceso web (no la suma de la petición)
+    for elapsed_ms in timings.get('simplify', []):
+        SIMPLIFY_LATENCY.observe(elapsed_ms / 1000)
@@ -0,0 +1,98 @@
+"""
+Perfilado bajo demanda de peticiones individuales con cProfile.
+
+Un administrador puede pedir `profile=1` en /solve para obtener las funciones
+con mayor tiempo acumulado (integrate, simplify, solve, matching de patrones...)
+junto a la respuesta normal, y el volcado pstats queda guardado en disco.
+Opcionalmente se perfila una fracción de las peticiones y sólo se conservan
+las que superan un umbral de latencia.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import time
+import uuid
+
+import config
+
+
+def is_admin(req):
+    """Comprueba la cabecera X-Admin-Token contra SOLVER_ADMIN_TOKEN"""
+    token = config.ADMIN_TOKEN
+    if not token:
+        return False
+    supplied = req.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def should_auto_profile():
+    """Decide si esta petición entra en la muestra de perfilado automático"""
+    rate = config.AUTO_PROFILE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def profile_call(func, *args, **kwargs):
+    """Ejecuta func bajo cProfile y devuelve (resultado, profiler, segundos)"""
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+    return result, profiler, time.perf_counter() - start
+
+
+def report(profiler, seconds, auto=False):
+    """
+    Resumen del perfil para la respuesta (funciones principales y volcado guardado).
+    Un perfil automático no se devuelve: sólo se guarda si superó SOLVER_AUTO_PROFILE_MS.
+    """
+    if auto:
+        if seconds * 1000 >= config.AUTO_PROFILE_MS:
+            dump_stats(profiler, label='auto')
+        return None
+    return {
+        'total_ms': round(seconds * 1000, 2),
+        'top_functions': top_functions(profiler),
+        'pstats_file': dump_stats(profiler),
+    }
+
+
+def top_functions(profiler, limit=None):
+    """Lista las funciones ordenadas por tiempo acumulado"""
+    limit = limit or config.PROFILE_TOP_N
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        filename, line, name = func
+        primitive_calls, total_calls, tottime, cumtime, _ = stats.stats[func]
+        rows.append({
+            'function': name,
+            'file': _short_path(filename),
+            'line': line,
+            'calls': total_calls,
+            'tottime_ms': round(tottime * 1000, 2),
+            'cumtime_ms': round(cumtime * 1000, 2),
+        })
+    return rows
+
+
+def dump_stats(profiler, label='solve'):
+    """Guarda el volcado pstats en SOLVER_PROFILE_DIR y devuelve el nombre del archivo"""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.pstats"
+    profiler.dump_stats(os.path.join(config.PROFILE_DIR, filename))
+    return filename
+
+
+def _short_path(filename):
+    # Recortar rutas largas de site-packages para que el resumen sea legible
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return os.path.basename(filename) if os.path.isabs(filename) else filename
@@ -0,0 +1,97 @@
+"""
+Pre-paso opcional que resuelve con coeficientes exactos las ecuaciones escritas con decimales.
+
+parse_equation_string convierte '0,5y' en 0.5*y(x), y con coeficientes Float
+dsolve y simplify toman caminos en coma flotante lentos que a menudo terminan
+en soluciones feas (exp(0.5*x)*C1**1.0) o en fallos. Aquí cada Float se cambia
+por un Rational exacto (0.5 -> 1/2; con tolerancia, la fracción más sencilla
+dentro de ella, 0.333 -> 1/3), se resuelve de forma exacta (con las cachés y
+los motores rápidos) y la solución final se vuelve a evaluar a decimales con la
+precisión pedida.
+"""
+from sympy import Eq, Float, Rational, nsimplify
+
+import config
+
+DEFAULT_DIGITS = 15
+MAX_DIGITS = 50
+
+
+def parse_precision(enabled, precision=None):
+    """Dígitos de la solución final con el pre-paso activado, o None si está desactivado"""
+    if enabled in (None, ''):
+        enabled = config.RATIONALIZE
+    if not isinstance(enabled, bool):
+        # Mismas grafías que las variables de entorno (config.TRUE_VALUES / FALSE_VALUES)
+        text = str(enabled).strip().lower()
+        if text not in config.TRUE_VALUES + config.FALSE_VALUES:
+            raise ValueError(f"rationalize debe ser verdadero o falso ({', '.join(config.TRUE_VALUES)} / "
+                             f"{', '.join(config.FALSE_VALUES)})")
+        enabled = text in config.TRUE_VALUES
+    if not enabled:
+        return None
+    if precision in (None, ''):
+        return DEFAULT_DIGITS
+    try:
+        digits = int(precision)
+    except (TypeError, ValueError):
+        raise ValueError('precision debe ser un número entero de dígitos')
+    if not 1 <= digits <= MAX_DIGITS:
+        raise ValueError(f'precision debe estar entre 1 y {MAX_DIGITS}')
+    return digits
+
+
+def to_rational(value, tolerance=None):
+    """Rational exacto del decimal (tal como se escribió) o el más sencillo dentro de la tolerancia"""
+    tolerance = config.RATIONALIZE_TOLERANCE if tolerance is None else tolerance
+    if tolerance:
+        return nsimplify(value, tolerance=tolerance, rational=True)
+    # str(Float) conserva los dígitos escritos: 0.1 -> 1/10 y no la fracción binaria de 0.1
+    return Rational(str(value))
+
+
+def rationalize(expr, tolerance=None):
+    """
+    expr con sus Float cambiados por racionales y el diccionario {Float: Rational}
+    de los cambios (vacío si no había decimales).
+    """
+    replacements = {value: to_rational(value, tolerance) for value in expr.atoms(Float)}
+    if not replacements:
+        return expr, {}
+    return expr.xreplace(replacements), replacements
+
+
+def rationalize_conditions(conditions, constant_values, tolerance=None):
+    """Condiciones iniciales [(x0, valor, orden)] y valores de constantes con los decimales exactos"""
+    def exact(value):
+        # parse_initial_conditions puede devolver float de Python si SymPy no entendió el valor
+        if isinstance(value, float):
+            return to_rational(value, tolerance)
+        return rationalize(value, tolerance)[0] if hasattr(value, 'atoms') else value
+
+    conditions = [(exact(x_val), exact(y_val), deriv) for x_val, y_val, deriv in conditions]
+    constant_values = {name: exact(value) for name, value in constant_values.items()}
+    return conditions, constant_values
+
+
+def _evalf(expr, digits):
+    # evalf no entra en los argumentos simbólicos de las funciones (exp(x/2) se queda igual);
+    # los exponentes racionales se conservan para no convertir sqrt(x) en x**0.5
+    if expr.is_number:
+        return expr.evalf(digits)
+    if not expr.args:
+        return expr
+    if expr.is_Pow and expr.exp.is_Rational:
+        return expr.func(_evalf(expr.base, digits), expr.exp)
+    return expr.func(*[_evalf(arg, digits) for arg in expr.args])
+
+
+def to_floats(solution, digits):
+    """Solución (o lista de soluciones) evaluada a decimales con `digits` cifras"""
+    if solution is None:
+        return None
+    if isinstance(solution, list):
+        return [to_floats(item, digits) for item in solution]
+    if isinstance(solution, Eq):
+        return Eq(solution.lhs, _evalf(solution.rhs, digits))
+    return _evalf(solution, digits)
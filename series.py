@@ -0,0 +1,506 @@
+"""
+Soluciones en serie de potencias calculadas término a término.
+
+En lugar de pedir a dsolve una serie truncada fija (hints 1st_power_series y
+2nd_power_series_*), los coeficientes se obtienen por recurrencia:
+
+- Punto ordinario (Taylor): y^(n) = F(x, y, ..., y^(n-1)) se despeja una vez y F
+  se evalúa con aritmética de series (diferenciación automática en modo
+  Taylor): el coeficiente k de F sólo depende de a_0..a_{k+n-1}, así que
+  a_{k+n} = k!/(k+n)! · F_k. Sirve también para ecuaciones no lineales.
+- Punto singular regular (Frobenius, lineales de orden 2 homogéneas):
+  y = (x-x0)^r Σ c_k (x-x0)^k con r raíz de la ecuación indicial.
+
+Cada SeriesSolution guarda los coeficientes ya calculados; pedir más términos
+sólo calcula los nuevos. get_solution() mantiene una caché LRU por ecuación,
+punto de desarrollo y condiciones iniciales.
+
+Las constantes libres siguen la convención de dsolve: en orden 1, C1 = y(x0);
+en orden 2, C2 = y(x0) y C1 = y'(x0) (en general a_j = C_{n-j}/j!). En Frobenius
+C1 acompaña a la raíz indicial mayor.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+from sympy import (
+    Add, Dummy, Eq, Integer, Mul, O, Pow, Rational, Symbol, collect, cos, cosh, exp, expand,
+    log, ode_order, sin, sinh, solve, sympify, tan, tanh,
+)
+
+import cancellation
+import config
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:  # sin NumPy no hay evaluación vectorizada ni estimación del radio
+    np = None
+    HAVE_NUMPY = False
+
+TAYLOR = 'taylor'
+FROBENIUS = 'frobenius'
+
+# Hints de classify_ode que este motor sustituye en run_dsolve
+POWER_SERIES_HINTS = ('1st_power_series', '2nd_power_series_ordinary', '2nd_power_series_regular')
+
+
+class SingularPoint(ValueError):
+    """x0 no es un punto ordinario: F tiene un polo allí"""
+
+
+def _tidy(value):
+    return expand(value) if value.free_symbols else value
+
+
+# --- Aritmética de series (coeficientes perezosos, calculados en orden) ---
+
+class _Node:
+    def __init__(self):
+        self._coeffs = []
+
+    def coeff(self, k):
+        while len(self._coeffs) <= k:
+            self._coeffs.append(_tidy(self._next(len(self._coeffs))))
+        return self._coeffs[k]
+
+
+class _Const(_Node):
+    def __init__(self, value):
+        super().__init__()
+        self.value = sympify(value)
+
+    def _next(self, k):
+        return self.value if k == 0 else Integer(0)
+
+
+class _Variable(_Node):
+    """t = x - x0"""
+
+    def _next(self, k):
+        return Integer(1) if k == 1 else Integer(0)
+
+
+class _Unknown(_Node):
+    """y^(j)(x0 + t): su coeficiente k es (k+j)!/k! · a_{k+j}"""
+
+    def __init__(self, solution, j):
+        super().__init__()
+        self.solution = solution
+        self.j = j
+
+    def _next(self, k):
+        return self.solution._a[k + self.j] * (math.factorial(k + self.j) // math.factorial(k))
+
+
+class _Sum(_Node):
+    def __init__(self, terms):
+        super().__init__()
+        self.terms = terms
+
+    def _next(self, k):
+        return Add(*[term.coeff(k) for term in self.terms])
+
+
+class _Product(_Node):
+    def __init__(self, left, right):
+        super().__init__()
+        self.left, self.right = left, right
+
+    def _next(self, k):
+        return Add(*[self.left.coeff(i) * self.right.coeff(k - i) for i in range(k + 1)])
+
+
+class _Quotient(_Node):
+    def __init__(self, num, den):
+        super().__init__()
+        self.num, self.den = num, den
+
+    def _next(self, k):
+        d0 = self.den.coeff(0)
+        if d0 == 0:
+            raise SingularPoint('División por una serie que se anula en el punto de desarrollo')
+        acc = self.num.coeff(k) - Add(*[self.den.coeff(i) * self.coeff(k - i) for i in range(1, k + 1)])
+        return acc / d0
+
+
+class _Power(_Node):
+    """u^a con a constante no entera: w_k = Σ ((a+1) i - k) u_i w_{k-i} / (k u_0)"""
+
+    def __init__(self, base, exponent):
+        super().__init__()
+        self.base, self.exponent = base, sympify(exponent)
+
+    def _next(self, k):
+        u0 = self.base.coeff(0)
+        if k == 0:
+            return u0 ** self.exponent
+        if u0 == 0:
+            raise SingularPoint('Potencia no entera de una serie que se anula en el punto de desarrollo')
+        a = self.exponent
+        acc = Add(*[((a + 1) * i - k) * self.base.coeff(i) * self.coeff(k - i) for i in range(1, k + 1)])
+        return acc / (k * u0)
+
+
+class _Exp(_Node):
+    def __init__(self, arg):
+        super().__init__()
+        self.arg = arg
+
+    def _next(self, k):
+        if k == 0:
+            return exp(self.arg.coeff(0))
+        return Add(*[i * self.arg.coeff(i) * self.coeff(k - i) for i in range(1, k + 1)]) / k
+
+
+class _Log(_Node):
+    def __init__(self, arg):
+        super().__init__()
+        self.arg = arg
+
+    def _next(self, k):
+        u0 = self.arg.coeff(0)
+        if k == 0:
+            if u0 == 0:
+                raise SingularPoint('Logaritmo de una serie que se anula en el punto de desarrollo')
+            return log(u0)
+        acc = Add(*[i * self.coeff(i) * self.arg.coeff(k - i) for i in range(1, k)])
+        return (self.arg.coeff(k) - acc / k) / u0
+
+
+class _SinCos:
+    """sin(u) y cos(u) se calculan juntos: cada uno necesita los coeficientes del otro"""
+
+    def __init__(self, arg):
+        self.arg = arg
+        self.sin = _SinCosPart(self, True)
+        self.cos = _SinCosPart(self, False)
+
+
+class _SinCosPart(_Node):
+    def __init__(self, pair, is_sin):
+        super().__init__()
+        self.pair, self.is_sin = pair, is_sin
+
+    def _next(self, k):
+        arg = self.pair.arg
+        if k == 0:
+            return sin(arg.coeff(0)) if self.is_sin else cos(arg.coeff(0))
+        other = self.pair.cos if self.is_sin else self.pair.sin
+        acc = Add(*[i * arg.coeff(i) * other.coeff(k - i) for i in range(1, k + 1)]) / k
+        return acc if self.is_sin else -acc
+
+
+def _build(expr, t, unknowns, solution):
+    """Árbol de nodos de serie para una expresión en t y las incógnitas Y_j"""
+    if not expr.has(t, *unknowns):
+        return _Const(expr)
+    if expr == t:
+        return _Variable()
+    if expr in unknowns:
+        return _Unknown(solution, unknowns.index(expr))
+    build = lambda e: _build(e, t, unknowns, solution)
+    if isinstance(expr, Add):
+        return _Sum([build(arg) for arg in expr.args])
+    if isinstance(expr, Mul):
+        numerators = [arg for arg in expr.args if not (isinstance(arg, Pow) and arg.exp.is_negative)]
+        denominators = [Pow(arg.base, -arg.exp) for arg in expr.args if arg not in numerators]
+        node = build(numerators[0]) if numerators else _Const(1)
+        for arg in numerators[1:]:
+            node = _Product(node, build(arg))
+        if denominators:
+            node = _Quotient(node, build(Mul(*denominators)))
+        return node
+    if isinstance(expr, Pow):
+        base, exponent = expr.args
+        if exponent.has(t, *unknowns):
+            return _Exp(build(exponent * log(base)))
+        if exponent.is_Integer and exponent < 0:
+            return _Quotient(_Const(1), build(Pow(base, -exponent)))
+        if exponent.is_Integer:
+            node = build(base)
+            result = node
+            for _ in range(int(exponent) - 1):
+                result = _Product(result, node)
+            return result
+        return _Power(build(base), exponent)
+    if expr.func == exp:
+        return _Exp(build(expr.args[0]))
+    if expr.func == log:
+        return _Log(build(expr.args[0]))
+    if expr.func in (sin, cos):
+        pair = _SinCos(build(expr.args[0]))
+        return pair.sin if expr.func == sin else pair.cos
+    if expr.func == tan:
+        pair = _SinCos(build(expr.args[0]))
+        return _Quotient(pair.sin, pair.cos)
+    if expr.func in (sinh, cosh, tanh):
+        return build(expr.rewrite(exp))
+    raise ValueError(f'El motor de series no admite la función {expr.func.__name__}')
+
+
+# --- Soluciones ---
+
+def isolate_highest_derivative(eq, y):
+    """(orden n, F) con y^(n) = F(x, y, ..., y^(n-1)), o ValueError"""
+    x = y.args[0]
+    n = ode_order(eq, y)
+    if n < 1:
+        raise ValueError('La ecuación no contiene derivadas de y')
+    solved = solve(eq.lhs - eq.rhs, y.diff(x, n))
+    if len(solved) != 1:
+        raise ValueError(f'No se puede despejar y^({n}) de forma única (soluciones: {len(solved)})')
+    return n, solved[0]
+
+
+class SeriesSolution:
+    """
+    Serie de la solución en torno a x0 con sus coeficientes ya calculados.
+    El cálculo de términos nuevos se serializa con un lock (la caché es compartida).
+    """
+
+    def __init__(self, eq, y, x0=0, initial_values=None):
+        self.x = y.args[0]
+        self.x0 = sympify(x0)
+        self.order, F = isolate_highest_derivative(eq, y)
+        self.lock = threading.Lock()
+        self.constants = [Symbol(f'C{j + 1}') for j in range(self.order)]
+        initial_values = initial_values or {}
+        self._t = Dummy('t')
+        self._unknowns = [Dummy(f'Y{j}') for j in range(self.order)]
+        for j in range(self.order - 1, 0, -1):
+            F = F.subs(y.diff(self.x, j), self._unknowns[j])
+        F = F.subs(y, self._unknowns[0]).subs(self.x, self.x0 + self._t)
+        self.F = F
+        self.kind = TAYLOR
+        self.exponents = None
+        try:
+            self._a = [sympify(initial_values.get(j, self.constants[self.order - 1 - j])) / math.factorial(j)
+                       for j in range(self.order)]
+            self._rhs = _build(F, self._t, self._unknowns, self)
+            self._extend(self.order + 1)
+        except SingularPoint:
+            self._setup_frobenius(initial_values)
+
+    # Frobenius: x^2 y'' + x p(x) y' + q(x) y = 0 con p y q analíticas en x0
+    def _setup_frobenius(self, initial_values):
+        if self.order != 2:
+            raise ValueError('x0 es un punto singular: sólo se admite Frobenius para ecuaciones de orden 2')
+        if initial_values:
+            raise ValueError('x0 es un punto singular: las condiciones iniciales no se pueden imponer allí')
+        F, t = self.F, self._t
+        Y0, Y1 = self._unknowns
+        coefficient_1, coefficient_0 = F.diff(Y1), F.diff(Y0)
+        if coefficient_1.has(Y0, Y1) or coefficient_0.has(Y0, Y1) or expand(F - coefficient_1 * Y1 - coefficient_0 * Y0) != 0:
+            raise ValueError('x0 es un punto singular: Frobenius sólo se aplica a ecuaciones lineales homogéneas')
+        try:
+            self._p = _build(expand(-t * coefficient_1), t, [], self)
+            self._q = _build(expand(-t ** 2 * coefficient_0), t, [], self)
+            p0, q0 = self._p.coeff(0), self._q.coeff(0)
+        except SingularPoint:
+            raise ValueError('x0 es un punto singular irregular: no hay solución de Frobenius')
+        r = Symbol('r')
+        indicial = r * (r - 1) + p0 * r + q0
+        exponents = sorted(solve(indicial, r), key=lambda value: -complex(value).real)
+        if len(exponents) == 1:
+            exponents = exponents * 2
+        self.kind = FROBENIUS
+        self.indicial = Eq(indicial, 0)
+        self.exponents = exponents
+        self._indicial = lambda value: value * (value - 1) + p0 * value + q0
+        # Una serie por raíz; la segunda se descarta si aparece el caso logarítmico
+        self._series = [[Integer(1)], [Integer(1)]]
+        self._active = [True, exponents[1] != exponents[0]]
+        self.note = None
+        self._extend(1)
+
+    def _next_frobenius(self, index, k):
+        r = self.exponents[index]
+        c = self._series[index]
+        numerator = -Add(*[c[j] * ((r + j) * self._p.coeff(k - j) + self._q.coeff(k - j)) for j in range(k)])
+        denominator = _tidy(self._indicial(r + k))
+        if denominator == 0:
+            if _tidy(numerator) != 0:
+                self._active[index] = False
+                self.note = ('Las raíces de la ecuación indicial difieren en un entero: la segunda '
+                             'solución lleva un término logarítmico y no se incluye')
+                return Integer(0)
+            return Integer(0)  # c_k libre: se toma 0
+        return _tidy(numerator / denominator)
+
+    def _extend(self, count):
+        """Calcula coeficientes hasta tener `count` (a_0..a_{count-1})"""
+        if self.kind == TAYLOR:
+            while len(self._a) < count:
+                cancellation.check()
+                k = len(self._a) - self.order
+                self._a.append(_tidy(self._rhs.coeff(k) * Rational(math.factorial(k), math.factorial(k + self.order))))
+        else:
+            for index in (0, 1):
+                while len(self._series[index]) < count:
+                    cancellation.check()
+                    k = len(self._series[index])
+                    value = self._next_frobenius(index, k) if self._active[index] else Integer(0)
+                    self._series[index].append(value)
+
+    def computed(self):
+        return len(self._a) if self.kind == TAYLOR else len(self._series[0])
+
+    def coefficient(self, k):
+        """Coeficiente k de la serie (Frobenius: combinación C1·c1_k + C2·c2_k)"""
+        self._extend(k + 1)
+        if self.kind == TAYLOR:
+            return self._a[k]
+        first, second = self._series[0][k], self._series[1][k]
+        return self.constants[0] * first + (self.constants[1] * second if self._active[1] else 0)
+
+    def term(self, k):
+        """Término k como expresión de SymPy en x"""
+        shift = self.x - self.x0
+        if self.kind == TAYLOR:
+            return self.coefficient(k) * shift ** k
+        self._extend(k + 1)
+        first = self.constants[0] * self._series[0][k] * shift ** (self.exponents[0] + k)
+        if not self._active[1]:
+            return first
+        return first + self.constants[1] * self._series[1][k] * shift ** (self.exponents[1] + k)
+
+    def terms(self, start, stop):
+        """Genera (k, término) calculando sólo lo que falta; apto para enviar en streaming"""
+        for k in range(start, stop):
+            with self.lock:
+                value = self.term(k)
+            yield k, value
+
+    def partial_sum(self, n):
+        with self.lock:
+            return Add(*[self.term(k) for k in range(n)])
+
+    def as_equation(self, y, n):
+        """Eq(y, suma parcial + O((x-x0)^n)), como devuelve dsolve para los hints de series"""
+        order_term = O(self.x ** n) if self.x0 == 0 else O((self.x - self.x0) ** n, (self.x, self.x0))
+        partial = self.partial_sum(n)
+        if all(not partial.diff(c).has(*self.constants) for c in self.constants):
+            # Lineal en las constantes: se agrupa como dsolve, C1·(...) + C2·(...)
+            partial = collect(partial, self.constants)
+        return Eq(y, partial + order_term)
+
+    def _numeric_coefficients(self, n, values=None):
+        values = values or {}
+        with self.lock:
+            self._extend(n)
+            if self.kind == TAYLOR:
+                raw = [self._a[k] for k in range(n)]
+            else:
+                raw = [self._series[0][k] for k in range(n)]
+        substitutions = {c: values.get(str(c), 1) for c in self.constants}
+        return [complex(sympify(value).subs(substitutions).evalf()) for value in raw]
+
+    def radius(self, n):
+        """
+        Radio de convergencia: estimación por ajuste de log|a_k| frente a k en los
+        últimos coeficientes no nulos y, para ecuaciones lineales, distancia de x0
+        a la singularidad más cercana de los coeficientes (cota inferior teórica).
+        """
+        result = {'estimate': None, 'singularity_distance': self._singularity_distance()}
+        if not HAVE_NUMPY or n < 4:
+            return result
+        coefficients = self._numeric_coefficients(n)
+        points = [(k, math.log(abs(value))) for k, value in enumerate(coefficients) if k > 0 and abs(value) > 1e-300]
+        points = points[-10:]
+        if len(points) >= 3:
+            ks, logs = np.array(points).T
+            slope = np.polyfit(ks, logs, 1)[0]
+            result['estimate'] = float('inf') if slope < -30 else float(math.exp(-slope))
+        return result
+
+    def _singularity_distance(self):
+        if not HAVE_NUMPY:
+            return None
+        t = self._t
+        pieces = [self.F.diff(Y) for Y in self._unknowns] + [self.F.subs({Y: 0 for Y in self._unknowns})]
+        if any(piece.has(*self._unknowns) for piece in pieces):
+            return None  # No lineal: la cota teórica no aplica
+        distances = []
+        for piece in pieces:
+            denominator = piece.as_numer_denom()[1]
+            if not denominator.has(t):
+                continue
+            if not denominator.is_polynomial(t) or denominator.free_symbols - {t}:
+                return None
+            poly_coeffs = [complex(c) for c in denominator.as_poly(t).all_coeffs()]
+            distances.extend(abs(root) for root in np.roots(poly_coeffs))
+        distances = [d for d in distances if d > 1e-12]
+        return float(min(distances)) if distances else float('inf')
+
+    def evaluate(self, xs, n, values=None):
+        """Suma parcial de n términos evaluada en todo el array xs (Horner vectorizado)"""
+        if not HAVE_NUMPY:
+            raise ValueError('La evaluación en malla necesita NumPy')
+        missing = [str(c) for c in self.constants if str(c) not in (values or {})]
+        with self.lock:
+            free = self.kind == TAYLOR and any(sympify(a).free_symbols for a in self._a[:n])
+        if missing and (free or self.kind == FROBENIUS):
+            raise ValueError(f"Faltan valores para las constantes: {', '.join(missing)}")
+        shift = np.asarray(xs, dtype=float) - float(self.x0)
+        if self.kind == TAYLOR:
+            coefficients = np.array(self._numeric_coefficients(n, values))
+            result = np.polyval(coefficients[::-1], shift)
+        else:
+            result = np.zeros_like(shift, dtype=complex)
+            for index in (0, 1):
+                if index == 1 and not self._active[1]:
+                    continue
+                with self.lock:
+                    self._extend(n)
+                    raw = self._series[index][:n]
+                coefficients = np.array([complex(value.evalf()) for value in raw])
+                constant = float(values[str(self.constants[index])])
+                exponent = complex(self.exponents[index])
+                result = result + constant * shift.astype(complex) ** exponent * np.polyval(coefficients[::-1], shift)
+        result = np.asarray(result)
+        return result.real if np.all(np.abs(result.imag) < 1e-12) else result
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cache_key(eq, x0, initial_values):
+    return (str(eq), str(sympify(x0)), tuple(sorted((j, str(v)) for j, v in (initial_values or {}).items())))
+
+
+def peek(eq, x0=0, initial_values=None):
+    """Solución ya en caché o None (para saber si una petición sólo reutiliza coeficientes)"""
+    with _cache_lock:
+        return _cache.get(cache_key(eq, x0, initial_values))
+
+
+def get_solution(eq, y, x0=0, initial_values=None):
+    """SeriesSolution de la caché (LRU por ecuación, x0 y condiciones) o una nueva"""
+    key = cache_key(eq, x0, initial_values)
+    with _cache_lock:
+        solution = _cache.get(key)
+        if solution is not None:
+            _cache.move_to_end(key)
+            return solution
+    solution = SeriesSolution(eq, y, x0, initial_values)
+    with _cache_lock:
+        solution = _cache.setdefault(key, solution)
+        _cache.move_to_end(key)
+        while len(_cache) > config.SERIES_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return solution
+
+
+def cache_stats():
+    with _cache_lock:
+        return {'equations': len(_cache), 'terms': sum(solution.computed() for solution in _cache.values())}
+
+
+def dsolve_hint(eq, y, hint, n):
+    """Sustituto de dsolve(eq, y, hint=...) para los hints de series de potencias (x0 = 0)"""
+    solution = get_solution(eq, y, 0)
+    if hint == '2nd_power_series_regular' and solution.kind != FROBENIUS:
+        raise ValueError('x = 0 es un punto ordinario')
+    return solution.as_equation(y, n)
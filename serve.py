@@ -0,0 +1,142 @@
+"""
+Servidor de producción del solucionador.
+
+Arranca un proceso maestro (gunicorn) que carga y calienta la aplicación una
+sola vez y después crea con fork varios procesos HTTP que comparten el socket
+de escucha. SymPy es CPU y retiene el GIL, así que el rendimiento escala con el
+número de procesos (uno por núcleo), no con el de hilos.
+
+Uso:
+    python serve.py --workers 16 --threads 2 --bind 0.0.0.0:8000
+    SOLVER_HTTP_WORKERS=16 SOLVER_REQUEST_DEADLINE_S=45 python serve.py
+
+Señales al proceso maestro:
+    HUP   reemplaza los procesos HTTP de forma ordenada (terminan sus peticiones)
+    TTIN  añade un proceso / TTOU quita uno
+    TERM  apagado ordenado; INT/QUIT apagado inmediato
+"""
+import argparse
+import glob
+import importlib
+import multiprocessing
+import os
+import sys
+
+import config
+
+try:
+    from gunicorn.app.base import BaseApplication
+    HAVE_GUNICORN = True
+except ImportError:  # Windows o gunicorn sin instalar
+    BaseApplication = object
+    HAVE_GUNICORN = False
+
+
+def _env_int(name, default):
+    return int(config._env_float(name, default))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Servidor de producción (varios procesos con el socket compartido)')
+    parser.add_argument('--bind', default=os.environ.get('SOLVER_BIND', '0.0.0.0:5000'),
+                        help='Dirección de escucha (host:puerto o unix:/ruta); SOLVER_BIND')
+    parser.add_argument('--workers', type=int, default=_env_int('SOLVER_HTTP_WORKERS', multiprocessing.cpu_count()),
+                        help='Procesos HTTP (por defecto, uno por núcleo); SOLVER_HTTP_WORKERS')
+    parser.add_argument('--threads', type=int, default=_env_int('SOLVER_HTTP_THREADS', 2),
+                        help='Hilos por proceso; SOLVER_HTTP_THREADS')
+    parser.add_argument('--timeout', type=float, default=config._env_float('SOLVER_HTTP_TIMEOUT_S', 0),
+                        help='Segundos sin latido antes de matar un proceso HTTP bloqueado '
+                             '(por defecto, plazo de la petición + 30); SOLVER_HTTP_TIMEOUT_S')
+    parser.add_argument('--graceful-timeout', type=float, default=config._env_float('SOLVER_HTTP_GRACEFUL_TIMEOUT_S', 60),
+                        help='Tiempo para terminar las peticiones en curso al reiniciar; SOLVER_HTTP_GRACEFUL_TIMEOUT_S')
+    parser.add_argument('--deadline', type=float, default=config.REQUEST_DEADLINE_S,
+                        help='Plazo total de cada petición a /solve en segundos (0 = sin plazo); SOLVER_REQUEST_DEADLINE_S')
+    parser.add_argument('--max-requests', type=int, default=_env_int('SOLVER_HTTP_MAX_REQUESTS', 1000),
+                        help='Reciclar cada proceso HTTP tras este número de peticiones (0 = nunca); '
+                             'SOLVER_HTTP_MAX_REQUESTS')
+    parser.add_argument('--data-dir', default=config.DATA_DIR,
+                        help='Directorio compartido para perfiles, capturas y estado; SOLVER_DATA_DIR')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Cargar y calentar la aplicación en cada proceso en lugar de en el maestro')
+    parser.add_argument('--log-level', default=os.environ.get('SOLVER_LOG_LEVEL', 'info'))
+    return parser
+
+
+class SolverServer(BaseApplication):
+    def __init__(self, options, preload=True):
+        self.options = options
+        self.preload = preload
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import app as solver_app
+        if self.preload:
+            # En el maestro: calentar una vez en primer plano; los procesos HTTP heredan
+            # por fork el estado ya caliente (y lo comparten en copia-al-escribir)
+            solver_app.start_warmup(background=False, start_workers=False)
+        else:
+            # Sin precarga esto se ejecuta en cada proceso HTTP
+            solver_app.metrics.registry.share(config.METRICS_DIR)
+            solver_app.start_warmup()
+        return solver_app.app
+
+
+def post_fork(server, worker):
+    """
+    Cada proceso HTTP crea sus propios workers de cálculo (no se comparten entre procesos)
+    y publica sus métricas en el directorio común para que /metrics las agregue todas.
+    """
+    import app as solver_app
+    solver_app.metrics.registry.share(config.METRICS_DIR, reset_counts=True)
+    if solver_app.solver_pool is not None:
+        solver_app.solver_pool.prestart()
+
+
+def reset_metrics_dir():
+    """Las métricas de una ejecución anterior no se suman a las de esta"""
+    os.makedirs(config.METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(config.METRICS_DIR, '*.json')):
+        os.remove(path)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not HAVE_GUNICORN:
+        print('serve.py necesita gunicorn (pip install gunicorn), que no funciona en Windows; '
+              'allí usa python app.py', file=sys.stderr)
+        return 1
+
+    # Antes de importar app.py (en load): la configuración se lee al importar config
+    os.environ['SOLVER_DATA_DIR'] = os.path.abspath(args.data_dir)
+    os.environ['SOLVER_REQUEST_DEADLINE_S'] = str(args.deadline)
+    os.environ['SOLVER_WARMUP_ON_IMPORT'] = '0'
+    importlib.reload(config)
+    reset_metrics_dir()
+
+    timeout = args.timeout or max(args.deadline, config.SOLVE_TIMEOUT_S) + 30
+    preload = not args.no_preload
+    options = {
+        'bind': args.bind,
+        'workers': max(1, args.workers),
+        'threads': max(1, args.threads),
+        'worker_class': 'gthread',
+        'timeout': int(timeout),
+        'graceful_timeout': int(args.graceful_timeout),
+        'max_requests': max(0, args.max_requests),
+        # Escalonar los reciclados para que no se reinicien todos a la vez
+        'max_requests_jitter': max(0, args.max_requests // 10),
+        'preload_app': preload,
+        'loglevel': args.log_level,
+        'accesslog': '-',
+        'post_fork': post_fork if preload else None,
+    }
+    SolverServer({key: value for key, value in options.items() if value is not None}, preload).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
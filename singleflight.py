@@ -0,0 +1,103 @@
+"""
+Deduplicación de peticiones idénticas concurrentes ("single flight").
+
+Cuando llegan a la vez varias peticiones con la misma clave (ecuación, método
+y condiciones iniciales), el cálculo se ejecuta una sola vez en un hilo propio
+y todas las peticiones esperan ese mismo resultado. Como el cálculo no vive en
+el hilo de ninguna petición concreta, un esperador que abandona (timeout o
+cancelación) sólo deja de esperar: el cálculo sigue mientras quede alguien
+interesado, y sólo cuando se va el último se avisa con on_abandoned (que puede
+cancelarlo). Un cálculo abandonado deja de estar disponible para peticiones nuevas.
+"""
+import contextvars
+import threading
+import time
+
+
+class _Call:
+    """Cálculo en curso para una clave, con el número de esperadores"""
+
+    def __init__(self, on_abandoned=None):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 1
+        self.on_abandoned = on_abandoned
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, func, timeout=None, on_abandoned=None, cancel=None):
+        """
+        Ejecuta func() una sola vez por clave entre las llamadas concurrentes.
+        Devuelve (resultado, compartido); compartido es True si la petición se
+        unió a un cálculo que ya estaba en curso. Si func lanza una excepción,
+        todos los esperadores la reciben. Con timeout, lanza TimeoutError al
+        agotarse la espera sin interrumpir el cálculo de los demás. `cancel`
+        (con is_set() y check()) permite a este esperador dejar de esperar:
+        se abandona la llamada y se lanza la excepción de cancel.check().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            shared = call is not None
+            if shared:
+                call.waiters += 1
+            else:
+                call = self._calls[key] = _Call(on_abandoned)
+                # El hilo hereda el contexto (p. ej. el recorder de tiempos) de quien lo inicia
+                context = contextvars.copy_context()
+                threading.Thread(target=self._run, args=(key, call, context, func),
+                                 name='singleflight', daemon=True).start()
+
+        if not self._wait(call, timeout, cancel):
+            self.leave(call)
+            if cancel is not None and cancel.is_set():
+                cancel.check()
+            raise TimeoutError('Tiempo de espera agotado esperando un cálculo compartido')
+
+        if call.error is not None:
+            raise call.error
+        return call.result, shared
+
+    @staticmethod
+    def _wait(call, timeout, cancel):
+        if cancel is None:
+            return call.done.wait(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            step = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+            if step <= 0 or cancel.is_set():
+                return call.done.is_set()
+            if call.done.wait(step):
+                return True
+
+    def _run(self, key, call, context, func):
+        try:
+            call.result = context.run(func)
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def leave(self, call):
+        """Un esperador abandona; si era el último y el cálculo no terminó, se avisa"""
+        with self._lock:
+            call.waiters -= 1
+            abandoned = call.waiters == 0 and not call.done.is_set()
+            if abandoned:
+                # Las peticiones que lleguen después empiezan un cálculo nuevo
+                for key, other in list(self._calls.items()):
+                    if other is call:
+                        del self._calls[key]
+        if abandoned and call.on_abandoned is not None:
+            call.on_abandoned()
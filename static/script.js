@@ -1,45 +1,377 @@
-// Configurar MathJax
+// El servidor envía los pasos y la solución en MathML ya renderizado: los
+// navegadores con MathML nativo los muestran sin más trabajo. MathJax sólo se
+// carga (una vez, bajo demanda) en los que no lo soportan
 window.MathJax = {
-    tex: {
-        inlineMath: [['$', '$'], ['\\(', '\\)']],
-        displayMath: [['$$', '$$'], ['\\[', '\\]']],
-        processEscapes: true,
-        processEnvironments: true
+    startup: {
+        typeset: false
     },
     options: {
         skipHtmlTags: ['script', 'style', 'textarea', 'pre', 'code']
     }
 };
 
-let mathJaxProcessed = false;
+// Mide un <mspace> de tamaño conocido: sólo coincide si el navegador maqueta MathML
+function detectNativeMathML() {
+    const probe = document.createElement('div');
+    probe.style.position = 'absolute';
+    probe.style.visibility = 'hidden';
+    probe.innerHTML = '<math xmlns="http://www.w3.org/1998/Math/MathML"><mspace height="23px" width="77px"></mspace></math>';
+    document.body.appendChild(probe);
+    const box = probe.firstChild.firstChild.getBoundingClientRect();
+    document.body.removeChild(probe);
+    return Math.abs(box.height - 23) <= 1 && Math.abs(box.width - 77) <= 1;
+}
+
+let nativeMathML = null;
+let mathJaxLoading = null;
 
-function renderMath() {
-    if (window.MathJax) {
-        MathJax.typesetPromise().then(() => {
-            mathJaxProcessed = true;
-        }).catch((err) => {
-            console.log('Error rendering math:', err);
+function loadMathJax() {
+    if (!mathJaxLoading) {
+        mathJaxLoading = new Promise((resolve, reject) => {
+            const meta = document.querySelector('meta[name="mathjax-url"]');
+            const script = document.createElement('script');
+            script.id = 'MathJax-script';
+            script.src = meta.content;
+            script.onload = () => MathJax.startup.promise.then(resolve, reject);
+            script.onerror = reject;
+            document.head.appendChild(script);
         });
     }
+    return mathJaxLoading;
+}
+
+// Petición a /solve en curso (para cancelarla si se envía otra o se abandona la página)
+let currentSolve = null;
+
+function newRequestId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2, 12);
+}
+
+// Cancela la petición en curso: corta la conexión y avisa al servidor para que
+// detenga el cálculo (por si hay un proxy que no propaga el cierre)
+function cancelCurrentSolve() {
+    if (!currentSolve) {
+        return;
+    }
+    const { controller, requestId } = currentSolve;
+    currentSolve = null;
+    controller.abort();
+    const body = JSON.stringify({ request_id: requestId });
+    if (navigator.sendBeacon) {
+        navigator.sendBeacon('/solve/cancel', new Blob([body], { type: 'application/json' }));
+    } else {
+        fetch('/solve/cancel', { method: 'POST', body: body, keepalive: true,
+                                 headers: { 'Content-Type': 'application/json' } }).catch(() => {});
+    }
+}
+
+window.addEventListener('pagehide', cancelCurrentSolve);
+
+function renderMath(container) {
+    if (nativeMathML) {
+        return;
+    }
+    loadMathJax().then(() => MathJax.typesetPromise([container])).catch((err) => {
+        console.log('Error rendering math:', err);
+    });
+}
+
+// --- Caché de soluciones en el navegador ---
+// Las respuestas correctas de /solve se guardan en localStorage por entrada
+// normalizada (la misma que usa el servidor), con un índice de tamaños y último
+// uso para expulsar las más antiguas. Todo se descarta cuando cambia la versión
+// de las respuestas del servidor (meta solve-cache-version)
+const SOLVE_CACHE_PREFIX = 'ode-solve-cache:';
+const SOLVE_CACHE_INDEX = SOLVE_CACHE_PREFIX + 'index';
+const SOLVE_CACHE_MAX_ENTRIES = 50;
+const SOLVE_CACHE_MAX_CHARS = 1500000;  // ~3 MB en UTF-16, por debajo del límite habitual de 5 MB
+const ENTER_DEBOUNCE_MS = 300;
+
+const solveCache = {
+    version: null,
+    index: null,
+    memory: new Map(),  // copia en memoria (y único almacén si localStorage no está disponible)
+
+    storage() {
+        try {
+            return window.localStorage;
+        } catch (e) {
+            return null;  // Bloqueado por el navegador (cookies desactivadas, modo privado)
+        }
+    },
+
+    init(version) {
+        this.version = version;
+        this.index = {};
+        const storage = this.storage();
+        if (!storage) {
+            return;
+        }
+        try {
+            const saved = JSON.parse(storage.getItem(SOLVE_CACHE_INDEX) || 'null');
+            if (saved && saved.version === version) {
+                this.index = saved.entries || {};
+                return;
+            }
+        } catch (e) {
+            // Índice corrupto: se empieza de cero
+        }
+        this.clear();
+    },
+
+    clear() {
+        const storage = this.storage();
+        this.index = {};
+        this.memory.clear();
+        if (!storage) {
+            return;
+        }
+        for (let i = storage.length - 1; i >= 0; i--) {
+            const name = storage.key(i);
+            if (name && name.startsWith(SOLVE_CACHE_PREFIX)) {
+                storage.removeItem(name);
+            }
+        }
+        this.saveIndex();
+    },
+
+    saveIndex() {
+        const storage = this.storage();
+        if (storage) {
+            try {
+                storage.setItem(SOLVE_CACHE_INDEX, JSON.stringify({ version: this.version, entries: this.index }));
+            } catch (e) {
+                // Sin espacio para el índice: la caché sigue funcionando en memoria
+            }
+        }
+    },
+
+    get(key) {
+        if (this.memory.has(key)) {
+            this.touch(key);
+            return this.memory.get(key);
+        }
+        const storage = this.storage();
+        if (!storage || !this.index[key]) {
+            return null;
+        }
+        try {
+            const data = JSON.parse(storage.getItem(SOLVE_CACHE_PREFIX + key));
+            if (data) {
+                this.memory.set(key, data);
+                this.touch(key);
+                return data;
+            }
+        } catch (e) {
+            // Entrada ilegible: se elimina abajo
+        }
+        this.remove(key);
+        return null;
+    },
+
+    touch(key) {
+        if (this.index[key]) {
+            this.index[key].used = Date.now();
+            this.saveIndex();
+        }
+    },
+
+    put(key, data) {
+        this.memory.set(key, data);
+        const storage = this.storage();
+        if (!storage) {
+            return;
+        }
+        const text = JSON.stringify(data);
+        if (text.length > SOLVE_CACHE_MAX_CHARS / 4) {
+            return;  // Demasiado grande para ocupar la caché persistente
+        }
+        this.index[key] = { chars: text.length, used: Date.now() };
+        this.evict(key);
+        // Si no cabe (otros datos del sitio ocupan el almacenamiento) se expulsan más entradas
+        while (true) {
+            try {
+                storage.setItem(SOLVE_CACHE_PREFIX + key, text);
+                break;
+            } catch (e) {
+                if (!this.evictOldest(key)) {
+                    delete this.index[key];
+                    break;
+                }
+            }
+        }
+        this.saveIndex();
+    },
+
+    remove(key) {
+        const storage = this.storage();
+        delete this.index[key];
+        this.memory.delete(key);
+        if (storage) {
+            storage.removeItem(SOLVE_CACHE_PREFIX + key);
+        }
+        this.saveIndex();
+    },
+
+    // Expulsa las entradas usadas hace más tiempo hasta respetar los límites
+    evict(keep) {
+        const total = () => Object.values(this.index).reduce((sum, entry) => sum + entry.chars, 0);
+        while (Object.keys(this.index).length > SOLVE_CACHE_MAX_ENTRIES || total() > SOLVE_CACHE_MAX_CHARS) {
+            if (!this.evictOldest(keep)) {
+                break;
+            }
+        }
+    },
+
+    evictOldest(keep) {
+        let oldest = null;
+        for (const [key, entry] of Object.entries(this.index)) {
+            if (key !== keep && (oldest === null || entry.used < this.index[oldest].used)) {
+                oldest = key;
+            }
+        }
+        if (oldest === null) {
+            return false;
+        }
+        this.remove(oldest);
+        return true;
+    }
+};
+
+// Misma normalización que canonical_request_key en el servidor: y' = x*y y y'=x*y son la misma entrada
+function normalizeInput(text) {
+    return (text || '').split(/\s+/).filter(Boolean).join(' ').replace(/\s*([=+\-*/^(),])\s*/g, '$1');
 }
 
+// URL canónica de GET /solve (sin los valores por defecto): así no hay redirección
+// y la caché HTTP del navegador y la del servidor también sirven
+function solveUrl(equation, method, initialConditions) {
+    const params = new URLSearchParams();
+    params.append('eq', equation);
+    if (method && method !== 'auto') {
+        params.append('method', method);
+    }
+    if (initialConditions) {
+        params.append('ic', initialConditions);
+    }
+    // Pasos completos con las expresiones en MathML (la solución llega también en LaTeX)
+    params.append('format', 'mathml');
+    return '/solve?' + params.toString();
+}
+
+function solveKey(equation, method, initialConditions) {
+    return JSON.stringify([equation, method || 'auto', initialConditions]);
+}
+
+// Peticiones a /solve en curso por clave: {promise, controller, prefetch}. La
+// precarga no pide una clave que ya está en curso
+const pendingSolves = new Map();
+
+function fetchSolution(key, url, options, controller, prefetch) {
+    const entry = { controller: controller, prefetch: prefetch };
+    entry.promise = fetch(url, Object.assign({}, options, { signal: controller.signal }))
+        .then(response => response.json().then(data => {
+            if (data.success && response.ok) {
+                solveCache.put(key, data);
+            }
+            return { data: data, status: response.status };
+        }))
+        .finally(() => {
+            if (pendingSolves.get(key) === entry) {
+                pendingSolves.delete(key);
+            }
+        });
+    pendingSolves.set(key, entry);
+    return entry.promise;
+}
+
+// Precarga las soluciones de los ejemplos, de una en una y sólo con el navegador
+// inactivo. Se detiene si el usuario pide ahorrar datos o el servidor está saturado
+let prefetchStopped = false;
+
+function whenIdle(callback) {
+    if (window.requestIdleCallback) {
+        requestIdleCallback(callback, { timeout: 10000 });
+    } else {
+        setTimeout(callback, 2000);
+    }
+}
+
+function prefetchExamples(cards) {
+    if (navigator.connection && navigator.connection.saveData) {
+        return;
+    }
+    const queue = Array.from(cards).map(card => {
+        const equation = normalizeInput(card.getAttribute('data-equation'));
+        const method = card.getAttribute('data-method');
+        return { key: solveKey(equation, method, ''), url: solveUrl(equation, method, '') };
+    });
+    function next() {
+        if (prefetchStopped) {
+            return;
+        }
+        // No compite con una resolución pedida por el usuario
+        if (currentSolve) {
+            whenIdle(next);
+            return;
+        }
+        const item = queue.shift();
+        if (!item) {
+            return;
+        }
+        if (solveCache.get(item.key) || pendingSolves.has(item.key)) {
+            next();
+            return;
+        }
+        fetchSolution(item.key, item.url, { priority: 'low' }, new AbortController(), true)
+            .then(result => {
+                if (result.status !== 503) {
+                    whenIdle(next);
+                }
+            })
+            // Abortada porque el usuario pidió ese mismo ejemplo, o error de red: se sigue con los demás
+            .catch(() => whenIdle(next));
+    }
+    whenIdle(next);
+}
+
+window.addEventListener('pagehide', () => {
+    prefetchStopped = true;
+    pendingSolves.forEach(entry => {
+        if (entry.prefetch) {
+            entry.controller.abort();
+        }
+    });
+});
+
 // Configurar evento para el botón de resolver
 document.addEventListener('DOMContentLoaded', function() {
     const solveBtn = document.getElementById('solve-btn');
     const equationInput = document.getElementById('equation');
     const methodSelect = document.getElementById('method');
+    const initialConditionsInput = document.getElementById('initial-conditions');
     const resultSection = document.getElementById('result-section');
     const solutionDiv = document.getElementById('solution');
     const stepsDiv = document.getElementById('steps');
     const exampleCards = document.querySelectorAll('.example-card');
 
+    nativeMathML = detectNativeMathML();
+    const versionMeta = document.querySelector('meta[name="solve-cache-version"]');
+    solveCache.init(versionMeta ? versionMeta.content : '');
+
     // Event listener para el botón resolver
     solveBtn.addEventListener('click', solveEquation);
 
-    // Event listener para Enter en el input
+    // Event listener para Enter en el input: varias pulsaciones seguidas (o la
+    // tecla mantenida) se resuelven una sola vez
+    let enterTimer = null;
     equationInput.addEventListener('keypress', function(e) {
         if (e.key === 'Enter') {
-            solveEquation();
+            clearTimeout(enterTimer);
+            enterTimer = setTimeout(solveEquation, ENTER_DEBOUNCE_MS);
         }
     });
 
@@ -57,8 +389,15 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    prefetchExamples(exampleCards);
+
+    function resetButton() {
+        solveBtn.disabled = false;
+        solveBtn.textContent = 'Resolver Ecuación';
+    }
+
     function solveEquation() {
-        const equation = equationInput.value.trim();
+        const equation = normalizeInput(equationInput.value);
         
         if (!equation) {
             alert('Por favor, ingresa una ecuación diferencial');
@@ -66,7 +405,25 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         const method = methodSelect.value;
-        const initialConditions = document.getElementById('initial-conditions').value.trim();
+        const initialConditions = normalizeInput(initialConditionsInput.value);
+        const key = solveKey(equation, method, initialConditions);
+
+        // La misma entrada ya se está resolviendo: no se vuelve a empezar
+        if (currentSolve && currentSolve.key === key) {
+            return;
+        }
+        // Una petición nueva sustituye a la anterior: el servidor deja de calcularla
+        cancelCurrentSolve();
+
+        const cached = solveCache.get(key);
+        if (cached) {
+            resetButton();
+            showResult(cached);
+            return;
+        }
+
+        const solveRequest = { controller: new AbortController(), requestId: newRequestId(), key: key };
+        currentSolve = solveRequest;
 
         // Mostrar loading
         solveBtn.disabled = true;
@@ -76,98 +433,89 @@ document.addEventListener('DOMContentLoaded', function() {
         solutionDiv.innerHTML = '';
         stepsDiv.innerHTML = '';
 
+        // Si ese ejemplo se está precargando, la precarga se aborta: la petición del usuario
+        // lleva su propia señal y su request_id, para poder cancelarla después
+        const pending = pendingSolves.get(key);
+        if (pending && pending.prefetch) {
+            pending.controller.abort();
+        }
+
         // Hacer petición al servidor
-        fetch('/solve', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                equation: equation,
-                method: method,
-                initial_conditions: initialConditions
-            })
+        fetchSolution(key, solveUrl(equation, method, initialConditions), {
+            headers: { 'X-Request-Id': solveRequest.requestId }
+        }, solveRequest.controller, false)
+        .then(result => {
+            if (currentSolve !== solveRequest) {
+                return;  // Respuesta de una petición ya sustituida
+            }
+            currentSolve = null;
+            resetButton();
+            showResult(result.data);
         })
-        .then(response => response.json())
-        .then(data => {
-            solveBtn.disabled = false;
-            solveBtn.textContent = 'Resolver Ecuación';
+        .catch(error => {
+            if (error.name === 'AbortError' || currentSolve !== solveRequest) {
+                return;  // Cancelada a propósito: la petición nueva se encarga de la interfaz
+            }
+            currentSolve = null;
+            resetButton();
             
             resultSection.style.display = 'block';
+            solutionDiv.innerHTML = `<div class="error-message">❌ Error al comunicarse con el servidor: ${error.message}</div>`;
+            console.error('Error:', error);
+        });
+    }
+
+    function showResult(data) {
+        resultSection.style.display = 'block';
+        
+        if (data.success && data.solution) {
+            // Mostrar solución - usar display math
+            let solutionHTML = '';
             
-            if (data.success && data.solution) {
-                // Mostrar solución - usar display math
-                let solutionHTML = '';
-                
-                // Si hay solución general y particular, mostrar ambas
-                if (data.general_solution && data.particular_solution && data.general_solution !== data.particular_solution) {
-                    solutionHTML += '<div style="margin-bottom: 20px;"><h4 style="color: var(--primary-color); margin-bottom: 10px;">Solución General:</h4>';
-                    solutionHTML += `<div style="background: #f0f4f8; padding: 15px; border-radius: 4px; border-left: 3px solid var(--accent-color);">\\[${data.general_solution}\\]</div></div>`;
-                    solutionHTML += '<div><h4 style="color: var(--success-color); margin-bottom: 10px;">Solución Particular (con condiciones iniciales):</h4>';
-                    solutionHTML += `<div style="background: #eafaf1; padding: 15px; border-radius: 4px; border-left: 3px solid var(--success-color);">\\[${data.particular_solution}\\]</div></div>`;
-                } else {
-                    // Mostrar solo la solución disponible
-                    solutionHTML = `\\[${data.solution}\\]`;
-                }
-                
-                solutionDiv.innerHTML = solutionHTML;
-                
-                // Mostrar pasos
+            // Si hay solución general y particular, mostrar ambas
+            if (data.general_solution && data.particular_solution && data.general_solution !== data.particular_solution) {
+                solutionHTML += '<div style="margin-bottom: 20px;"><h4 style="color: var(--primary-color); margin-bottom: 10px;">Solución General:</h4>';
+                solutionHTML += `<div style="background: #f0f4f8; padding: 15px; border-radius: 4px; border-left: 3px solid var(--accent-color);">${data.general_solution_mathml}</div></div>`;
+                solutionHTML += '<div><h4 style="color: var(--success-color); margin-bottom: 10px;">Solución Particular (con condiciones iniciales):</h4>';
+                solutionHTML += `<div style="background: #eafaf1; padding: 15px; border-radius: 4px; border-left: 3px solid var(--success-color);">${data.particular_solution_mathml}</div></div>`;
+            } else {
+                // Mostrar solo la solución disponible
+                solutionHTML = data.solution_mathml;
+            }
+            
+            solutionDiv.innerHTML = solutionHTML;
+            
+            // Mostrar pasos
+            stepsDiv.innerHTML = '';
+            data.steps.forEach((step, index) => {
+                const stepDiv = document.createElement('div');
+                stepDiv.className = 'step-item';
+                stepDiv.innerHTML = step;
+                stepsDiv.appendChild(stepDiv);
+            });
+            
+            // Sin MathML nativo, MathJax convierte el resultado
+            renderMath(resultSection);
+        } else {
+            if (data.numeric_solution) {
+                // Sin solución simbólica, pero el problema de contorno se resolvió numéricamente (ver pasos)
+                solutionDiv.innerHTML = '<div class="success-message">🔢 No hay solución simbólica; el problema de contorno se resolvió numéricamente. Los valores están en los pasos.</div>';
+            } else {
+                // Mostrar error
+                solutionDiv.innerHTML = '<div class="error-message">❌ No se pudo resolver la ecuación. Por favor verifica que esté escrita correctamente.</div>';
+            }
+            
+            if (data.steps && data.steps.length > 0) {
                 stepsDiv.innerHTML = '';
-                data.steps.forEach((step, index) => {
+                data.steps.forEach(step => {
                     const stepDiv = document.createElement('div');
                     stepDiv.className = 'step-item';
-                    
-                    // Procesar LaTeX en el paso
-                    // Reemplazar $latex()$ con formato MathJax
-                    let processedStep = step.replace(/\$latex\(([^\)]+)\)\$/g, '$$$$$1$$$$');
-                    // Reemplazar $$...$$ con \[...\]
-                    processedStep = processedStep.replace(/\$\$([^$]+)\$\$/g, '\\[$1\\]');
-                    // Reemplazar $...$ con \(...\)
-                    processedStep = processedStep.replace(/\$([^$]+)\$/g, '\\($1\\)');
-                    
-                    stepDiv.innerHTML = processedStep;
-                    
+                    stepDiv.innerHTML = step;
                     stepsDiv.appendChild(stepDiv);
                 });
                 
-                // Renderizar MathJax después de agregar contenido
-                setTimeout(() => {
-                    renderMath();
-                }, 100);
-            } else {
-                // Mostrar error
-                solutionDiv.innerHTML = '<div class="error-message">❌ No se pudo resolver la ecuación. Por favor verifica que esté escrita correctamente.</div>';
-                
-                if (data.steps && data.steps.length > 0) {
-                    stepsDiv.innerHTML = '';
-                    data.steps.forEach(step => {
-                        const stepDiv = document.createElement('div');
-                        stepDiv.className = 'step-item';
-                        
-                        // Procesar LaTeX en el paso
-                        let processedStep = step.replace(/\$latex\(([^\)]+)\)\$/g, '$$$$$1$$$$');
-                        processedStep = processedStep.replace(/\$\$([^$]+)\$\$/g, '\\[$1\\]');
-                        processedStep = processedStep.replace(/\$([^$]+)\$/g, '\\($1\\)');
-                        
-                        stepDiv.innerHTML = processedStep;
-                        stepsDiv.appendChild(stepDiv);
-                    });
-                    
-                    setTimeout(() => {
-                        renderMath();
-                    }, 100);
-                }
+                renderMath(resultSection);
             }
-        })
-        .catch(error => {
-            solveBtn.disabled = false;
-            solveBtn.textContent = 'Resolver Ecuación';
-            
-            resultSection.style.display = 'block';
-            solutionDiv.innerHTML = `<div class="error-message">❌ Error al comunicarse con el servidor: ${error.message}</div>`;
-            console.error('Error:', error);
-        });
+        }
     }
 });
-
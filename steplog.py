@@ -0,0 +1,396 @@
+"""
+Pasos de la resolución como registros estructurados.
+
+Los métodos de resolución no formatean nada al añadir un paso: guardan su tipo,
+la clave del mensaje en MESSAGES y los parámetros (valores y referencias a las
+expresiones de SymPy). El texto, y el LaTeX, el texto plano o el MathML de las
+expresiones, se generan al final, sólo para los pasos que se devuelven. Así un
+cliente que pide verbosity='none' no paga ningún latex() ni formatea texto.
+
+Cada expresión impresa se guarda en una caché LRU por (formato, expresión): la
+misma solución aparece varias veces en los pasos y en la respuesta, y las
+ecuaciones frecuentes repiten expresiones entre peticiones.
+
+    steps.add('heading', 'step1_heading')
+    steps.add('text', 'original_equation', equation=display(eq))
+    steps.add('text', 'condition', condition=Eq(lhs, rhs))      # expresión en línea
+"""
+import html
+import re
+from functools import lru_cache
+from string import Formatter
+
+from sympy import Basic, latex, mathml, sstr
+from sympy.matrices import MatrixBase
+
+import config
+
+VERBOSITY_LEVELS = ('none', 'summary', 'full')
+FORMATS = ('latex', 'text', 'mathml')
+
+MATHML_NS = 'http://www.w3.org/1998/Math/MathML'
+
+# Tipos de paso: los errores se incluyen siempre en el resumen
+KINDS = ('heading', 'text', 'success', 'warning', 'error')
+
+# Texto de cada paso. Los campos que reciben una expresión de SymPy (o display(...),
+# o una lista de expresiones) se imprimen en el formato pedido; el resto se formatea
+# como texto con su especificador ({value:g}).
+MESSAGES = {
+    'blank': '',
+    'expression': '   {expr}',
+
+    # Métodos específicos (solve_separable, solve_linear, ...)
+    'title_separable': '**Ecuación de Variables Separables**',
+    'title_homogeneous': '**Ecuación Diferencial Homogénea**',
+    'title_exact': '**Ecuación Diferencial Exacta**',
+    'title_linear': '**Ecuación Diferencial Lineal**',
+    'title_bernoulli': '**Ecuación Diferencial de Bernoulli**',
+    'title_reducible': '**Ecuación Reducible a Primer Orden**',
+    'title_constant_coeff': '**Ecuación con Coeficientes Constantes**',
+    'title_undetermined': '**Método de Coeficientes Indeterminados**',
+    'title_integrating_factor': '**Método de Factor Integrante**',
+    'original_equation': 'Ecuación original: {equation}',
+    'simplified_equation': '📐 Ecuación simplificada: {equation}',
+    'solutions_found': '✅ Solución encontrada (múltiples soluciones):',
+    'solution_found': '✅ Solución encontrada: {solution}',
+    'solution_found_heading': '✅ Solución encontrada:',
+    'solutions_found_alternative': '✅ Solución encontrada (método alternativo) - múltiples soluciones:',
+    'solution_found_alternative': '✅ Solución encontrada (método alternativo): {solution}',
+    'solutions_found_general': '✅ Solución encontrada (método general) - múltiples soluciones:',
+    'solution_found_general': '✅ Solución encontrada (método general): {solution}',
+    'solution_n': '   Solución {n}: {solution}',
+    'method_error': '❌ Error al resolver con método específico: {error}',
+    'linear_hint_failed': "⚠️ Método '1st_linear' falló: {error}",
+    'trying_alternative': '⚠️ Intentando método alternativo...',
+    'trying_general': '🔄 Intentando resolución general...',
+    'final_error': '❌ Error final: {error}',
+    'error': '❌ Error: {error}',
+    'traceback': '📄 Traceback: {details}',
+
+    # Condiciones iniciales y constantes
+    'constant_detected': '   📌 Condición detectada: {condition}',
+    'constant_parse_error': '   ⚠️ No se pudo parsear la constante: {condition}',
+    'ic_detected': '   📌 Condición inicial detectada: {condition}',
+    'ic_x_parse_error': '   ⚠️ No se pudo parsear x en: {condition}',
+    'ic_y_parse_error': '   ⚠️ No se pudo parsear y en: {condition}',
+    'ic_unknown_format': '   ⚠️ Formato no reconocido: {condition}',
+    'ic_parse_error': "   ⚠️ Error al parsear condición '{condition}': {error}",
+    'no_constants': '   ℹ️ La solución no contiene constantes de integración.',
+    'constants_heading': '🔧 **Aplicando valores de constantes:**',
+    'substituting': '   Sustituyendo {condition}',
+    'updated_solution': '   Solución actualizada: {solution}',
+    'constant_missing': '   ⚠️ No se encontró la constante {constant} en la solución',
+    'ic_heading': '🔧 **Aplicando condiciones iniciales para encontrar constantes:**',
+    'condition': '   Condición: {condition}',
+    'condition_equation': '   Ecuación resultante: {equation}',
+    'constants_system_heading': '🔍 **Resolviendo el sistema de ecuaciones para las constantes:**',
+    'constants_found': '   Soluciones encontradas para las constantes:',
+    'particular_found': '✅ **Solución particular obtenida:**',
+    'constants_unsolved': '   ⚠️ No se encontró solución para el sistema de ecuaciones',
+    'showing_general_undetermined': '   Se mostrará la solución general con las constantes sin determinar',
+    'constants_error': '   ⚠️ Error al resolver el sistema: {error}',
+    'showing_general': '   Se mostrará la solución general',
+    'ic_error': '   ⚠️ Error al aplicar condiciones iniciales: {error}',
+    'ic_traceback': '   📄 Detalles: {details}',
+
+    # solve_equation
+    'step1_heading': '📋 **Paso 1: Ecuación ingresada**',
+    'input_equation': '   Ecuación original: `{equation}`',
+    'step2_heading': '📝 **Paso 2: Ecuación parseada**',
+    'parsed_equation': '   La ecuación en formato matemático es: {equation}',
+    'standard_form_heading': '📐 **Forma estándar:**',
+    'equation_order': '   Esta es una ecuación diferencial de orden {order}.',
+    'parse_error': '❌ Error al parsear la ecuación: {error}',
+    'rationalized_heading': '🔢 **Coeficientes decimales convertidos a fracciones exactas:**',
+    'rationalized_value': '   {value:g} → {exact}',
+    'rationalized_equation': '   Ecuación con coeficientes exactos: {equation}',
+    'step3_heading': '🔍 **Paso 3: Clasificación automática de la ecuación**',
+    'hints_detected': '   Se detectaron los siguientes métodos aplicables:',
+    'hint_item': '   {n}. {method} ({hint})',
+    'hints_reordered': '   (orden ajustado según las resoluciones anteriores de ecuaciones de esta forma)',
+    'step3_hint_heading': "🔄 **Paso 3.{n}: Intentando resolver con método '{hint}'**",
+    'hint_solutions_found': "✅ ¡Éxito! Solución encontrada usando método '{method}' (múltiples soluciones):",
+    'hint_solution_found': "✅ ¡Éxito! Solución encontrada usando método '{method}':",
+    'hint_failed': "⚠️ El método '{method}' no es aplicable o falló.",
+    'trying_next_hint': '   Probando siguiente método...',
+    'step3_general_heading': '🔄 **Paso 3.6: Intentando resolución general (sin método específico)**',
+    'general_note': '   Como los métodos específicos no funcionaron, se intenta un método general...',
+    'no_hints': '   No se pudieron detectar métodos específicos para esta ecuación.',
+    'step3_direct_heading': '🔄 **Paso 3.1: Intentando resolución directa...**',
+    'direct_note': '   Se intentará resolver directamente sin restricciones de método...',
+    'classify_error': '⚠️ Error en clasificación: {error}',
+    'trying_direct': '🔄 Intentando resolución directa...',
+    'solve_error': '❌ Error al resolver: {error}',
+    'method_failed_auto': "⚠️ El método '{method}' no funcionó, intentando auto-detección...",
+    'available_hints': '🔍 Métodos disponibles: {hints}',
+    'trying_hint': "🔄 Intentando método: '{hint}'...",
+    'auto_solutions_found': "✅ Solución encontrada usando '{hint}' (auto-detectado):",
+    'auto_solution_found': "✅ Solución encontrada usando '{hint}' (auto-detectado): {solution}",
+    'auto_error': '❌ Error en auto-detección: {error}',
+    'step4_heading': '🔧 **Paso 4: Simplificación de la solución general**',
+    'simplifying': '   Simplificando la solución encontrada...',
+    'simplified_solutions': '   Solución simplificada (múltiples soluciones):',
+    'simplified_solution': '   Solución simplificada:',
+    'already_simple': '   La solución ya está en su forma más simple.',
+    'general_solution_label': '   Solución general:',
+    'simplify_error': '⚠️ Advertencia: Error al simplificar solución: {error}',
+    'showing_unsimplified': '   Se mostrará la solución sin simplificar.',
+    'step5_heading': '📋 **Paso 5: Procesando condiciones iniciales**',
+    'input_conditions': '   Condiciones ingresadas: `{conditions}`',
+    'no_valid_conditions': '   ⚠️ No se detectaron condiciones iniciales válidas.',
+    'showing_general_only': '   Se mostrará únicamente la solución general.',
+    'no_solution': '❌ No se pudo encontrar una solución para esta ecuación.',
+    'general_error': '❌ Error general al procesar: {error}',
+    'general_traceback': '📄 Detalles técnicos: {details}',
+    'exact_solution_heading': '🔢 **Solución exacta** (se muestra con {digits} cifras):',
+    'step6_heading': '📌 **Paso 6: Resumen final**',
+    'general_solution_heading': '📊 **Solución General:**',
+    'particular_solution_heading': '📊 **Solución Particular (con condiciones iniciales aplicadas):**',
+    'free_constant': '   La solución contiene la constante de integración: {constant}',
+    'free_constant_note': '   Esta constante puede tomar cualquier valor real.',
+    'free_constant_hint': '   Para obtener una solución particular, proporcione una condición inicial (ej: y(0)=3).',
+    'free_constants': '   La solución contiene las siguientes constantes de integración: {constants}',
+    'free_constants_note': '   Estas constantes pueden tomar cualquier valor real.',
+    'free_constants_hint': ("   Para obtener una solución particular, proporcione condiciones iniciales "
+                            "(ej: y(0)=3, y'(0)=1)."),
+    'may_depend_note': '   Nota: La solución puede depender de valores iniciales o condiciones de contorno.',
+    'solved': '✅ **Resumen:** La ecuación diferencial ha sido resuelta exitosamente.',
+    'render_error': '⚠️ Advertencia: Error al convertir solución a LaTeX: {error}',
+
+    # Problema de contorno numérico (bvp.py)
+    'bvp_heading': '🔢 **Resolución numérica del problema de contorno**',
+    'bvp_failed': '   ⚠️ No se pudo resolver numéricamente: {error}',
+    'bvp_method': '   Método: {method}, {points} puntos en [{start:g}, {end:g}]',
+    'bvp_residual': '   Residuo en las condiciones: {residual:.1e}',
+    'bvp_residual_estimate': '   Residuo en las condiciones: {residual:.1e}; error estimado: {estimate:.1e}',
+
+    # Sistemas (systems.py)
+    'system_step1_heading': '📋 **Paso 1: Sistema ingresado**',
+    'system_step2_heading': '📝 **Paso 2: Forma matricial**',
+    'coefficient_matrix': '   Matriz de coeficientes: {matrix}',
+    'system_step3_heading': '🔍 **Paso 3: Valores propios de A**',
+    'eigenvalue': '   {eigenvalue}',
+    'eigenvalue_multiple': '   {eigenvalue} (multiplicidad {multiplicity})',
+    'system_step4_numeric_heading': ('🧮 **Paso 4: Exponencial de matriz numérica '
+                                     '(descomposición espectral, NumPy)**'),
+    'not_diagonalizable': '   ⚠️ La matriz no es diagonalizable de forma fiable: se intenta de forma exacta',
+    'system_step4_jordan_heading': '🧮 **Paso 4: Exponencial de matriz (forma de Jordan)**',
+    'system_step5_heading': '📐 **Paso 5: Solución general:** u(t) = e^(At)·C, con C = u(0)',
+    'forcing_term': '   Término forzante: u_p(t) = e^(At) ∫₀ᵗ e^(-As)·b(s) ds',
+    'system_step6_heading': '🎯 **Paso 6: Condiciones iniciales (un único sistema lineal para C)**',
+    'system_dsolve_heading': '🔄 **El sistema no es lineal con coeficientes constantes: se intenta con dsolve**',
+    'system_general_found': '✅ Solución general encontrada',
+    'system_conditions_applied': '✅ Condiciones iniciales aplicadas',
+    'system_input_error': '❌ {error}',
+    'system_error': '❌ Error general al procesar el sistema: {error}',
+    'system_summary_heading': '📌 **Resumen final**',
+    'system_solved': '✅ **Resumen:** El sistema ha sido resuelto exitosamente.',
+}
+
+
+class display:
+    """Marca una expresión para mostrarla como bloque (ecuación centrada)"""
+
+    __slots__ = ('expr',)
+
+    def __init__(self, expr):
+        self.expr = expr
+
+
+@lru_cache(maxsize=None)
+def _template(key):
+    """(texto, campo, especificador) de MESSAGES[key], analizado una sola vez"""
+    return tuple((literal, field, spec) for literal, field, spec, _ in Formatter().parse(MESSAGES[key]))
+
+
+# El impresor de SymPy escribe el texto sin escapar (<mo><</mo>) y usa <mfenced>, que
+# MathML Core (Chrome, Firefox, Safari) ya no admite. Se reescribe con un tokenizador
+# de etiquetas: <mfenced> pasa a <mrow> con <mo> para los delimitadores y separadores.
+_TAG = re.compile(r'<(/?)([A-Za-z][\w.:-]*)((?:\s+[\w.:-]+="[^"]*")*)\s*(/?)>')
+_ATTR = re.compile(r'([\w.:-]+)="([^"]*)"')
+_BARE_AMPERSAND = re.compile(r'&(?!#?\w+;)')
+
+
+def _escape_text(text):
+    return _BARE_AMPERSAND.sub('&amp;', text).replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _parse_tags(body):
+    root = ('', '', [])
+    stack = [root]
+    position = 0
+    for match in _TAG.finditer(body):
+        if match.start() > position:
+            stack[-1][2].append(_escape_text(body[position:match.start()]))
+        position = match.end()
+        closing, tag, attrs, self_closing = match.groups()
+        if closing:
+            if len(stack) > 1:
+                stack.pop()
+            continue
+        node = (tag, attrs, [])
+        stack[-1][2].append(node)
+        if not self_closing:
+            stack.append(node)
+    if position < len(body):
+        stack[-1][2].append(_escape_text(body[position:]))
+    return root[2]
+
+
+def _emit(nodes):
+    out = []
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(node)
+            continue
+        tag, attrs, children = node
+        if tag != 'mfenced':
+            out.append(f'<{tag}{attrs}>{_emit(children)}</{tag}>')
+            continue
+        options = dict(_ATTR.findall(attrs))
+        separators = options.get('separators', ',').split() or list(options.get('separators', ','))
+        items = [child for child in children if not isinstance(child, str) or child.strip()]
+        pieces = [f'<mo>{html.escape(options.get("open", "("))}</mo>']
+        for index, item in enumerate(items):
+            if index and separators:
+                pieces.append(f'<mo>{html.escape(separators[min(index, len(separators)) - 1])}</mo>')
+            pieces.append(_emit([item]))
+        pieces.append(f'<mo>{html.escape(options.get("close", ")"))}</mo>')
+        out.append(f'<mrow>{"".join(pieces)}</mrow>')
+    return ''.join(out)
+
+
+def print_mathml(expr):
+    """Cuerpo MathML de presentación de una expresión, válido para MathML Core"""
+    return _emit(_parse_tags(mathml(expr, printer='presentation')))
+
+
+_PRINTERS = {
+    'latex': latex,
+    'text': sstr,
+    'mathml': print_mathml,
+}
+
+
+@lru_cache(maxsize=config.RENDER_CACHE_SIZE or None)
+def _printed_cached(fmt, expr):
+    return _PRINTERS[fmt](expr)
+
+
+def printed(expr, fmt='latex'):
+    """LaTeX, texto o cuerpo MathML de una expresión, usando la caché si es hashable"""
+    if not config.RENDER_CACHE_SIZE:
+        return _PRINTERS[fmt](expr)
+    try:
+        return _printed_cached(fmt, expr)
+    except TypeError:
+        return _PRINTERS[fmt](expr)
+
+
+def render_latex(expr, block=False):
+    body = printed(expr, 'latex')
+    return f'\\[{body}\\]' if block else f'\\({body}\\)'
+
+
+def render_text(expr, block=False):
+    return printed(expr, 'text')
+
+
+def _math(body, block=False):
+    mode = ' display="block"' if block else ''
+    return f'<math xmlns="{MATHML_NS}"{mode}>{body}</math>'
+
+
+def render_mathml(expr, block=False):
+    return _math(printed(expr, 'mathml'), block)
+
+
+_RENDERERS = {'latex': render_latex, 'text': render_text, 'mathml': render_mathml}
+
+
+def render_solution(solution, fmt='latex'):
+    """Solución (o lista de soluciones) en el formato pedido: LaTeX sin delimitadores o <math> en bloque"""
+    if fmt == 'mathml':
+        if not isinstance(solution, list):
+            return render_mathml(solution, block=True)
+        # Equivalente a \begin{cases}: una fila de tabla por solución
+        rows = ''.join(f'<mtr><mtd>{printed(sol, "mathml")}</mtd></mtr>' for sol in solution)
+        return _math(f'<mtable columnalign="left">{rows}</mtable>', block=True)
+    if isinstance(solution, list) and fmt == 'latex':
+        return '\\begin{cases} ' + ' \\\\ '.join(printed(sol, fmt) for sol in solution) + ' \\end{cases}'
+    return printed(solution, fmt)
+
+
+def cache_stats():
+    info = _printed_cached.cache_info()
+    total = info.hits + info.misses
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+            'maxsize': info.maxsize, 'hit_ratio': round(info.hits / total, 4) if total else 0.0}
+
+
+def _render_value(value, spec, renderer, escape):
+    if isinstance(value, display):
+        return renderer(value.expr, block=True)
+    if isinstance(value, list):
+        return ', '.join(_render_value(item, spec, renderer, escape) for item in value)
+    if isinstance(value, (Basic, MatrixBase)):
+        return renderer(value)
+    return escape(format(value, spec))
+
+
+class StepLog:
+    """
+    Lista de pasos (kind, resumen, clave, parámetros): kind es uno de KINDS y la
+    clave elige el texto en MESSAGES. Los parámetros son valores o expresiones
+    (en línea) o display(expresión). Los pasos añadidos tras begin_summary()
+    forman el resumen final; los errores siempre se incluyen en él.
+    """
+
+    def __init__(self):
+        self._records = []
+        self._summary = False
+
+    def add(self, kind, key, **params):
+        self._records.append((kind, self._summary, key, params))
+
+    def begin_summary(self):
+        self._summary = True
+
+    def has_errors(self):
+        return any(record[0] == 'error' for record in self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def records(self, verbosity='full'):
+        if verbosity == 'none':
+            return []
+        if verbosity == 'summary':
+            return [record for record in self._records if record[1] or record[0] == 'error']
+        return list(self._records)
+
+    def render(self, verbosity='full', fmt='latex'):
+        """Devuelve los pasos como cadenas en el formato pedido"""
+        renderer = _RENDERERS[fmt]
+        escape = html.escape if fmt == 'mathml' else str
+        rendered = []
+        for _, _, key, params in self.records(verbosity):
+            pieces = []
+            for literal, field, spec in _template(key):
+                pieces.append(escape(literal))
+                if field is not None:
+                    pieces.append(_render_value(params[field], spec, renderer, escape))
+            rendered.append(''.join(pieces))
+        return rendered
+
+
+def parse_options(verbosity, fmt):
+    """Valida verbosity y format de la petición (valores por defecto: full y latex)"""
+    verbosity = str(verbosity or 'full').lower()
+    fmt = str(fmt or 'latex').lower()
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"verbosity debe ser uno de: {', '.join(VERBOSITY_LEVELS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format debe ser uno de: {', '.join(FORMATS)}")
+    return verbosity, fmt
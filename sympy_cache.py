@@ -0,0 +1,147 @@
+"""
+Gestión de la caché interna de SymPy (cacheit).
+
+SymPy memoiza con lru_cache buena parte del trabajo de dsolve/simplify. Este
+módulo fija su tamaño a partir de la configuración, expone estadísticas de
+aciertos y fallos, y la vacía según una política (cada N peticiones o cuando
+la memoria residente supera un umbral).
+
+Debe importarse antes que sympy: el tamaño se lee de SYMPY_CACHE_SIZE al
+importar SymPy. Si SymPy ya estaba importado, se redimensionan en caliente las
+funciones memoizadas.
+"""
+import os
+import sys
+import threading
+from functools import lru_cache
+
+import config
+import metrics
+
+
+def _parse_size(value):
+    value = str(value).strip().lower()
+    if value in ('none', 'unlimited', '-1'):
+        return None
+    return int(float(value))
+
+
+def configure():
+    """Aplica SOLVER_SYMPY_CACHE_SIZE (si está definido) antes o después de importar SymPy"""
+    if not config.SYMPY_CACHE_SIZE:
+        return
+    if 'sympy' in sys.modules:
+        resize(_parse_size(config.SYMPY_CACHE_SIZE))
+    else:
+        os.environ['SYMPY_CACHE_SIZE'] = config.SYMPY_CACHE_SIZE
+
+
+def _cached_functions():
+    from sympy.core.cache import CACHE
+    return CACHE
+
+
+def resize(maxsize):
+    """
+    Cambia el tamaño máximo de todas las funciones memoizadas (None = ilimitado,
+    0 = sin caché). Vacía su contenido. Devuelve cuántas funciones se ajustaron.
+    """
+    resized = 0
+    for wrapper in _cached_functions():
+        code = getattr(wrapper, '__code__', None)
+        if code is None or not wrapper.__closure__:
+            continue
+        cells = dict(zip(code.co_freevars, wrapper.__closure__))
+        if 'cfunc' not in cells or 'func' not in cells:
+            continue
+        # cacheit envuelve lru_cache(maxsize)(func) en la celda 'cfunc' del wrapper
+        cfunc = lru_cache(maxsize, typed=True)(cells['func'].cell_contents)
+        cells['cfunc'].cell_contents = cfunc
+        wrapper.cache_info = cfunc.cache_info
+        wrapper.cache_clear = cfunc.cache_clear
+        resized += 1
+    return resized
+
+
+def stats(top=0):
+    """Hits, misses, tamaño y ratio de aciertos agregados (y, opcionalmente, por función)"""
+    hits = misses = size = 0
+    maxsize = None
+    per_function = []
+    for wrapper in _cached_functions():
+        if not hasattr(wrapper, 'cache_info'):
+            continue
+        info = wrapper.cache_info()
+        hits += info.hits
+        misses += info.misses
+        size += info.currsize
+        maxsize = info.maxsize
+        if top:
+            per_function.append({
+                'function': f'{wrapper.__module__}.{wrapper.__qualname__}',
+                'hits': info.hits,
+                'misses': info.misses,
+                'size': info.currsize,
+            })
+    total = hits + misses
+    result = {
+        'functions': len(_cached_functions()),
+        'maxsize_per_function': maxsize,
+        'hits': hits,
+        'misses': misses,
+        'size': size,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+    if top:
+        per_function.sort(key=lambda item: -(item['hits'] + item['misses']))
+        result['top_functions'] = per_function[:top]
+    return result
+
+
+def clear(reason='manual'):
+    from sympy.core.cache import clear_cache
+    clear_cache()
+    metrics.SYMPY_CACHE_CLEARS.inc(reason=reason)
+
+
+class ClearPolicy:
+    """
+    Vacía la caché cada `every` peticiones o cuando la RSS supera `rss_mb`.
+    La RSS casi nunca baja tras vaciar la caché, así que entre dos vaciados por
+    memoria deben pasar al menos `memory_cooldown` peticiones.
+    """
+
+    def __init__(self, every=0, rss_mb=0, memory_cooldown=25):
+        self.every = every
+        self.rss_mb = rss_mb
+        self.memory_cooldown = memory_cooldown
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._since_memory_clear = memory_cooldown
+
+    def after_request(self):
+        if not self.every and not self.rss_mb:
+            return None
+        reason = None
+        with self._lock:
+            self._requests += 1
+            self._since_memory_clear += 1
+            if self.every and self._requests >= self.every:
+                self._requests = 0
+                reason = 'requests'
+            check_memory = reason is None and self.rss_mb and self._since_memory_clear >= self.memory_cooldown
+        if check_memory:
+            from workers import current_rss_mb
+            if current_rss_mb() > self.rss_mb:
+                reason = 'memory'
+                with self._lock:
+                    self._since_memory_clear = 0
+        if reason:
+            clear(reason)
+        return reason
+
+
+policy = ClearPolicy(config.SYMPY_CACHE_CLEAR_EVERY, config.SYMPY_CACHE_CLEAR_RSS_MB)
+
+
+configure()
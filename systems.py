@@ -0,0 +1,366 @@
+"""
+Sistemas de EDO de primer orden, una ecuación por incógnita separadas por ';'
+o saltos de línea (variable independiente t):
+
+    x' = 3*x - 4*y; y' = 4*x - 7*y          condiciones: x(0)=1, y(0)=0
+
+Los sistemas lineales de coeficientes constantes se escriben como
+u' = A u + b(t) y se resuelven con la exponencial de matriz:
+
+    u(t) = e^{A t} C + e^{A t} ∫_0^t e^{-A s} b(s) ds,   C = u(0)
+
+Si los valores propios de A tienen forma cerrada sencilla, e^{At} se calcula
+de forma exacta con SymPy (forma de Jordan). Si A tiene coeficientes decimales,
+es grande o sus valores propios sólo se conocen numéricamente, se usa la
+descomposición espectral de NumPy, comprobada contra una exponencial de matriz
+numérica (expm: Padé con escalado y cuadrado). Las condiciones iniciales se
+aplican resolviendo un único sistema lineal para C. Los sistemas no lineales o
+de coeficientes variables se intentan con dsolve.
+"""
+import re
+
+from sympy import (
+    CRootOf, Dummy, Eq, collect, expand, Float, Function, I, Integer, MatAdd, MatMul, Matrix, MatrixSymbol, Pow, Symbol, cos, diff, dsolve, exp, integrate,
+    linsolve, log, nsimplify, pi, powsimp, roots, simplify, sin, sinh, cosh, sqrt, tan, zeros,
+)
+from sympy.parsing.sympy_parser import implicit_multiplication_application, parse_expr, standard_transformations
+
+import cancellation
+import config
+from steplog import display
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:  # sin NumPy sólo queda la vía exacta
+    np = None
+    HAVE_NUMPY = False
+
+T = Symbol('t', real=True)
+
+_SEPARATORS = re.compile(r'[;\n]+')
+_LHS = re.compile(r"^\s*([A-Za-z][A-Za-z0-9_]*)\s*'\s*$")
+_LHS_LEIBNIZ = re.compile(r"^\s*d([A-Za-z][A-Za-z0-9_]*)\s*/\s*dt\s*$")
+_CONDITION = re.compile(r"^\s*([A-Za-z][A-Za-z0-9_]*)\s*\(([^)]+)\)\s*=\s*(.+)$")
+_RESERVED = {'t', 'e', 'E', 'pi', 'exp', 'log', 'ln', 'sin', 'cos', 'tan', 'sqrt'}
+_TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application,)
+_FUNCTIONS = {
+    'exp': exp, 'log': log, 'ln': log, 'sin': sin, 'cos': cos, 'tan': tan, 'sqrt': sqrt,
+    'pi': pi, 'E': exp(1), 'e': exp(1),
+}
+
+# Coeficientes de Padé [6/6] de exp(x)
+_PADE_6 = (1.0, 1 / 2, 5 / 44, 1 / 66, 1 / 792, 1 / 15840, 1 / 665280)
+
+
+def split_equations(text):
+    return [part.strip() for part in _SEPARATORS.split(text or '') if part.strip()]
+
+
+def is_system(text):
+    """Más de una ecuación: se resuelve como sistema"""
+    return len(split_equations(text)) > 1
+
+
+def _normalize(text):
+    text = text.replace('−', '-').replace('–', '-').replace('—', '-')
+    return text.replace('^', '**')
+
+
+def _parse_value(text, local_dict):
+    return parse_expr(_normalize(text.strip()), local_dict=local_dict, transformations=_TRANSFORMATIONS)
+
+
+def parse_system(text):
+    """Devuelve (nombres, incógnitas, lados derechos) con las incógnitas como símbolos"""
+    names, right_sides = [], []
+    for equation in split_equations(text):
+        if '=' not in equation:
+            raise ValueError(f"Falta '=' en la ecuación: {equation}")
+        left, right = equation.split('=', 1)
+        match = _LHS.match(left) or _LHS_LEIBNIZ.match(left)
+        if not match:
+            raise ValueError(f"Cada ecuación debe tener la forma x' = ... (primer orden): {equation}")
+        names.append(match.group(1))
+        right_sides.append(right)
+    if len(set(names)) != len(names):
+        raise ValueError('Cada incógnita debe tener una única ecuación')
+    reserved = _RESERVED.intersection(names)
+    if reserved:
+        raise ValueError(f"Nombre reservado como incógnita: {', '.join(sorted(reserved))}")
+    unknowns = [Symbol(name) for name in names]
+    local_dict = dict(_FUNCTIONS, t=T, **dict(zip(names, unknowns)))
+    rhs = []
+    for name, right in zip(names, right_sides):
+        try:
+            rhs.append(_parse_value(right, local_dict))
+        except Exception as e:
+            raise ValueError(f"No se pudo interpretar la ecuación de {name}': {right.strip()} ({e})")
+    return names, unknowns, rhs
+
+
+def parse_conditions(text, names):
+    """'x(0)=1, y(0)=2' -> (t0, {nombre: valor}); todas en el mismo instante"""
+    values = {}
+    t0 = None
+    local_dict = dict(_FUNCTIONS, t=T)
+    for part in (text or '').replace(';', ',').split(','):
+        if not part.strip():
+            continue
+        match = _CONDITION.match(part)
+        if not match or match.group(1) not in names:
+            raise ValueError(f"Condición no reconocida: {part.strip()} (se espera {names[0]}(0)=valor)")
+        at = _parse_value(match.group(2), local_dict)
+        if t0 is not None and simplify(at - t0) != 0:
+            raise ValueError('Todas las condiciones iniciales deben darse en el mismo instante t0')
+        t0 = at
+        values[match.group(1)] = _parse_value(match.group(3), local_dict)
+    return t0, values
+
+
+def linear_form(unknowns, rhs):
+    """(A, b) con rhs = A u + b, o None si el sistema no es lineal en las incógnitas"""
+    n = len(unknowns)
+    A = Matrix(n, n, lambda i, j: diff(rhs[i], unknowns[j]))
+    if any(entry.has(*unknowns) for entry in A):
+        return None
+    b = (Matrix(rhs) - A * Matrix(unknowns)).applyfunc(lambda e: simplify(e))
+    if any(entry.has(*unknowns) for entry in b):
+        return None
+    return A, b
+
+
+def closed_form_eigenvalues(A):
+    """Valores propios exactos {valor: multiplicidad}, o None si no tienen forma cerrada sencilla"""
+    found = roots(A.charpoly())
+    if sum(found.values()) != A.rows:
+        return None
+    for value in found:
+        if value.has(CRootOf):
+            return None
+        # Raíces cúbicas o superiores (Cardano): e^{At} resultante es inmanejable
+        if any(p.exp.is_Rational and p.exp.q > 2 for p in value.atoms(Pow)):
+            return None
+    return found
+
+
+def exact_propagator(A):
+    """e^{At} exacta (forma de Jordan), reescrita con senos y cosenos"""
+    propagator = (A * T).exp()
+    # Valores propios complejos: exp(I*t) -> cos(t) + I*sin(t), que se cancela
+    return propagator.applyfunc(lambda e: simplify(e.rewrite(cos)) if e.has(I) else simplify(e))
+
+
+def expm(M):
+    """Exponencial de una matriz NumPy: Padé [6/6] con escalado y cuadrado"""
+    M = np.asarray(M, dtype=float)
+    norm = np.linalg.norm(M, 1)
+    squarings = max(0, int(np.ceil(np.log2(norm / 0.5)))) if norm > 0.5 else 0
+    X = M / 2 ** squarings
+    identity = np.eye(M.shape[0])
+    X2 = X @ X
+    X4 = X2 @ X2
+    X6 = X4 @ X2
+    c = _PADE_6
+    U = X @ (c[1] * identity + c[3] * X2 + c[5] * X4)
+    V = c[0] * identity + c[2] * X2 + c[4] * X4 + c[6] * X6
+    result = np.linalg.solve(V - U, V + U)
+    for _ in range(squarings):
+        result = result @ result
+    return result
+
+
+def _float(value, digits=10):
+    """Número de NumPy como Float de SymPy (entero si lo es, para no mostrar 5.0*t)"""
+    value = float(value)
+    if abs(value - round(value)) <= 1e-12 * max(1.0, abs(value)):
+        return Integer(round(value))
+    return Float(value, digits)
+
+
+def numeric_propagator(A):
+    """
+    e^{At} a partir de A = V diag(λ) V⁻¹ calculada con NumPy: suma de
+    proyectores P_k e^{λ_k t}, con los pares complejos conjugados en forma real
+    e^{at}(Re P cos bt - Im P sin bt). None si A no es diagonalizable de forma
+    fiable (la comparación con expm falla).
+    """
+    M = np.array(A.tolist(), dtype=float)
+    n = M.shape[0]
+    eigenvalues, V = np.linalg.eig(M)
+    if np.linalg.cond(V) > 1e10:
+        return None
+    V_inv = np.linalg.inv(V)
+    scale = max(1.0, np.abs(M).max())
+    result = zeros(n, n)
+    for k, value in enumerate(eigenvalues):
+        projector = np.outer(V[:, k], V_inv[k, :])
+        if abs(value.real) <= 1e-12 * scale:
+            value = complex(0, value.imag)
+        if abs(value.imag) <= 1e-12 * scale:
+            growth = exp(_float(value.real) * T)
+            terms = projector.real, None
+        elif value.imag > 0:
+            growth = exp(_float(value.real) * T)
+            terms = 2 * projector.real, -2 * projector.imag
+        else:
+            continue  # El conjugado ya aportó este término
+        omega = _float(value.imag) * T
+        for i in range(n):
+            for j in range(n):
+                real_part, imag_part = terms
+                term = 0
+                if abs(real_part[i, j]) > 1e-12:
+                    term += _float(real_part[i, j]) * (cos(omega) if imag_part is not None else 1)
+                if imag_part is not None and abs(imag_part[i, j]) > 1e-12:
+                    term += _float(imag_part[i, j]) * sin(omega)
+                result[i, j] += term * growth
+    # Comprobación contra la exponencial numérica (detecta matrices defectivas)
+    expected = expm(M)
+    obtained = np.array(result.subs(T, 1).evalf().tolist(), dtype=float)
+    if not np.allclose(obtained, expected, rtol=1e-7, atol=1e-9 * np.abs(expected).max()):
+        return None
+    return result
+
+
+def _numeric_steps(A, steps):
+    for value in np.linalg.eigvals(np.array(A.tolist(), dtype=float)):
+        approx = _float(value.real, 6) + (_float(value.imag, 6) * I if abs(value.imag) > 1e-12 else 0)
+        steps.add('text', 'eigenvalue', eigenvalue=Eq(Symbol('lambda'), approx))
+    propagator = numeric_propagator(A)
+    if propagator is not None:
+        steps.add('heading', 'system_step4_numeric_heading')
+    else:
+        steps.add('warning', 'not_diagonalizable')
+    return propagator
+
+
+def _particular_integral(propagator, b):
+    """e^{At} ∫_0^t e^{-As} b(s) ds"""
+    s = Dummy('s', real=True)
+    integrand = (propagator.subs(T, -s) * b.subs(T, s)).applyfunc(simplify)
+    integral = integrand.applyfunc(lambda e: integrate(e, (s, 0, T)))
+    return (propagator * integral).applyfunc(simplify)
+
+
+def _tidy(expr, constants):
+    """Suma de términos exponenciales agrupada por constante: C1*(...) + C2*(...)"""
+    expr = expr.rewrite([sinh, cosh], exp)
+    return collect(powsimp(expand(expr)), constants)
+
+
+def _functions(names):
+    return [Function(name)(T) for name in names]
+
+
+def _as_equations(names, vector):
+    return [Eq(f, value) for f, value in zip(_functions(names), vector)]
+
+
+def _dsolve_fallback(names, unknowns, rhs, t0, values, steps):
+    funcs = _functions(names)
+    substitutions = dict(zip(unknowns, funcs))
+    equations = [Eq(f.diff(T), expr.subs(substitutions)) for f, expr in zip(funcs, rhs)]
+    steps.add('heading', 'system_dsolve_heading')
+    general = dsolve(equations, funcs)
+    steps.add('success', 'system_general_found')
+    particular = None
+    if values:
+        ics = {Function(name)(t0): value for name, value in values.items()}
+        particular = dsolve(equations, funcs, ics=ics)
+        steps.add('success', 'system_conditions_applied')
+    return list(general), list(particular) if particular is not None else None
+
+
+def solve_system(equation_str, initial_conditions_str, steps):
+    """
+    Resuelve el sistema y anota los pasos. Devuelve (solución general,
+    solución particular o None) como listas de Eq(x(t), ...). Lanza ValueError
+    con un mensaje para el usuario si el sistema no se puede interpretar.
+    """
+    steps.add('heading', 'system_step1_heading')
+    names, unknowns, rhs = parse_system(equation_str)
+    funcs = _functions(names)
+    substitutions = dict(zip(unknowns, funcs))
+    for f, expr in zip(funcs, rhs):
+        steps.add('text', 'expression', expr=display(Eq(f.diff(T), expr.subs(substitutions))))
+    t0, values = parse_conditions(initial_conditions_str, names)
+    for name, value in values.items():
+        steps.add('text', 'ic_detected', condition=Eq(Function(name)(t0), value))
+
+    form = linear_form(unknowns, rhs)
+    if form is None or any(entry.has(T) for entry in form[0]):
+        return _dsolve_fallback(names, unknowns, rhs, t0, values, steps)
+    A, b = form
+    forced = any(entry != 0 for entry in b)
+    u = Matrix(funcs)
+
+    steps.add('heading', 'system_step2_heading')
+    product = MatMul(A, u, evaluate=False)
+    right = MatAdd(product, b, evaluate=False) if forced else product
+    steps.add('text', 'expression', expr=display(Eq(u.diff(T), right, evaluate=False)))
+    steps.add('text', 'coefficient_matrix', matrix=display(A))
+    cancellation.check()
+
+    has_floats = any(entry.has(Float) for entry in A)
+    numeric_ok = HAVE_NUMPY and not forced and not A.free_symbols
+    propagator = None
+    steps.add('heading', 'system_step3_heading')
+    if numeric_ok and (has_floats or A.rows > config.SYSTEM_EXACT_MAX_SIZE):
+        propagator = _numeric_steps(A, steps)
+    if propagator is None:
+        # Los decimales se pasan a racionales para la vía exacta (0.5 -> 1/2)
+        exact_A = A.applyfunc(lambda e: nsimplify(e, rational=True)) if has_floats else A
+        eigenvalues = closed_form_eigenvalues(exact_A)
+        if eigenvalues is not None:
+            for value, multiplicity in eigenvalues.items():
+                if multiplicity > 1:
+                    steps.add('text', 'eigenvalue_multiple', eigenvalue=Eq(Symbol('lambda'), value),
+                              multiplicity=multiplicity)
+                else:
+                    steps.add('text', 'eigenvalue', eigenvalue=Eq(Symbol('lambda'), value))
+            steps.add('heading', 'system_step4_jordan_heading')
+            propagator = exact_propagator(exact_A)
+        elif numeric_ok and not (has_floats or A.rows > config.SYSTEM_EXACT_MAX_SIZE):
+            propagator = _numeric_steps(A, steps)
+    if propagator is None:
+        if numeric_ok:
+            raise ValueError('La matriz no es diagonalizable de forma fiable y sus valores propios '
+                             'no tienen forma cerrada: no se puede dar una solución cerrada')
+        raise ValueError('Los valores propios de A no tienen forma cerrada sencilla '
+                         '(con términos forzantes o parámetros sólo se resuelve de forma exacta)')
+    steps.add('text', 'expression',
+              expr=display(Eq(exp(T * MatrixSymbol('A', A.rows, A.cols)), propagator, evaluate=False)))
+    cancellation.check()
+
+    constants = [Symbol(f'C{i}') for i in range(1, len(names) + 1)]
+    homogeneous = propagator * Matrix(constants)
+    steps.add('heading', 'system_step5_heading')
+    particular_part = zeros(len(names), 1)
+    if forced:
+        steps.add('text', 'forcing_term')
+        particular_part = _particular_integral(propagator, b)
+    general_vector = (homogeneous + particular_part).applyfunc(lambda e: _tidy(e, constants))
+    general = _as_equations(names, general_vector)
+    for equation in general:
+        steps.add('text', 'expression', expr=display(equation))
+    cancellation.check()
+
+    particular = None
+    if values:
+        steps.add('heading', 'system_step6_heading')
+        rows = [i for i, name in enumerate(names) if name in values]
+        conditions = [Eq(general_vector[i].subs(T, t0), values[names[i]], evaluate=False) for i in rows]
+        for condition in conditions:
+            steps.add('text', 'expression', expr=condition)
+        solutions = linsolve(conditions, constants)
+        if not solutions:
+            raise ValueError('Las condiciones iniciales son incompatibles')
+        constant_values = dict(zip(constants, next(iter(solutions))))
+        if any(condition.lhs not in constants for condition in conditions):
+            for constant, value in constant_values.items():
+                if value != constant:
+                    steps.add('text', 'expression', expr=Eq(constant, value))
+        particular_vector = general_vector.subs(constant_values).applyfunc(lambda e: _tidy(e, constants))
+        particular = _as_equations(names, particular_vector)
+    return general, particular
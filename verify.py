@@ -0,0 +1,175 @@
+"""
+Verificación numérica rápida de las soluciones de /solve.
+
+checkodesol simplifica el residuo simbólicamente y a menudo tarda más que la
+propia resolución. Aquí el residuo (la ecuación con la solución sustituida y
+las derivadas calculadas, sin simplificar) se compila con lambdify y se evalúa
+con NumPy en un lote de puntos x y valores de las constantes aleatorios (con
+semilla fija: la misma petición da siempre el mismo resultado). La aritmética
+es compleja para que sqrt o log de negativos no descarten puntos.
+
+Donde el residuo es pequeño frente a los términos que se cancelan pero no
+despreciable en doble precisión, esos puntos se vuelven a evaluar con mpmath
+a más precisión. Las condiciones iniciales se comprueban con evalf.
+"""
+import time
+
+import mpmath
+from sympy import Add, Eq, Order, checkodesol, lambdify
+
+import cancellation
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+VERIFIED = 'verified'
+FAILED = 'failed'
+INCONCLUSIVE = 'inconclusive'
+
+MODES = ('fast', 'full')
+
+SAMPLES = 48
+MIN_VALID_POINTS = 12
+# Residuo admitido en doble precisión, relativo a la suma de |términos| del residuo
+TOLERANCE = 1e-8
+# Por debajo de esta fracción de los términos se sospecha cancelación (se repite con mpmath)
+CANCELLATION_RATIO = 1e-3
+MPMATH_DPS = 50
+MPMATH_TOLERANCE = 1e-25
+
+
+def parse_mode(value):
+    """None (sin verificar), 'fast' o 'full' a partir del campo verify de la petición"""
+    if value in (None, False, '', 0, '0', 'false', 'none'):
+        return None
+    if value in (True, 1, '1', 'true'):
+        return 'fast'
+    value = str(value).lower()
+    if value not in MODES:
+        raise ValueError(f"verify debe ser uno de: {', '.join(MODES)} (o true/false)")
+    return value
+
+
+def _explicit(solution, y):
+    return isinstance(solution, Eq) and solution.lhs == y and not solution.rhs.has(y)
+
+
+def residual_expression(eq, solution, y):
+    """Residuo lhs - rhs de la ecuación con y sustituida por la solución explícita"""
+    return (eq.lhs - eq.rhs).subs(y, solution.rhs).doit()
+
+
+def _sample(residual, x, rng):
+    """Residuos y magnitudes (suma de |términos|) en un lote de puntos aleatorios"""
+    constants = sorted((s for s in residual.free_symbols if s != x), key=str)
+    symbols_ = [x] + constants
+    terms = Add.make_args(residual)
+    evaluate_terms = lambdify(symbols_, list(terms), 'numpy')
+    points = rng.uniform(-3, 3, size=(SAMPLES, len(symbols_))).astype(complex)
+    with np.errstate(all='ignore'):
+        values = [np.broadcast_to(np.asarray(value, dtype=complex), (SAMPLES,))
+                  for value in evaluate_terms(*points.T)]
+    values = np.array(values)
+    return points, symbols_, terms, np.abs(values.sum(axis=0)), np.abs(values).sum(axis=0)
+
+
+def _mpmath_residual(terms, symbols_, point):
+    """Residuo en un punto evaluado con mpmath a MPMATH_DPS cifras"""
+    evaluate = lambdify(symbols_, Add(*terms), 'mpmath')
+    with mpmath.workdps(MPMATH_DPS):
+        arguments = [mpmath.mpc(complex(value)) for value in point]
+        return abs(evaluate(*arguments))
+
+
+def check_solution(eq, solution, y):
+    """Verificación numérica de una solución explícita Eq(y, f(x))"""
+    x = y.args[0]
+    if not _explicit(solution, y):
+        return {'status': INCONCLUSIVE, 'reason': 'solución implícita'}
+    residual = residual_expression(eq, solution, y)
+    if residual == 0:
+        return {'status': VERIFIED, 'max_residual': 0.0, 'points': 0}
+    # Las series truncadas (O(x^n)) no satisfacen la ecuación exactamente
+    if residual.has(Order):
+        return {'status': INCONCLUSIVE, 'reason': 'serie truncada'}
+    if not HAVE_NUMPY:
+        return {'status': INCONCLUSIVE, 'reason': 'sin NumPy'}
+    rng = np.random.default_rng(0)
+    points, symbols_, terms, absolute, magnitude = _sample(residual, x, rng)
+    valid = np.isfinite(absolute) & np.isfinite(magnitude)
+    if valid.sum() < MIN_VALID_POINTS:
+        return {'status': INCONCLUSIVE, 'reason': 'la solución no es evaluable en suficientes puntos',
+                'points': int(valid.sum())}
+    relative = absolute / (1 + magnitude)
+    failing = valid & (relative > TOLERANCE)
+    # Fallos aparentes por cancelación: residuo pequeño frente a los términos
+    suspicious = failing & (absolute < CANCELLATION_RATIO * magnitude)
+    rechecked = 0
+    for index in np.flatnonzero(suspicious):
+        cancellation.check()
+        precise = _mpmath_residual(terms, symbols_, points[index])
+        rechecked += 1
+        if precise <= MPMATH_TOLERANCE * (1 + magnitude[index]):
+            failing[index] = False
+            relative[index] = float(precise) / (1 + magnitude[index])
+    result = {
+        'status': FAILED if failing.any() else VERIFIED,
+        'max_residual': float(relative[valid].max()),
+        'points': int(valid.sum()),
+    }
+    if rechecked:
+        result['mpmath_points'] = rechecked
+    return result
+
+
+def check_conditions(solution, conditions, y):
+    """|y^(k)(x0) - valor| de cada condición inicial, evaluado con evalf"""
+    x = y.args[0]
+    checks = []
+    for x_val, value, deriv in conditions:
+        try:
+            actual = solution.rhs.diff(x, deriv).subs(x, x_val)
+            error = abs(complex((actual - value).evalf()))
+        except (TypeError, ValueError):
+            error = None
+        checks.append({'condition': f"y{chr(39) * deriv}({x_val})={value}",
+                       'error': error, 'ok': error is not None and error <= 1e-9 * (1 + abs(complex(value)))})
+    return checks
+
+
+def verify(eq, y, general_solution, particular_solution=None, conditions=(), mode='fast'):
+    """
+    Verifica la solución particular (o la general, o cada una de una lista).
+    Devuelve confident (verificada), el residuo máximo y el detalle por solución.
+    """
+    started = time.perf_counter()
+    target = particular_solution if particular_solution is not None else general_solution
+    solutions = target if isinstance(target, list) else [target]
+    details = [check_solution(eq, solution, y) for solution in solutions]
+    report = {
+        'mode': mode,
+        'status': (FAILED if any(d['status'] == FAILED for d in details) else
+                   VERIFIED if all(d['status'] == VERIFIED for d in details) else INCONCLUSIVE),
+        'max_residual': max((d['max_residual'] for d in details if 'max_residual' in d), default=None),
+        'solutions': details,
+    }
+    if particular_solution is not None and conditions and _explicit(solutions[0], y):
+        report['conditions'] = check_conditions(solutions[0], conditions, y)
+        if not all(check['ok'] for check in report['conditions']):
+            report['status'] = FAILED
+    if mode == 'full':
+        symbolic = []
+        for solution in solutions:
+            cancellation.check()
+            try:
+                symbolic.append(bool(checkodesol(eq, solution, y)[0]))
+            except (NotImplementedError, ValueError, TypeError):
+                symbolic.append(None)
+        report['symbolic'] = symbolic
+    report['confident'] = report['status'] == VERIFIED and False not in report.get('symbolic', [])
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return report
@@ -0,0 +1,92 @@
+"""
+Calentamiento del proceso antes de atender tráfico.
+
+Las primeras llamadas a dsolve, classify_ode, simplify y latex pagan una
+inicialización perezosa interna de SymPy (y la primera plantilla, la de Jinja),
+así que un proceso recién arrancado o reciclado responde mucho más lento que
+uno en régimen. Al arrancar se resuelve una ecuación representativa por cada
+método de la interfaz y, hasta que termina, /ready responde 503 para que el
+balanceador no le envíe peticiones.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger('solver.warmup')
+
+# (método, ecuación, condiciones iniciales): una por cada entrada de method_functions,
+# más el modo automático con condiciones iniciales y un sistema lineal
+WARMUP_EQUATIONS = [
+    ('separable', "y' = x*y", ''),
+    ('homogeneous', "y' = (x + y)/x", ''),
+    ('exact', "(2*x*y + 3) + (x**2 + 3)*y' = 0", ''),
+    ('linear', "y' + y/x = x**2", ''),
+    ('bernoulli', "y' = y + y**2", ''),
+    ('reducible', "y'' = 2*x", ''),
+    ('constant_coeff', "y'' + 3*y' + 2*y = 0", ''),
+    ('undetermined', "y'' + 4*y = exp(2*x)", ''),
+    ('integrating_factor', "x*y' + y = x**3", ''),
+    ('auto', "y' + 2*y = 5*x**2", 'y(0)=4'),
+    ('system', "x' = 3*x - 4*y; y' = 4*x - 7*y", 'x(0)=1, y(0)=0'),
+]
+
+
+class Warmup:
+    """Estado del calentamiento: pending -> warming -> ready"""
+
+    def __init__(self, equations=WARMUP_EQUATIONS):
+        self.equations = list(equations)
+        self.state = 'pending'
+        self.done = 0
+        self.failed = []
+        self.elapsed_ms = None
+        self._ready = threading.Event()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def mark_ready(self):
+        """Sin calentamiento (desactivado): el proceso está listo desde el principio"""
+        self.state = 'ready'
+        self._ready.set()
+
+    def run(self, solve, after=None):
+        """
+        Resuelve cada ecuación con solve(ecuación, método, condiciones). Un fallo
+        no impide quedar listo: sólo se anota. `after` se ejecuta al final, antes
+        de marcar el proceso como listo (p. ej. para arrancar los workers).
+        """
+        self.state = 'warming'
+        started = time.perf_counter()
+        for method, equation, conditions in self.equations:
+            try:
+                result = solve(equation, method, conditions)
+                if not result.get('success'):
+                    self.failed.append(method)
+            except Exception as e:
+                logger.warning('Calentamiento: falló %s (%r): %s', method, equation, e)
+                self.failed.append(method)
+            self.done += 1
+        if after is not None:
+            after()
+        self.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info('Calentamiento completado en %.0f ms (%d ecuaciones, %d fallos)',
+                    self.elapsed_ms, len(self.equations), len(self.failed))
+        self.mark_ready()
+
+    def start(self, solve, after=None):
+        """Calienta en segundo plano; el servidor puede escuchar mientras tanto"""
+        thread = threading.Thread(target=self.run, args=(solve, after), name='warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def as_dict(self):
+        status = {'status': self.state, 'done': self.done, 'total': len(self.equations)}
+        if self.elapsed_ms is not None:
+            status['warmup_ms'] = self.elapsed_ms
+        if self.failed:
+            status['failed'] = list(self.failed)
+        return status
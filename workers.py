@@ -0,0 +1,408 @@
+"""
+Procesos trabajadores para el cálculo simbólico, con memoria acotada.
+
+Cada worker es un proceso aparte con un límite de espacio de direcciones
+(resource.setrlimit(RLIMIT_AS)), de modo que un simplify patológico falla con
+MemoryError dentro del worker en lugar de tumbar la aplicación. Los workers se
+reciclan tras `max_tasks` tareas o cuando su memoria residente supera
+`max_rss_mb`, lo que mantiene acotada la memoria de cada nodo aunque la caché
+global de SymPy crezca. Una tarea que excede su tiempo se termina matando al
+worker que la ejecuta.
+
+Con fork, los workers no se crean desde el proceso web (que tiene hilos y
+podría heredar un lock tomado por otro hilo): un proceso auxiliar de un solo
+hilo, creado una vez desde el proceso ya caliente, hace el fork de cada
+worker y le pasa su extremo del socket. Así los workers siguen heredando el
+estado caliente sin hacer fork desde los hilos de las peticiones.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from multiprocessing import reduction
+from multiprocessing.connection import Connection
+
+try:
+    import resource
+except ImportError:  # Windows: sin límites de memoria por proceso
+    resource = None
+
+
+class WorkerError(Exception):
+    """Fallo de infraestructura al ejecutar una tarea en un worker"""
+
+    kind = 'worker_error'
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+    def as_dict(self):
+        return {'type': self.kind, 'message': str(self), **self.details}
+
+
+class WorkerMemoryError(WorkerError):
+    kind = 'memory_limit'
+
+
+class WorkerTimeout(WorkerError):
+    kind = 'timeout'
+
+
+class WorkerDied(WorkerError):
+    kind = 'worker_died'
+
+
+class WorkerCancelled(WorkerError):
+    kind = 'cancelled'
+
+
+def current_rss_mb():
+    """Memoria residente actual del proceso en MiB"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0.0
+        # ru_maxrss es el pico (KiB en Linux); es la mejor aproximación disponible
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _limit_memory(limit_mb):
+    if resource is None or not limit_mb:
+        return
+    limit = int(limit_mb * 1024 * 1024)
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _worker_main(conn, memory_limit_mb, max_tasks, max_rss_mb):
+    """Bucle del proceso worker: recibe (func, args, kwargs) y responde (estado, valor, info)"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_memory(memory_limit_mb)
+    tasks = 0
+    while True:
+        try:
+            func, args, kwargs = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            status, value = 'ok', func(*args, **kwargs)
+        except MemoryError:
+            status, value = 'memory', None
+        except Exception as e:
+            status, value = 'error', f'{type(e).__name__}: {e}'
+        tasks += 1
+        rss = current_rss_mb()
+        # Tras un MemoryError el estado interno de SymPy no es fiable: reciclar
+        recycle = status == 'memory' or (max_tasks and tasks >= max_tasks) or (max_rss_mb and rss > max_rss_mb)
+        try:
+            conn.send((status, value, {'tasks': tasks, 'rss_mb': round(rss, 1), 'recycle': bool(recycle)}))
+        except MemoryError:
+            return
+        if recycle:
+            return
+
+
+def _reap(pid, kill, grace=1.0):
+    """Espera a un worker hijo (matándolo con kill o si no termina en `grace` s) y devuelve su código de salida"""
+    if kill:
+        _kill_pid(pid)
+    deadline = time.monotonic() + grace
+    while True:
+        try:
+            done, status = os.waitpid(pid, 0 if kill else os.WNOHANG)
+        except ChildProcessError:
+            return None
+        if done:
+            return os.waitstatus_to_exitcode(status)
+        if time.monotonic() > deadline:
+            _kill_pid(pid)
+            kill = True
+        else:
+            time.sleep(0.01)
+
+
+def _kill_pid(pid):
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _spawner_main(conn, memory_limit_mb, max_tasks, max_rss_mb):
+    """
+    Bucle del proceso que crea los workers: ('spawn',) seguido del descriptor del
+    socket del worker, o ('reap', pid, kill). Tiene un solo hilo, así que el fork es seguro.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            request = conn.recv()
+            if request[0] == 'spawn':
+                fd = reduction.recv_handle(conn)
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        conn.close()
+                        _worker_main(Connection(fd), memory_limit_mb, max_tasks, max_rss_mb)
+                    finally:
+                        os._exit(0)
+                os.close(fd)
+                conn.send(pid)
+            else:
+                _, pid, kill = request
+                conn.send(_reap(pid, kill))
+        except (EOFError, OSError):
+            return
+
+
+class _Spawner:
+    """Proceso auxiliar de un solo hilo que crea los workers con fork (ver _spawner_main)"""
+
+    def __init__(self, context, memory_limit_mb, max_tasks, max_rss_mb):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_spawner_main, name='solver-spawner', daemon=True,
+                                       args=(child_conn, memory_limit_mb, max_tasks, max_rss_mb))
+        self.process.start()
+        child_conn.close()
+        self._lock = threading.Lock()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def _call(self, request, handle=None):
+        with self._lock:
+            try:
+                self.conn.send(request)
+                if handle is not None:
+                    reduction.send_handle(self.conn, handle, self.process.pid)
+                return self.conn.recv()
+            except (EOFError, OSError):
+                raise WorkerDied('El proceso que crea los workers terminó inesperadamente',
+                                 exitcode=self.process.exitcode)
+
+    def spawn(self, conn):
+        """Crea un worker que atiende el otro extremo de `conn` y devuelve su pid"""
+        return self._call(('spawn',), conn.fileno())
+
+    def reap(self, pid, kill):
+        return self._call(('reap', pid, kill))
+
+    def stop(self):
+        self.conn.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+
+
+class _SpawnedWorker:
+    """Worker creado por el _Spawner; no es hijo de este proceso, así que se gestiona a través de él"""
+
+    def __init__(self, spawner, context):
+        self.spawner = spawner
+        self.conn, child_conn = context.Pipe()
+        try:
+            self.pid = spawner.spawn(child_conn)
+        except BaseException:
+            self.conn.close()
+            raise
+        finally:
+            child_conn.close()
+        self.exitcode = None
+        self._reaped = False
+
+    def alive(self):
+        # Un worker desocupado no escribe nada: si su socket es legible, es que se cerró
+        return not self._reaped and not self.conn.poll()
+
+    def _reap(self, kill):
+        if not self._reaped:
+            self._reaped = True
+            try:
+                self.exitcode = self.spawner.reap(self.pid, kill)
+            except WorkerDied:
+                _kill_pid(self.pid)
+        return self.exitcode
+
+    def wait(self):
+        return self._reap(kill=False)
+
+    def kill(self):
+        self._reap(kill=True)
+        self.conn.close()
+
+    def retire(self):
+        self._reap(kill=False)
+        self.conn.close()
+
+
+class _Worker:
+    def __init__(self, context, memory_limit_mb, max_tasks, max_rss_mb):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, name='solver-worker', daemon=True,
+                                       args=(child_conn, memory_limit_mb, max_tasks, max_rss_mb))
+        self.process.start()
+        child_conn.close()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def wait(self):
+        self.process.join(1)
+        return self.process.exitcode
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def retire(self):
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+
+class WorkerPool:
+    """Conjunto de hasta `size` workers; cada tarea ocupa un worker en exclusiva"""
+
+    def __init__(self, size, memory_limit_mb=0, max_tasks=0, max_rss_mb=0, start_method=None):
+        self.size = max(1, int(size))
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        if start_method is None:
+            start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._context = multiprocessing.get_context(start_method)
+        self._cond = threading.Condition()
+        self._idle = []
+        self._total = 0
+        self._spawner = None
+        self.recycled = 0
+        self.killed = 0
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive():
+                        return worker
+                    self._total -= 1
+                    worker.retire()
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                self._cond.wait()
+        try:
+            return self._new_worker()
+        except BaseException:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+    def _new_worker(self):
+        if self._context.get_start_method() != 'fork':
+            # spawn y forkserver no hacen fork de este proceso: se pueden crear desde cualquier hilo
+            return _Worker(self._context, self.memory_limit_mb, self.max_tasks, self.max_rss_mb)
+        with self._cond:
+            # Sólo se hace fork de este proceso para el spawner: una vez en prestart (o de nuevo si muere)
+            if self._spawner is None or not self._spawner.alive():
+                self._spawner = _Spawner(self._context, self.memory_limit_mb, self.max_tasks, self.max_rss_mb)
+            spawner = self._spawner
+        return _SpawnedWorker(spawner, self._context)
+
+    def _release(self, worker, keep):
+        with self._cond:
+            if keep:
+                self._idle.append(worker)
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+    def run(self, func, *args, timeout=None, cancel=None, **kwargs):
+        """
+        Ejecuta func(*args, **kwargs) en un worker y devuelve su resultado.
+        Lanza WorkerMemoryError, WorkerTimeout o WorkerDied si el worker se
+        queda sin memoria, excede el tiempo o muere; las excepciones normales
+        de func llegan como WorkerError con el mensaje original. Si `cancel`
+        (con is_set()) se activa, se mata al worker y se lanza WorkerCancelled.
+        """
+        worker = self._acquire()
+        keep = False
+        try:
+            worker.conn.send((func, args, kwargs))
+            deadline = time.monotonic() + timeout if timeout else None
+            while not worker.conn.poll(0.05):
+                # Un worker que se recicla puede terminar justo después de responder
+                if not worker.alive() and not worker.conn.poll():
+                    raise self._death(worker)
+                if cancel is not None and cancel.is_set():
+                    worker.kill()
+                    self.killed += 1
+                    raise WorkerCancelled('El cálculo fue cancelado')
+                if deadline and time.monotonic() > deadline:
+                    worker.kill()
+                    self.killed += 1
+                    raise WorkerTimeout(f'El cálculo superó el tiempo máximo de {timeout:.3g} s',
+                                        timeout_s=round(timeout, 3))
+            try:
+                status, value, info = worker.conn.recv()
+            except (EOFError, OSError):
+                raise self._death(worker)
+            if info['recycle']:
+                worker.retire()
+                self.recycled += 1
+            else:
+                keep = True
+            if status == 'memory':
+                raise WorkerMemoryError('El cálculo superó el límite de memoria del worker',
+                                        limit_mb=self.memory_limit_mb)
+            if status == 'error':
+                raise WorkerError(value)
+            return value
+        finally:
+            if not keep:
+                worker.kill()
+            self._release(worker, keep)
+
+    def _death(self, worker):
+        code = worker.wait()
+        self.killed += 1
+        if code == -signal.SIGKILL:
+            # Lo más habitual es el OOM killer del sistema
+            return WorkerMemoryError('El worker fue terminado por el sistema (probablemente por memoria)',
+                                     limit_mb=self.memory_limit_mb, exitcode=code)
+        return WorkerDied(f'El worker terminó inesperadamente (código {code})', exitcode=code)
+
+    def prestart(self):
+        """
+        Arranca todos los workers de antemano (antes de empezar a atender peticiones);
+        con fork, el spawner se crea aquí desde el proceso ya caliente.
+        """
+        started = []
+        for _ in range(self.size):
+            started.append(self._acquire())
+        for worker in started:
+            self._release(worker, True)
+
+    def shutdown(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for worker in idle:
+            worker.kill()
+        with self._cond:
+            spawner, self._spawner = self._spawner, None
+        if spawner is not None:
+            spawner.stop()